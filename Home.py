@@ -1,10 +1,26 @@
 # app.py
 import streamlit as st
-import openai
 import json
+import psycopg2
+import zipfile
 from datetime import datetime
 
-from database import init_db, fetch_all_reps, get_rep_team, insert_demo_result
+from database import (
+    demo_result_key,
+    fetch_all_reps,
+    fetch_analysis_job,
+    fetch_recent_jobs,
+    mark_analysis_job_saved,
+    save_demo_result,
+    save_demo_results,
+)
+from migrations import ensure_schema
+from metrics import span
+from analysis_cache import get_analysis_cache
+from analyzer import DemoAnalyzer
+from batch import TokenBucket, load_batch_file, run_batch
+from jobs import get_job_workers, submit_analysis_job
+from report import render_report
 
 st.set_page_config(
         page_title="Demo Analysis Tool",
@@ -29,105 +45,7 @@ def display_header():
         st.markdown("<h1 style='padding-top: 10px;'>Demo Analysis Tool</h1>", unsafe_allow_html=True)
 
 # -------------------------------------------
-# 2. DemoAnalyzer Class
-# -------------------------------------------
-class DemoAnalyzer:
-    def __init__(self):
-        api_key = st.secrets["general"]["OPENAI_API_KEY"]
-        openai.api_key = api_key
-
-    def analyze_demo_performance(self, transcript: str) -> dict:
-        response_text = ""
-        try:
-            system_prompt = (
-                "You are an expert sales coach analyzing demo performance. "
-                "Return ONLY a valid JSON object with no additional text."
-            )
-            
-            # The official fields
-            user_prompt = f"""
-Analyze this demo transcript and return a JSON object with exactly these fields:
-
-{{
-    "scores": {{
-        "discovery": 1-5,
-        "value_proposition": 1-5,
-        "technical_clarity": 1-5,
-        "objection_handling": 1-5,
-        "demo_flow": 1-5,
-        "next_steps": 1-5
-    }},
-    "strengths": {{
-        "area_name": ["specific strength points"]
-    }},
-    "improvements": {{
-        "area_name": ["specific improvement points"]
-    }},
-    "examples": {{
-        "area_name": ["specific transcript examples"]
-    }},
-    "pain_points": {{
-        "operational": ["list of operational challenges"],
-        "technical": ["list of technical challenges"],
-        "financial": ["list of financial concerns"],
-        "priority_level": {{
-            "pain_point": "High/Medium/Low"
-        }}
-    }},
-    "buying_signals": {{
-        "positive": ["list of positive signals"],
-        "concerns": ["list of concerns/objections"]
-    }},
-    "next_steps": [
-        {{
-            "action": "specific task",
-            "owner": "responsible party",
-            "deadline": "timeframe",
-            "priority": "High/Medium/Low"
-        }}
-    ],
-    "management_summary": {{
-        "key_points": ["list of key discussion points"],
-        "decisions": ["list of decisions made"],
-        "risks": ["identified risks"],
-        "recommendations": ["key recommendations"]
-    }}
-}}
-
-TRANSCRIPT:
-{transcript}
-"""
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0,
-                max_tokens=1500
-            )
-
-            response_text = response.choices[0].message.content.strip()
-
-            # Try parse JSON
-            try:
-                return json.loads(response_text)
-            except json.JSONDecodeError:
-                start_idx = response_text.find('{')
-                end_idx = response_text.rfind('}') + 1
-                if start_idx == -1 or end_idx <= start_idx:
-                    raise ValueError("No valid JSON object found in response.")
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-
-        except Exception as e:
-            st.error(f"Analysis error: {str(e)}")
-            if response_text:
-                st.error(f"Raw response: {response_text[:500]}...")
-            return {}
-
-# -------------------------------------------
-# 3. PreDemoChecklist
+# 2. PreDemoChecklist
 # -------------------------------------------
 class PreDemoChecklist:
     @staticmethod
@@ -168,112 +86,155 @@ class PreDemoChecklist:
                 st.checkbox("Value-based care initiatives")
 
 # -------------------------------------------
-# 4. Display Analysis
+# 3. Batch Mode
 # -------------------------------------------
-def display_analysis(analysis: dict):
-    st.header("Demo Performance Analysis")
-    
-    # Management Summary
-    with st.expander("📊 Management Summary", expanded=True):
-        summary = analysis.get("management_summary", {})
-        if summary:
-            cols = st.columns(2)
-            with cols[0]:
-                st.markdown("### Key Points & Decisions")
-                for point in summary.get("key_points", []):
-                    st.markdown(f"• {point}")
-                for decision in summary.get("decisions", []):
-                    st.markdown(f"✓ {decision}")
-                    
-            with cols[1]:
-                st.markdown("### Risks & Recommendations")
-                for risk in summary.get("risks", []):
-                    st.markdown(f"⚠️ {risk}")
-                for rec in summary.get("recommendations", []):
-                    st.markdown(f"💡 {rec}")
-
-    # Overall Score
-    scores = analysis.get("scores", {})
-    if scores:
-        numeric_scores = [v for v in scores.values() if isinstance(v, (int, float))]
-        if numeric_scores:
-            overall = sum(numeric_scores) / len(numeric_scores)
-            st.metric("Overall Demo Score", f"{overall:.1f}/5.0")
-
-    # Pain Points & Buying Signals
-    cols = st.columns(2)
+def batch_mode():
+    st.header("Batch Transcript Analysis")
+    st.write(
+        "Upload a CSV with columns rep_name, customer_name, demo_date, transcript, "
+        "or a zip of .txt transcripts with a manifest.csv (file, rep_name, customer_name, demo_date)."
+    )
+    uploaded = st.file_uploader("Transcripts", type=["csv", "zip"])
+    cols = st.columns(3)
     with cols[0]:
-        with st.expander("🎯 Pain Points", expanded=True):
-            pain_points = analysis.get("pain_points", {})
-            for category, points in pain_points.items():
-                if category != "priority_level":
-                    st.markdown(f"**{category.title()}**")
-                    for point in points:
-                        priority = pain_points.get("priority_level", {}).get(point, "Medium")
-                        emoji = "🔴" if priority == "High" else "🟡" if priority == "Medium" else "🟢"
-                        st.markdown(f"{emoji} {point}")
-                            
+        concurrency = st.number_input("Concurrent analyses", min_value=1, max_value=16, value=4)
     with cols[1]:
-        with st.expander("💭 Buying Signals", expanded=True):
-            buying_signals = analysis.get("buying_signals", {})
-            positives = buying_signals.get("positive", [])
-            concerns = buying_signals.get("concerns", [])
-            
-            st.markdown("**Positive Signals**")
-            for signal in positives:
-                st.markdown(f"✅ {signal}")
-                
-            st.markdown("**Concerns/Objections**")
-            for concern in concerns:
-                st.markdown(f"❓ {concern}")
-
-    # Strengths, Improvements, Examples
-    columns = st.columns(3)
-    with columns[0]:
-        with st.expander("💪 Strengths", expanded=True):
-            strengths = analysis.get("strengths", {})
-            for area, details in strengths.items():
-                area_score = scores.get(area, 0)
-                st.markdown(f"**{area}** ({area_score}/5)")
-                for point in details:
-                    st.markdown(f"• {point}")
-    
-    with columns[1]:
-        with st.expander("🎯 Areas for Improvement", expanded=True):
-            improvements = analysis.get("improvements", {})
-            for area, details in improvements.items():
-                area_score = scores.get(area, 0)
-                st.markdown(f"**{area}** ({area_score}/5)")
-                for point in details:
-                    st.markdown(f"• {point}")
-
-    with columns[2]:
-        with st.expander("📝 Specific Examples", expanded=True):
-            examples = analysis.get("examples", {})
-            for area, ex_list in examples.items():
-                st.markdown(f"**{area}**")
-                for ex in ex_list:
-                    st.markdown(f"• {ex}")
-
-    # Next Steps
-    with st.expander("📋 Next Steps", expanded=True):
-        next_steps = analysis.get("next_steps", [])
-        for item in next_steps:
-            action = item.get("action", "")
-            owner = item.get("owner", "")
-            deadline = item.get("deadline", "")
-            priority = item.get("priority", "")
-            priority_emoji = "🔴" if priority == "High" else "🟡" if priority == "Medium" else "🟢"
-            st.markdown(f"{priority_emoji} **{action}**")
-            st.markdown(f"Owner: {owner} | Due: {deadline}")
+        requests_per_minute = st.number_input("Max API requests / minute", min_value=1, max_value=3000, value=60)
+    with cols[2]:
+        max_retries = st.number_input("Retries per demo", min_value=0, max_value=10, value=3)
+
+    if "batch_results" not in st.session_state:
+        st.session_state["batch_results"] = None
+
+    if uploaded is not None and st.button("Run Batch"):
+        try:
+            items = load_batch_file(uploaded.name, uploaded.getvalue())
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            st.error(f"Could not read upload: {e}")
+            return
+        if not items:
+            st.error("No transcripts found in the upload.")
+            return
+
+        progress = st.progress(0.0, text=f"0/{len(items)} analyzed")
+        status_table = st.empty()
+        status_rows = []
+
+        def on_progress(done, total, result):
+            progress.progress(done / total, text=f"{done}/{total} analyzed")
+            status_rows.append({
+                "Source": result.item.source,
+                "Rep": result.item.rep_name,
+                "Customer": result.item.customer_name,
+                "Status": "OK" if result.ok else f"Failed: {result.error}",
+                "Attempts": result.attempts,
+                "Seconds": round(result.seconds, 1),
+            })
+            status_table.dataframe(status_rows)
+
+        analyzer = DemoAnalyzer(rate_limiter=TokenBucket(requests_per_minute))
+        st.session_state["batch_results"] = run_batch(
+            items,
+            analyzer,
+            concurrency=int(concurrency),
+            max_retries=int(max_retries),
+            on_progress=on_progress,
+        )
+
+    results = st.session_state.get("batch_results")
+    if results:
+        succeeded = [r for r in results if r.ok]
+        st.write(f"{len(succeeded)} of {len(results)} transcript(s) analyzed successfully.")
+        if succeeded and st.button("Save Batch to DB"):
+            # Saved here in one transaction rather than through the write-behind buffer, so
+            # the count is this batch's and a failure is reported while the batch is still on screen.
+            rows = []
+            for r in succeeded:
+                analysis_json = json.dumps(r.analysis)
+                key = demo_result_key(r.item.rep_name, r.item.customer_name, r.item.demo_date, r.item.transcript, analysis_json)
+                rows.append((key, r.item.rep_name, r.item.customer_name, r.item.demo_date, analysis_json, r.item.transcript))
+            try:
+                count = save_demo_results(rows)
+            except psycopg2.Error as e:
+                st.error(f"Could not save the batch: {e}")
+            else:
+                st.success(f"Saved {count} demo analyses ({len(rows) - count} already saved).")
+                st.session_state["batch_results"] = None
+
+# -------------------------------------------
+# 4. Analysis Jobs
+# -------------------------------------------
+JOB_POLL_SECONDS = 2
+JOB_STATUS_LABELS = {"queued": "⏳ Queued", "running": "⚙️ Running", "done": "✅ Done", "failed": "❌ Failed"}
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_job(job_id):
+    """
+    Re-runs on its own every JOB_POLL_SECONDS while the job is pending, showing the sections
+    finished so far, and hands back to a full rerun once the job is done or failed.
+    """
+    job = fetch_analysis_job(job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        st.rerun()
+    st.info(f"Job #{job_id}: {JOB_STATUS_LABELS[job['status']]}. You can keep working or come back later.")
+    if job["analysis_json"]:
+        render_report(job["analysis_json"])
+
+def show_job(job_id):
+    job = fetch_analysis_job(job_id)
+    if job is None:
+        st.session_state["job_id"] = None
+        return None
+    if job["status"] in ("queued", "running"):
+        poll_job(job_id)
+        return None
+    if job["status"] == "failed":
+        st.error(f"Job #{job_id} failed after {job['attempts']} attempt(s): {job['error']}")
+        return None
+    seconds = (job["finished_at"] - job["created_at"]).total_seconds()
+    st.caption(
+        f"Job #{job_id}: {job['rep_name']} / {job['customer_name'] or 'no customer'} / {job['demo_date']}, "
+        f"finished in {seconds:.0f}s."
+    )
+    render_report(job["analysis_json"])
+    return job
+
+def recent_jobs():
+    with st.expander("🗂️ Analysis Jobs"):
+        rows = fetch_recent_jobs()
+        if not rows:
+            st.write("No analysis jobs yet.")
+            return
+        st.dataframe(
+            [
+                {
+                    "Job": job_id,
+                    "Status": JOB_STATUS_LABELS[status],
+                    "Rep": rep,
+                    "Customer": customer,
+                    "Demo Date": demo_date,
+                    "Saved As": f"#{result_id}" if result_id else "",
+                    "Queued": created_at,
+                }
+                for job_id, status, rep, customer, demo_date, result_id, created_at, _ in rows
+            ],
+            hide_index=True,
+        )
+        cols = st.columns([3, 1])
+        with cols[0]:
+            picked = st.selectbox("Open job", [r[0] for r in rows], format_func=lambda j: f"#{j}")
+        with cols[1]:
+            if st.button("Open"):
+                st.session_state["job_id"] = picked
 
 # -------------------------------------------
 # 5. Main Page
 # -------------------------------------------
 
 def main():
-    # Initialize DB
-    init_db()
+    # Apply pending schema migrations and start the analysis workers (once per process)
+    ensure_schema()
+    get_job_workers()
 
     # Set custom favicon and page title
     
@@ -284,6 +245,12 @@ def main():
     reps_list = fetch_all_reps()  # each row = (id, rep_name, team, created_at)
     rep_names = [r[1] for r in reps_list]
 
+    with st.sidebar:
+        mode = st.radio("Mode", ["Single demo", "Batch upload"], horizontal=True)
+    if mode == "Batch upload":
+        batch_mode()
+        return
+
     with st.sidebar:
         st.header("Demo Information")
         if not rep_names:
@@ -295,14 +262,20 @@ def main():
         customer_name = st.text_input("Customer")
         demo_date = st.date_input("Demo Date")
 
+        cache_stats = get_analysis_cache().stats()
+        st.caption(
+            f"Analysis cache: {cache_stats['memory_hits'] + cache_stats['db_hits']} hits, "
+            f"{cache_stats['misses']} misses"
+        )
+
     PreDemoChecklist.display()
 
     st.header("Demo Recording Analysis")
     transcript = st.text_area("Paste demo transcript:", height=200)
 
-    # We'll store GPT analysis in session for two-step approach
-    if "gpt_analysis" not in st.session_state:
-        st.session_state["gpt_analysis"] = None
+    # The analysis runs as a background job; the session only remembers which one.
+    if "job_id" not in st.session_state:
+        st.session_state["job_id"] = None
 
     # Step 1: Analyze
     if st.button("Analyze Demo"):
@@ -311,33 +284,36 @@ def main():
         elif not rep_name and not rep_names:
             st.error("No Rep selected or available. Add a rep first.")
         else:
-            with st.spinner("Analyzing..."):
-                analyzer = DemoAnalyzer()
-                analysis = analyzer.analyze_demo_performance(transcript)
-                st.session_state["gpt_analysis"] = analysis
-                if analysis:
-                    display_analysis(analysis)
+            st.session_state["job_id"] = submit_analysis_job(rep_name, customer_name, demo_date, transcript)
+
+    recent_jobs()
+
+    job = show_job(st.session_state["job_id"]) if st.session_state["job_id"] else None
 
     # Step 2: Confirm & Send to DB
     if st.button("Confirm & Send to DB"):
-        analysis = st.session_state.get("gpt_analysis")
-        if not analysis:
+        if not job and st.session_state["job_id"]:
+            st.error(f"Job #{st.session_state['job_id']} has not finished successfully yet.")
+        elif not job:
             st.error("No analysis available. Please run 'Analyze Demo' first.")
+        elif job["demo_result_id"]:
+            st.info(f"Job #{job['id']} is already saved as record #{job['demo_result_id']}.")
         else:
-            if not rep_name:
-                st.error("Please select a valid rep.")
+            # Idempotent: a double click or a rerun returns the row saved the first time.
+            result_id, rep_team, inserted = save_demo_result(
+                rep_name=job["rep_name"],
+                customer_name=job["customer_name"],
+                demo_date=job["demo_date"],
+                analysis_json=json.dumps(job["analysis_json"]),
+                transcript=fetch_analysis_job(job["id"], include_transcript=True)["transcript"],
+            )
+            mark_analysis_job_saved(job["id"], result_id)
+            if inserted:
+                st.success(f"Demo analysis saved. Rep: {job['rep_name']} (Team: {rep_team}).")
             else:
-                # Get the team from the DB
-                rep_team = get_rep_team(rep_name) or "Unknown"
-                insert_demo_result(
-                    rep_name=rep_name,
-                    rep_team=rep_team,
-                    customer_name=customer_name,
-                    demo_date=str(demo_date),
-                    analysis_json=json.dumps(analysis)
-                )
-                st.success(f"Demo analysis saved. Rep: {rep_name} (Team: {rep_team}).")
-                st.session_state["gpt_analysis"] = None  # clear
+                st.info(f"This demo was already saved as record #{result_id}.")
+            st.session_state["job_id"] = None  # clear
 
 if __name__ == "__main__":
-    main()
+    with span("rerun", "Home"):
+        main()
@@ -0,0 +1,160 @@
+# analysis_cache.py
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import psycopg2
+import streamlit as st
+
+from analysis_model import Analysis, SchemaError
+from database import fetch_cached_analysis, store_cached_analysis, purge_analysis_cache
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 256
+
+
+def normalize_transcript(transcript: str) -> str:
+    """
+    Canonical form of a transcript for hashing: NFC unicode, trimmed, whitespace runs collapsed.
+    Two pastes that differ only in line endings or spacing map to the same key.
+    """
+    text = unicodedata.normalize("NFC", transcript)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(transcript: str, model: str, prompt_version: str, params: dict) -> str:
+    """
+    Content address of an analysis: sha256 over the normalized transcript hash,
+    the model, the prompt version and the sampling params.
+    """
+    transcript_hash = hashlib.sha256(normalize_transcript(transcript).encode("utf-8")).hexdigest()
+    material = json.dumps(
+        {
+            "transcript": transcript_hash,
+            "model": model,
+            "prompt_version": prompt_version,
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of analyses: an in-process LRU in front of the analysis_cache table.
+    Entries expire after ttl_seconds in both tiers. Database errors degrade to cache misses.
+    Both tiers hold analyses in analysis_model's compact form (about a fifth of the JSON), and
+    decoding one is cheaper than the deep copy a cached dict would need; an analysis that does
+    not fit the schema is kept as JSON instead.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # cache_key -> (stored_at, compact bytes or analysis dict)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key, analysis, stored_at=None):
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), analysis)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _decode(entry):
+        # A fresh dict either way, so callers may modify what they get.
+        if isinstance(entry, bytes):
+            return Analysis.from_compact(entry).to_dict()
+        return copy.deepcopy(entry)
+
+    def get(self, key):
+        """
+        Returns a copy of the cached analysis dict for key, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, analysis = entry
+                if time.time() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return self._decode(analysis)
+                del self._entries[key]
+                self.evictions += 1
+
+        try:
+            row = fetch_cached_analysis(key, self.ttl_seconds)
+        except psycopg2.Error:
+            row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        analysis_json, analysis_blob, age_seconds = row
+        entry = analysis_blob if analysis_blob is not None else json.loads(analysis_json)
+        # Kept in memory only for what is left of the row's TTL, not a fresh one.
+        self._remember(key, entry, stored_at=time.time() - age_seconds)
+        with self._lock:
+            self.db_hits += 1
+        return self._decode(entry)
+
+    def put(self, key, analysis, model, prompt_version):
+        try:
+            blob = Analysis.from_dict(analysis).to_compact()
+        except SchemaError:
+            blob = None
+        self._remember(key, blob if blob is not None else copy.deepcopy(analysis))
+        try:
+            if blob is not None:
+                store_cached_analysis(key, model, prompt_version, analysis_blob=blob)
+            else:
+                store_cached_analysis(key, model, prompt_version, analysis_json=json.dumps(analysis))
+        except psycopg2.Error:
+            pass
+
+    def purge_expired(self):
+        """
+        Drops expired rows from the analysis_cache table. Returns the number removed.
+        """
+        return purge_analysis_cache(self.ttl_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@st.cache_resource
+def get_analysis_cache():
+    """
+    Returns the process-wide AnalysisCache. TTL and LRU size can be set with
+    ANALYSIS_CACHE_TTL_HOURS and ANALYSIS_CACHE_MAX_ENTRIES in st.secrets["general"].
+    """
+    general = st.secrets["general"]
+    cache = AnalysisCache(
+        max_entries=int(general.get("ANALYSIS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        ttl_seconds=float(general.get("ANALYSIS_CACHE_TTL_HOURS", DEFAULT_TTL_SECONDS / 3600)) * 3600,
+    )
+    try:
+        cache.purge_expired()
+    except psycopg2.Error:
+        pass
+    return cache
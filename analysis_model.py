@@ -0,0 +1,334 @@
+# analysis_model.py
+"""
+Typed model of a demo analysis, the validation that turns model output into it, and a compact
+serialization for storage.
+
+validate_sections() checks each top-level section independently, so a response with one bad
+section keeps the good ones and only the bad one needs asking for again. Analysis.to_dict()
+gives back the JSON shape the rest of the app stores and renders, with every field present
+and normalized (scores are ints 1-5, priorities are High/Medium/Low).
+"""
+import json
+import zlib
+from dataclasses import dataclass, field
+
+SCORE_KEYS = (
+    "discovery",
+    "value_proposition",
+    "technical_clarity",
+    "objection_handling",
+    "demo_flow",
+    "next_steps",
+)
+SECTIONS = (
+    "scores", "strengths", "improvements", "examples",
+    "pain_points", "buying_signals", "next_steps", "management_summary",
+)
+PRIORITIES = ("High", "Medium", "Low")
+PAIN_POINT_CATEGORIES = ("operational", "technical", "financial")
+SUMMARY_FIELDS = ("key_points", "decisions", "risks", "recommendations")
+# First byte of to_compact() output; bump when the layout changes.
+COMPACT_VERSION = 1
+
+
+class SchemaError(ValueError):
+    """
+    Raised when sections of an analysis do not match the schema. `errors` maps section -> message.
+    """
+
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{name}: {message}" for name, message in errors.items()))
+        self.errors = errors
+
+
+# -------------------------------------------
+# Model
+# -------------------------------------------
+@dataclass(slots=True)
+class Scores:
+    discovery: int = 0
+    value_proposition: int = 0
+    technical_clarity: int = 0
+    objection_handling: int = 0
+    demo_flow: int = 0
+    next_steps: int = 0
+
+    def to_dict(self):
+        # 0 means "not scored" (a section that never validated) and is left out.
+        return {key: getattr(self, key) for key in SCORE_KEYS if getattr(self, key)}
+
+
+@dataclass(slots=True)
+class PainPoints:
+    operational: list = field(default_factory=list)
+    technical: list = field(default_factory=list)
+    financial: list = field(default_factory=list)
+    priority_level: dict = field(default_factory=dict)  # point -> High/Medium/Low
+
+    def to_dict(self):
+        return {
+            "operational": self.operational,
+            "technical": self.technical,
+            "financial": self.financial,
+            "priority_level": self.priority_level,
+        }
+
+
+@dataclass(slots=True)
+class BuyingSignals:
+    positive: list = field(default_factory=list)
+    concerns: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {"positive": self.positive, "concerns": self.concerns}
+
+
+@dataclass(slots=True)
+class NextStep:
+    action: str
+    owner: str = ""
+    deadline: str = ""
+    priority: str = "Medium"
+
+    def to_dict(self):
+        return {"action": self.action, "owner": self.owner, "deadline": self.deadline, "priority": self.priority}
+
+
+@dataclass(slots=True)
+class ManagementSummary:
+    key_points: list = field(default_factory=list)
+    decisions: list = field(default_factory=list)
+    risks: list = field(default_factory=list)
+    recommendations: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in SUMMARY_FIELDS}
+
+
+@dataclass(slots=True)
+class Analysis:
+    scores: Scores = field(default_factory=Scores)
+    strengths: dict = field(default_factory=dict)     # area -> [points]
+    improvements: dict = field(default_factory=dict)  # area -> [points]
+    examples: dict = field(default_factory=dict)      # area -> [examples]
+    pain_points: PainPoints = field(default_factory=PainPoints)
+    buying_signals: BuyingSignals = field(default_factory=BuyingSignals)
+    next_steps: list = field(default_factory=list)    # [NextStep]
+    management_summary: ManagementSummary = field(default_factory=ManagementSummary)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Validates a whole analysis dict. Raises SchemaError naming every bad or missing section.
+        """
+        sections, errors = validate_sections(data)
+        if errors:
+            raise SchemaError(errors)
+        return cls(**sections)
+
+    def to_dict(self):
+        return {name: section_to_dict(getattr(self, name)) for name in SECTIONS}
+
+    def to_compact(self) -> bytes:
+        """
+        Positional (key-free) JSON, zlib-compressed, behind a version byte. Priorities are
+        stored as their initial.
+        """
+        p = self.pain_points
+        payload = [
+            [getattr(self.scores, key) for key in SCORE_KEYS],
+            self.strengths,
+            self.improvements,
+            self.examples,
+            [p.operational, p.technical, p.financial, {k: v[0] for k, v in p.priority_level.items()}],
+            [self.buying_signals.positive, self.buying_signals.concerns],
+            [[s.action, s.owner, s.deadline, s.priority[0]] for s in self.next_steps],
+            [getattr(self.management_summary, name) for name in SUMMARY_FIELDS],
+        ]
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        return bytes([COMPACT_VERSION]) + zlib.compress(text.encode("utf-8"))
+
+    @classmethod
+    def from_compact(cls, data: bytes):
+        if not data or data[0] != COMPACT_VERSION:
+            raise ValueError(f"Unknown compact analysis version {data[:1]!r}")
+        scores, strengths, improvements, examples, pain, signals, steps, summary = json.loads(
+            zlib.decompress(data[1:]).decode("utf-8")
+        )
+        return cls(
+            scores=Scores(*scores),
+            strengths=strengths,
+            improvements=improvements,
+            examples=examples,
+            pain_points=PainPoints(*pain[:3], {k: _PRIORITY_BY_INITIAL[v] for k, v in pain[3].items()}),
+            buying_signals=BuyingSignals(*signals),
+            next_steps=[NextStep(a, o, d, _PRIORITY_BY_INITIAL[p]) for a, o, d, p in steps],
+            management_summary=ManagementSummary(*summary),
+        )
+
+
+_PRIORITY_BY_INITIAL = {p[0]: p for p in PRIORITIES}
+
+def section_to_dict(value):
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, list):
+        return [item.to_dict() for item in value]
+    return value.to_dict()
+
+
+# -------------------------------------------
+# Validation
+# -------------------------------------------
+class _Invalid(Exception):
+    pass
+
+def _text(value, where):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Invalid(f"{where} should be a string, got {type(value).__name__}")
+
+def _text_list(value, where):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise _Invalid(f"{where} should be a list of strings")
+    return [t for t in (_text(item, where) for item in value) if t]
+
+def _object(value, where):
+    if not isinstance(value, dict):
+        raise _Invalid(f"{where} should be an object, got {type(value).__name__}")
+    return value
+
+def _priority(value, where):
+    text = _text(value, where).title()
+    if text not in PRIORITIES:
+        raise _Invalid(f"{where} should be one of {'/'.join(PRIORITIES)}, got {value!r}")
+    return text
+
+def _score(value, where):
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise _Invalid(f"{where} should be a whole number 1-5, got {value!r}")
+    if not 1 <= value <= 5:
+        raise _Invalid(f"{where} should be 1-5, got {value}")
+    return int(value)
+
+def _area_lists(value, where):
+    return {_text(area, where): _text_list(points, f"{where}.{area}") for area, points in _object(value, where).items()}
+
+def _parse_scores(value):
+    value = _object(value, "scores")
+    missing = [key for key in SCORE_KEYS if key not in value]
+    if missing:
+        raise _Invalid(f"missing {', '.join(missing)}")
+    return Scores(*(_score(value[key], f"scores.{key}") for key in SCORE_KEYS))
+
+def _parse_pain_points(value):
+    value = _object(value, "pain_points")
+    priorities = _object(value.get("priority_level") or {}, "pain_points.priority_level")
+    return PainPoints(
+        *(_text_list(value.get(c), f"pain_points.{c}") for c in PAIN_POINT_CATEGORIES),
+        priority_level={
+            _text(point, "pain_points.priority_level"): _priority(level, f"pain_points.priority_level[{point!r}]")
+            for point, level in priorities.items()
+        },
+    )
+
+def _parse_buying_signals(value):
+    value = _object(value, "buying_signals")
+    return BuyingSignals(
+        _text_list(value.get("positive"), "buying_signals.positive"),
+        _text_list(value.get("concerns"), "buying_signals.concerns"),
+    )
+
+def _parse_next_steps(value):
+    if not isinstance(value, list):
+        raise _Invalid("next_steps should be a list")
+    steps = []
+    for i, item in enumerate(value):
+        item = _object(item, f"next_steps[{i}]")
+        action = _text(item.get("action") or "", f"next_steps[{i}].action")
+        if not action:
+            raise _Invalid(f"next_steps[{i}] has no action")
+        steps.append(NextStep(
+            action,
+            _text(item.get("owner") or "", f"next_steps[{i}].owner"),
+            _text(item.get("deadline") or "", f"next_steps[{i}].deadline"),
+            _priority(item.get("priority") or "Medium", f"next_steps[{i}].priority"),
+        ))
+    return steps
+
+def _parse_summary(value):
+    value = _object(value, "management_summary")
+    return ManagementSummary(*(_text_list(value.get(f), f"management_summary.{f}") for f in SUMMARY_FIELDS))
+
+SECTION_PARSERS = {
+    "scores": _parse_scores,
+    "strengths": lambda v: _area_lists(v, "strengths"),
+    "improvements": lambda v: _area_lists(v, "improvements"),
+    "examples": lambda v: _area_lists(v, "examples"),
+    "pain_points": _parse_pain_points,
+    "buying_signals": _parse_buying_signals,
+    "next_steps": _parse_next_steps,
+    "management_summary": _parse_summary,
+}
+
+def parse_section(name, value):
+    """
+    The typed value of one section. Raises SchemaError({name: message}) if it does not fit.
+    """
+    try:
+        return SECTION_PARSERS[name](value)
+    except _Invalid as e:
+        raise SchemaError({name: str(e)}) from None
+
+def validate_sections(data, names=SECTIONS):
+    """
+    Validates the named sections of a (possibly partial) analysis dict. Returns
+    ({section: typed value}, {section: error message}); missing sections are errors.
+    """
+    sections, errors = {}, {}
+    for name in names:
+        if not isinstance(data, dict) or name not in data:
+            errors[name] = "missing"
+            continue
+        try:
+            sections[name] = parse_section(name, data[name])
+        except SchemaError as e:
+            errors.update(e.errors)
+    return sections, errors
+
+def section_schema(names):
+    """
+    The part of the prompt schema covering only `names`, for asking again for failed sections.
+    """
+    return {name: _SCHEMA_EXAMPLE[name] for name in names}
+
+_SCHEMA_EXAMPLE = {
+    "scores": {key: "1-5" for key in SCORE_KEYS},
+    "strengths": {"area_name": ["specific strength points"]},
+    "improvements": {"area_name": ["specific improvement points"]},
+    "examples": {"area_name": ["specific transcript examples"]},
+    "pain_points": {
+        "operational": ["list of operational challenges"],
+        "technical": ["list of technical challenges"],
+        "financial": ["list of financial concerns"],
+        "priority_level": {"pain_point": "High/Medium/Low"},
+    },
+    "buying_signals": {"positive": ["list of positive signals"], "concerns": ["list of concerns/objections"]},
+    "next_steps": [
+        {"action": "specific task", "owner": "responsible party", "deadline": "timeframe", "priority": "High/Medium/Low"}
+    ],
+    "management_summary": {
+        "key_points": ["list of key discussion points"],
+        "decisions": ["list of decisions made"],
+        "risks": ["identified risks"],
+        "recommendations": ["key recommendations"],
+    },
+}
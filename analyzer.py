@@ -0,0 +1,704 @@
+# analyzer.py
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import streamlit as st
+
+from analysis_cache import get_analysis_cache, make_cache_key
+from analysis_model import (
+    SCORE_KEYS, SECTION_PARSERS, SECTIONS, Analysis, SchemaError, parse_section, section_schema,
+    section_to_dict, validate_sections,
+)
+from database import fetch_result_analysis
+from llm_router import get_llm_router
+from metrics import span
+from preprocess import completion_budget, count_tokens, prepare_transcript
+
+SYSTEM_PROMPT = (
+    "You are an expert sales coach analyzing demo performance. "
+    "Return ONLY a valid JSON object with no additional text."
+)
+
+# The official fields
+ANALYSIS_SCHEMA = """{
+    "scores": {
+        "discovery": 1-5,
+        "value_proposition": 1-5,
+        "technical_clarity": 1-5,
+        "objection_handling": 1-5,
+        "demo_flow": 1-5,
+        "next_steps": 1-5
+    },
+    "strengths": {
+        "area_name": ["specific strength points"]
+    },
+    "improvements": {
+        "area_name": ["specific improvement points"]
+    },
+    "examples": {
+        "area_name": ["specific transcript examples"]
+    },
+    "pain_points": {
+        "operational": ["list of operational challenges"],
+        "technical": ["list of technical challenges"],
+        "financial": ["list of financial concerns"],
+        "priority_level": {
+            "pain_point": "High/Medium/Low"
+        }
+    },
+    "buying_signals": {
+        "positive": ["list of positive signals"],
+        "concerns": ["list of concerns/objections"]
+    },
+    "next_steps": [
+        {
+            "action": "specific task",
+            "owner": "responsible party",
+            "deadline": "timeframe",
+            "priority": "High/Medium/Low"
+        }
+    ],
+    "management_summary": {
+        "key_points": ["list of key discussion points"],
+        "decisions": ["list of decisions made"],
+        "risks": ["identified risks"],
+        "recommendations": ["key recommendations"]
+    }
+}"""
+
+# A speaker turn starts at a line like "Jane Doe: ...", "[00:12:03] Rep: ..." or "SPEAKER 2: ...".
+SPEAKER_TURN_RE = re.compile(r"^[ \t]*(?:\[?\d{1,2}:\d{2}(?::\d{2})?\]?[ \t]*)?[A-Za-z][\w .'()\-]{0,40}:", re.M)
+
+PRIORITY_RANK = {"High": 3, "Medium": 2, "Low": 1}
+
+
+# -------------------------------------------
+# Transcript chunking
+# -------------------------------------------
+def split_speaker_turns(transcript: str) -> list:
+    """
+    Splits a transcript into speaker turns. Falls back to paragraphs when there are no speaker labels.
+    """
+    starts = [m.start() for m in SPEAKER_TURN_RE.finditer(transcript)]
+    if not starts:
+        return [p for p in re.split(r"\n\s*\n", transcript) if p.strip()]
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(transcript)]
+    turns = [transcript[a:b] for a, b in zip(bounds, bounds[1:])]
+    return [t for t in turns if t.strip()]
+
+def _split_oversized_turn(turn: str, max_tokens: int) -> list:
+    # A single monologue longer than a chunk: break it on sentence boundaries.
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", turn):
+        if current and count_tokens(current + " " + sentence) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    # Sentences that are still too long get cut by characters.
+    max_chars = max_tokens * 4
+    return [p[i:i + max_chars] for p in pieces for i in range(0, len(p), max_chars)]
+
+def chunk_transcript(transcript: str, max_chunk_tokens: int) -> list:
+    """
+    Packs consecutive speaker turns into chunks of at most max_chunk_tokens (see preprocess.count_tokens).
+    Turns are never split unless a single turn exceeds the budget on its own.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for turn in split_speaker_turns(transcript):
+        turn_tokens = count_tokens(turn)
+        if turn_tokens > max_chunk_tokens:
+            pieces = _split_oversized_turn(turn, max_chunk_tokens)
+        else:
+            pieces = [turn]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_chunk_tokens:
+                chunks.append("".join(current).strip())
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("".join(current).strip())
+    return chunks
+
+
+# -------------------------------------------
+# Merging partial analyses
+# -------------------------------------------
+def _extend_unique(target: list, items):
+    seen = {str(x).strip().lower() for x in target}
+    for item in items or []:
+        marker = str(item).strip().lower()
+        if marker not in seen:
+            seen.add(marker)
+            target.append(item)
+
+def _merge_area_lists(partials, section):
+    merged = {}
+    for partial in partials:
+        for area, points in (partial.get(section) or {}).items():
+            if isinstance(points, list):
+                _extend_unique(merged.setdefault(area, []), points)
+    return merged
+
+def merge_analyses(partials: list) -> dict:
+    """
+    Deterministically combines per-chunk analyses into one dict with the analysis schema:
+    scores are averaged, lists are concatenated without duplicates, and for pain point
+    priorities the highest level reported by any chunk wins.
+    """
+    merged = {}
+
+    scores = {}
+    for key in SCORE_KEYS:
+        values = [p.get("scores", {}).get(key) for p in partials]
+        values = [v for v in values if isinstance(v, (int, float))]
+        if values:
+            scores[key] = round(sum(values) / len(values))
+    merged["scores"] = scores
+
+    for section in ("strengths", "improvements", "examples"):
+        merged[section] = _merge_area_lists(partials, section)
+
+    pain_points = _merge_area_lists(
+        [{"pain_points": {k: v for k, v in (p.get("pain_points") or {}).items() if k != "priority_level"}}
+         for p in partials],
+        "pain_points",
+    )
+    priority_level = {}
+    for partial in partials:
+        for point, level in ((partial.get("pain_points") or {}).get("priority_level") or {}).items():
+            if PRIORITY_RANK.get(level, 0) > PRIORITY_RANK.get(priority_level.get(point), 0):
+                priority_level[point] = level
+    pain_points["priority_level"] = priority_level
+    merged["pain_points"] = pain_points
+
+    merged["buying_signals"] = _merge_area_lists(partials, "buying_signals")
+    merged["management_summary"] = _merge_area_lists(partials, "management_summary")
+
+    next_steps, seen_actions = [], set()
+    for partial in partials:
+        for item in partial.get("next_steps") or []:
+            if not isinstance(item, dict):
+                continue
+            action = str(item.get("action", "")).strip().lower()
+            if action not in seen_actions:
+                seen_actions.add(action)
+                next_steps.append(item)
+    merged["next_steps"] = next_steps
+    return merged
+
+def extract_sections(response_text: str) -> dict:
+    """
+    Parses a model response as a JSON object. When that fails (text around the object, a
+    response cut off at max_tokens, one malformed value) returns the top-level members that
+    did close, so only the rest has to be asked for again. Raises ValueError if there are none.
+    """
+    try:
+        data = json.loads(response_text)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+    parser, sections = SectionStreamParser(), {}
+    # Line by line, so a malformed value only loses the members closing on its line.
+    for line in response_text.splitlines(keepends=True):
+        try:
+            sections.update(parser.feed(line))
+        except json.JSONDecodeError:
+            break
+    if not sections:
+        raise ValueError("No valid JSON object found in response.")
+    return sections
+
+
+class SectionStreamParser:
+    """
+    Incremental parser for a streamed JSON object. feed() takes the next piece of text and
+    returns the (key, value) pairs of top-level members whose values closed in it, so each
+    section can be used before the rest of the object has arrived. Text before the opening
+    brace (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def _emit(self, end):
+        pair = (self._key, json.loads(self.buffer[self._value_start:end]))
+        self._key = self._key_start = self._value_start = None
+        return pair
+
+    def feed(self, text: str) -> list:
+        self.buffer += text
+        sections = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf) and not self.done:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None:
+                        self._key = json.loads(buf[self._key_start:i + 1])
+            elif self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = i
+            elif ch == ":" and self._depth == 1 and self._value_start is None and self._key is not None:
+                self._value_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    # End of the top-level object; flush a trailing scalar value, if any.
+                    if self._value_start is not None:
+                        sections.append(self._emit(i))
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 1 and self._value_start is not None:
+                        sections.append(self._emit(i + 1))
+            elif ch == "," and self._depth == 1 and self._value_start is not None:
+                sections.append(self._emit(i))
+            i += 1
+        self._pos = i
+        return sections
+
+
+def report_analysis_error(e: Exception):
+    st.error(f"Analysis error: {str(e)}")
+    response_text = getattr(e, "response_text", "")
+    if response_text:
+        st.error(f"Raw response: {response_text[:500]}...")
+
+
+# -------------------------------------------
+# DemoAnalyzer
+# -------------------------------------------
+class DemoAnalyzer:
+    MODEL = "gpt-3.5-turbo"
+    CONTEXT_WINDOW = 16385
+    # Bump whenever the prompts below change so cached analyses are not reused across prompts.
+    PROMPT_VERSION = "2"
+    # Bump whenever preprocess.py changes what is sent for the same transcript.
+    PREPROCESS_VERSION = "2"
+    TEMPERATURE = 0
+    # max_tokens is sized per request between these (see preprocess.completion_budget).
+    MIN_COMPLETION_TOKENS = 800
+    MAX_TOKENS = 1500
+    # Prepared transcripts longer than this many tokens lose turns from the middle.
+    INPUT_TOKEN_BUDGET = 60000
+    # Transcripts longer than this (estimated tokens) are analyzed chunk by chunk and merged.
+    CHUNK_TOKENS = 6000
+    MAX_CONCURRENCY = 4
+    # Ask for a JSON object via response_format (OpenAI JSON mode); off for endpoints without it.
+    JSON_MODE = True
+    # Follow-up requests for sections that are missing or fail validation (see _repair).
+    SECTION_RETRIES = 1
+    # On a cache miss, reuse the saved analysis of a stored transcript at least this similar
+    # (estimated Jaccard over word 3-shingles, see similarity.py) instead of calling the model.
+    REUSE_DUPLICATES = True
+    DUPLICATE_THRESHOLD = 0.9
+
+    def __init__(self, rate_limiter=None):
+        general = st.secrets["general"]
+        # Endpoints, fallback order, timeouts and hedging: see llm_router.py.
+        # MODEL is the model of the default route when no [[llm_routes]] are configured.
+        self.router = get_llm_router(self.MODEL)
+        self.max_concurrency = int(general.get("ANALYSIS_CONCURRENCY", self.MAX_CONCURRENCY))
+        self.input_token_budget = int(general.get("ANALYSIS_INPUT_TOKEN_BUDGET", self.INPUT_TOKEN_BUDGET))
+        self.json_mode = bool(general.get("ANALYSIS_JSON_MODE", self.JSON_MODE))
+        self.section_retries = int(general.get("ANALYSIS_SECTION_RETRIES", self.SECTION_RETRIES))
+        self.reuse_duplicates = bool(general.get("ANALYSIS_REUSE_DUPLICATES", self.REUSE_DUPLICATES))
+        self.duplicate_threshold = float(general.get("ANALYSIS_DUPLICATE_THRESHOLD", self.DUPLICATE_THRESHOLD))
+        # Optional object with an acquire() method, called before every API request.
+        self.rate_limiter = rate_limiter
+        self.cache = get_analysis_cache()
+        self.last_cache_hit = False
+        self.last_duplicate_of = None
+        self.last_chunk_count = 0
+        self.last_chunk_failures = []
+        self.last_preprocess = None
+
+    def cache_key(self, transcript: str) -> str:
+        return make_cache_key(
+            transcript,
+            self.MODEL,
+            self.PROMPT_VERSION,
+            {
+                "temperature": self.TEMPERATURE,
+                "max_tokens": self.MAX_TOKENS,
+                "chunk_tokens": self.CHUNK_TOKENS,
+                "preprocess": self.PREPROCESS_VERSION,
+                "input_token_budget": self.input_token_budget,
+                "json_mode": self.json_mode,
+            },
+        )
+
+    def prepare(self, transcript: str) -> str:
+        """
+        Cleans the transcript and fits it to the input budget (see preprocess.py).
+        The savings are kept in last_preprocess and recorded as a metrics span.
+        """
+        with span("llm", "preprocess") as attrs:
+            prepared = prepare_transcript(transcript, self.input_token_budget)
+            attrs.update(
+                original_tokens=prepared.original_tokens,
+                tokens=prepared.tokens,
+                tokens_saved=prepared.tokens_saved,
+                turns_omitted=prepared.turns_omitted,
+            )
+        self.last_preprocess = prepared
+        return prepared.text
+
+    def max_tokens_for(self, messages: list) -> int:
+        prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+        return completion_budget(prompt_tokens, self.MIN_COMPLETION_TOKENS, self.MAX_TOKENS, self.CONTEXT_WINDOW)
+
+    def analyze_demo_performance(self, transcript: str) -> dict:
+        """
+        Analyzes a transcript for display. Errors are reported with st.error and yield {}.
+        """
+        with span("analysis", "analyze_demo_performance") as attrs:
+            try:
+                analysis = self.analyze(transcript)
+            except Exception as e:
+                attrs["error"] = type(e).__name__
+                report_analysis_error(e)
+                return {}
+            attrs["cache_hit"] = self.last_cache_hit
+            if self.last_duplicate_of is not None:
+                attrs["duplicate_of"] = self.last_duplicate_of
+            if not self.last_cache_hit:
+                attrs["chunks"] = self.last_chunk_count
+            if self.last_chunk_failures:
+                failures = self.last_chunk_failures
+                attrs["failed_chunks"] = len(failures)
+                st.warning(
+                    f"{len(failures)} of {self.last_chunk_count} transcript parts could not be analyzed: {failures[0]}"
+                )
+            return analysis
+
+    def analyze(self, transcript: str) -> dict:
+        """
+        Analyzes a transcript, using the analysis cache. Raises on API or parse errors.
+        """
+        key = self.cache_key(transcript)
+        cached = self.cache.get(key)
+        self.last_cache_hit = cached is not None
+        self.last_chunk_failures = []
+        if cached is not None:
+            return cached
+        duplicate = self.reuse_duplicate(key, transcript)
+        if duplicate is not None:
+            return duplicate
+
+        analysis, missing, self.last_chunk_failures = self._analyze_uncached(transcript)
+        # An analysis with sections that never validated, or missing transcript parts, is
+        # returned but not cached.
+        if analysis and not missing and not self.last_chunk_failures:
+            self.cache.put(key, analysis, self.MODEL, self.PROMPT_VERSION)
+        return analysis
+
+    def reuse_duplicate(self, key: str, transcript: str):
+        """
+        The saved analysis of a stored near-duplicate of this transcript, now also cached under
+        `key`, or None. Saved analyses that no longer validate as complete are not reused.
+        """
+        self.last_duplicate_of = None
+        if not self.reuse_duplicates:
+            return None
+        # Imported here: similarity.py brings in numpy, which only this path needs.
+        from similarity import get_similarity_index
+
+        with span("analysis", "find_duplicate") as attrs:
+            match = get_similarity_index().find_duplicate(transcript, self.duplicate_threshold)
+            attrs["found"] = match is not None
+            if match is None:
+                return None
+            result_id, similarity = match
+            attrs.update(duplicate_of=result_id, similarity=round(similarity, 3))
+            try:
+                saved = fetch_result_analysis(result_id)
+            except psycopg2.Error:
+                saved = None
+            sections, errors = validate_sections(saved or {})
+            attrs["reused"] = not errors
+            if errors:
+                return None
+        analysis = Analysis(**sections).to_dict()
+        self.cache.put(key, analysis, self.MODEL, self.PROMPT_VERSION)
+        self.last_cache_hit = True
+        self.last_duplicate_of = result_id
+        return analysis
+
+    def analyze_stream(self, transcript: str):
+        """
+        Generator of (section_name, value) pairs, yielded as each top-level section of the
+        analysis closes in the streamed completion. Cached analyses and long (chunked)
+        transcripts yield all sections at once. Raises on API or parse errors.
+        """
+        with span("analysis", "analyze_stream") as attrs:
+            yield from self._analyze_stream(transcript, attrs)
+
+    def _analyze_stream(self, transcript: str, attrs: dict):
+        key = self.cache_key(transcript)
+        cached = self.cache.get(key)
+        self.last_cache_hit = attrs["cache_hit"] = cached is not None
+        self.last_chunk_failures = []
+        if cached is not None:
+            yield from cached.items()
+            return
+        duplicate = self.reuse_duplicate(key, transcript)
+        if duplicate is not None:
+            attrs["duplicate_of"] = self.last_duplicate_of
+            yield from duplicate.items()
+            return
+
+        transcript = self.prepare(transcript)
+        chunks = chunk_transcript(transcript, self.CHUNK_TOKENS)
+        self.last_chunk_count = attrs["chunks"] = len(chunks)
+        if len(chunks) > 1:
+            analysis, missing, self.last_chunk_failures = self._map_reduce(chunks)
+            if self.last_chunk_failures:
+                attrs["failed_chunks"] = len(self.last_chunk_failures)
+            if analysis and not missing and not self.last_chunk_failures:
+                self.cache.put(key, analysis, self.MODEL, self.PROMPT_VERSION)
+            yield from analysis.items()
+            return
+
+        user_prompt = self.build_prompt(transcript)
+        parser = SectionStreamParser()
+        valid = {}
+        for delta in self._create_completion(user_prompt, stream=True):
+            for name, value in parser.feed(delta):
+                # Sections that fail validation are held back and asked for again below.
+                if name in SECTION_PARSERS:
+                    try:
+                        valid[name] = parse_section(name, value)
+                    except SchemaError:
+                        continue
+                    yield name, section_to_dict(valid[name])
+
+        response_text = parser.buffer.strip()
+        streamed = set(valid)
+        data = valid if streamed == set(SECTIONS) else self._parse_response(response_text)
+        analysis, missing = self._repair(user_prompt, response_text, data, valid)
+        for name, value in analysis.items():
+            if name not in streamed:
+                yield name, value
+        if not missing:
+            self.cache.put(key, analysis, self.MODEL, self.PROMPT_VERSION)
+
+    def _create_completion(self, user_prompt: str, stream=False, validate=None, followup=None):
+        """
+        Sends one chat completion request through the router. Returns the response text, or
+        with stream=True a generator of text deltas. `validate` (see LLMRouter.complete)
+        rejects a response so that another route's is used instead. `followup` is
+        (previous response, next user message) to continue the conversation.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        messages = self._messages(user_prompt)
+        if followup is not None:
+            previous, message = followup
+            messages += [{"role": "assistant", "content": previous}, {"role": "user", "content": message}]
+        request = {
+            "messages": messages,
+            "temperature": self.TEMPERATURE,
+            "max_tokens": self.max_tokens_for(messages),
+        }
+        if self.json_mode:
+            request["response_format"] = {"type": "json_object"}
+        if stream:
+            return self.router.stream(request)
+        text, _route = self.router.complete(request, validate=validate)
+        return text
+
+    @staticmethod
+    def _messages(user_prompt: str) -> list:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _parse_response(self, response_text: str) -> dict:
+        """
+        extract_sections, recording whether the sections had to be salvaged from a response
+        that is not one clean JSON object. A response with nothing usable in it gives {},
+        which _repair treats like one with every section invalid.
+        """
+        with span("llm", "parse", chars=len(response_text)) as attrs:
+            try:
+                data = json.loads(response_text)
+            except json.JSONDecodeError:
+                data = None
+            attrs["fallback"] = not isinstance(data, dict)
+            if attrs["fallback"]:
+                try:
+                    data = extract_sections(response_text)
+                except ValueError:
+                    data = {}
+            attrs["sections"] = len(data)
+        return data
+
+    def _repair(self, user_prompt: str, response_text: str, data: dict, valid=None):
+        """
+        Validates the sections of `data` not already in `valid` (section -> typed value) and
+        asks again, up to section_retries times, for only the sections that are missing or
+        invalid. Returns (analysis dict, names of sections still invalid, filled with empty
+        values). Raises SchemaError (with `response_text`) if no section is valid at all.
+        """
+        valid = dict(valid or {})
+        typed, errors = validate_sections(data, [name for name in SECTIONS if name not in valid])
+        valid.update(typed)
+        for attempt in range(1, self.section_retries + 1):
+            if not errors:
+                break
+            with span("llm", "section_retry", attempt=attempt, sections=",".join(errors)) as attrs:
+                try:
+                    retry_text = self._create_completion(
+                        user_prompt,
+                        validate=extract_sections,
+                        followup=(response_text, self.build_retry_prompt(errors)),
+                    )
+                    typed, errors = validate_sections(self._parse_response(retry_text), list(errors))
+                except Exception as e:
+                    # Keep what validated; the remaining sections stay empty.
+                    attrs["error"] = type(e).__name__
+                    break
+                valid.update(typed)
+                attrs["fixed"] = len(typed)
+        if not valid:
+            e = SchemaError(errors)
+            e.response_text = response_text
+            raise e
+        return Analysis(**valid).to_dict(), sorted(errors)
+
+    def _complete_analysis(self, user_prompt: str):
+        """
+        One chat completion, validated section by section, with failed sections asked for
+        again (see _repair). Returns (analysis dict, sections still invalid). Raises on API
+        errors or when nothing in the response validates.
+        """
+        # A response with no usable JSON at all loses to another route's, if there is one.
+        response_text = self._create_completion(user_prompt, validate=extract_sections)
+        return self._repair(user_prompt, response_text, self._parse_response(response_text))
+
+    def _analyze_uncached(self, transcript: str):
+        """
+        Returns (analysis dict, sections still invalid, exceptions of failed chunks).
+        """
+        transcript = self.prepare(transcript)
+        chunks = chunk_transcript(transcript, self.CHUNK_TOKENS)
+        self.last_chunk_count = len(chunks)
+        if len(chunks) <= 1:
+            return (*self._complete_analysis(self.build_prompt(transcript)), [])
+        return self._map_reduce(chunks)
+
+    def _map_reduce(self, chunks: list):
+        """
+        Analyzes chunks concurrently (at most max_concurrency calls in flight), merges the
+        partial results and asks the model to consolidate the merged analysis in one final call.
+        Returns (analysis dict, sections still invalid, exceptions of the chunks that failed);
+        raises if every chunk fails.
+        """
+        prompts = [self.build_chunk_prompt(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)]
+
+        def analyze_chunk(prompt):
+            try:
+                return self._complete_analysis(prompt)[0]
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(prompts))) as pool:
+            results = list(pool.map(analyze_chunk, prompts))
+
+        partials = [r for r in results if isinstance(r, dict)]
+        failures = [r for r in results if not isinstance(r, dict)]
+        if not partials:
+            raise failures[0]
+
+        sections, merge_errors = validate_sections(merge_analyses(partials))
+        merged = Analysis(**sections).to_dict()
+        try:
+            analysis, missing = self._complete_analysis(self.build_reduce_prompt(merged))
+        except Exception:
+            if not sections:
+                raise
+            # Fall back to the deterministic merge; sections it got wrong stay reported as missing.
+            return merged, sorted(merge_errors), failures
+        # Sections the consolidation call never got right come from the merge.
+        analysis.update({name: merged[name] for name in missing})
+        return analysis, sorted(set(missing) & set(merge_errors)), failures
+
+    @staticmethod
+    def build_prompt(transcript: str) -> str:
+        return f"""
+Analyze this demo transcript and return a JSON object with exactly these fields:
+
+{ANALYSIS_SCHEMA}
+
+TRANSCRIPT:
+{transcript}
+"""
+
+    @staticmethod
+    def build_chunk_prompt(chunk: str, part: int, total: int) -> str:
+        return f"""
+This is part {part} of {total} of a longer demo transcript. Analyze only what happens in this part
+and return a JSON object with exactly these fields (use empty lists for anything not covered here):
+
+{ANALYSIS_SCHEMA}
+
+TRANSCRIPT (PART {part}/{total}):
+{chunk}
+"""
+
+    @staticmethod
+    def build_reduce_prompt(merged: dict) -> str:
+        return f"""
+The JSON below combines analyses of consecutive parts of ONE demo transcript.
+Consolidate it into a single analysis of the whole demo: merge duplicate or overlapping points,
+keep the most specific examples, make the scores reflect the demo as a whole, and return a JSON
+object with exactly these fields:
+
+{ANALYSIS_SCHEMA}
+
+COMBINED PARTIAL ANALYSES:
+{json.dumps(merged)}
+"""
+
+    @staticmethod
+    def build_retry_prompt(errors: dict) -> str:
+        problems = "\n".join(f"- {name}: {message}" for name, message in errors.items())
+        return f"""
+These fields of your JSON were missing or invalid:
+{problems}
+
+Return a JSON object with ONLY these fields, corrected (scores are whole numbers from 1 to 5):
+
+{json.dumps(section_schema(errors), indent=4)}
+"""
@@ -0,0 +1,191 @@
+# batch.py
+import csv
+import io
+import os
+import random
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+
+CSV_COLUMNS = ("rep_name", "customer_name", "demo_date", "transcript")
+MANIFEST_NAME = "manifest.csv"
+# Zip entries without a manifest row may encode metadata in the file name:
+# "<rep_name>__<customer_name>__<YYYY-MM-DD>.txt"
+FILENAME_META_RE = re.compile(r"^(?P<rep>.+?)__(?P<customer>.+)__(?P<date>\d{4}-\d{2}-\d{2})$")
+
+
+@dataclass
+class BatchItem:
+    rep_name: str
+    customer_name: str
+    demo_date: date
+    transcript: str
+    source: str = ""
+
+
+@dataclass
+class BatchResult:
+    item: BatchItem
+    analysis: dict = field(default_factory=dict)
+    error: str = ""
+    attempts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ok(self):
+        return bool(self.analysis)
+
+
+# -------------------------------------------
+# Loading uploads
+# -------------------------------------------
+def _parse_date(value: str) -> date:
+    return date.fromisoformat(value.strip()) if value and value.strip() else None
+
+def load_csv(data: bytes, source="upload.csv") -> list:
+    """
+    Reads a CSV with columns rep_name, customer_name, demo_date (YYYY-MM-DD), transcript.
+    """
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    missing = [c for c in CSV_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"{source}: missing column(s) {', '.join(missing)}")
+    items = []
+    for line_no, row in enumerate(reader, start=2):
+        if not (row["transcript"] or "").strip():
+            continue
+        # DictReader fills the fields of a short row with None.
+        rep_name = (row["rep_name"] or "").strip()
+        if not rep_name:
+            raise ValueError(f"{source}:{line_no}: missing rep_name")
+        items.append(BatchItem(
+            rep_name=rep_name,
+            customer_name=(row["customer_name"] or "").strip(),
+            demo_date=_parse_date(row["demo_date"]),
+            transcript=row["transcript"],
+            source=f"{source}:{line_no}",
+        ))
+    return items
+
+def load_zip(data: bytes) -> list:
+    """
+    Reads a zip of .txt transcripts. Metadata comes from manifest.csv (columns file, rep_name,
+    customer_name, demo_date) or, for files not in the manifest, from the file name
+    "<rep_name>__<customer_name>__<YYYY-MM-DD>.txt". A .csv inside the zip is read like load_csv.
+    """
+    items = []
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = [n for n in zf.namelist() if not n.endswith("/")]
+        manifest = {}
+        manifest_path = next((n for n in names if os.path.basename(n) == MANIFEST_NAME), None)
+        if manifest_path:
+            for row in csv.DictReader(io.StringIO(zf.read(manifest_path).decode("utf-8-sig"))):
+                manifest[row["file"].strip()] = row
+
+        for name in sorted(names):
+            base = os.path.basename(name)
+            if name == manifest_path:
+                continue
+            if base.lower().endswith(".csv"):
+                items.extend(load_csv(zf.read(name), source=name))
+                continue
+            if not base.lower().endswith(".txt"):
+                continue
+            transcript = zf.read(name).decode("utf-8-sig")
+            meta = manifest.get(name) or manifest.get(base)
+            if meta:
+                rep, customer, demo_date = meta["rep_name"], meta.get("customer_name", ""), meta.get("demo_date", "")
+            else:
+                m = FILENAME_META_RE.match(os.path.splitext(base)[0])
+                if not m:
+                    raise ValueError(f"{name}: not in {MANIFEST_NAME} and name is not rep__customer__YYYY-MM-DD.txt")
+                rep, customer, demo_date = m.group("rep"), m.group("customer"), m.group("date")
+            if not (rep or "").strip():
+                raise ValueError(f"{name}: missing rep_name in {MANIFEST_NAME}")
+            items.append(BatchItem(
+                rep_name=rep.strip(),
+                customer_name=(customer or "").strip(),
+                demo_date=_parse_date(demo_date),
+                transcript=transcript,
+                source=name,
+            ))
+    return items
+
+def load_batch_file(file_name: str, data: bytes) -> list:
+    if file_name.lower().endswith(".zip"):
+        return load_zip(data)
+    return load_csv(data, source=file_name)
+
+
+# -------------------------------------------
+# Rate limiting & concurrent execution
+# -------------------------------------------
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate_per_minute` acquisitions per minute on average,
+    with bursts of up to `capacity`. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, int(rate_per_minute // 10))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _analyze_with_retry(analyzer, item: BatchItem, max_retries: int, base_delay: float) -> BatchResult:
+    result = BatchResult(item=item)
+    started = time.monotonic()
+    for attempt in range(max_retries + 1):
+        result.attempts = attempt + 1
+        try:
+            result.analysis = analyzer.analyze(item.transcript)
+            if result.analysis:
+                result.error = ""
+                break
+            result.error = "Empty analysis"
+        except Exception as e:
+            result.error = str(e)
+        if attempt < max_retries:
+            # Exponential backoff with full jitter
+            time.sleep(random.uniform(0, base_delay * (2 ** attempt)))
+    result.seconds = time.monotonic() - started
+    return result
+
+def run_batch(items, analyzer, concurrency=4, max_retries=3, base_delay=1.0, on_progress=None):
+    """
+    Analyzes items on a pool of `concurrency` threads, retrying failures with exponential backoff.
+    Rate limiting is applied per API request by the analyzer's rate_limiter (see TokenBucket).
+    on_progress(done, total, result) is called from the calling thread as each item finishes,
+    so it may safely update Streamlit elements. Returns results in input order.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {
+            pool.submit(_analyze_with_retry, analyzer, item, max_retries, base_delay): i
+            for i, item in enumerate(items)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[futures[future]] = result
+            if on_progress:
+                on_progress(done, len(items), result)
+    return results
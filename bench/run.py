@@ -0,0 +1,557 @@
+# bench/run.py
+"""
+Reproducible performance benchmark for the app's hot paths.
+
+    python -m bench.run --pg-database bench --reset --demos 20000 --reps 200 --output bench.json
+
+Seeds a scratch PostgreSQL database with synthetic reps and demo_analysis rows, then times
+the database.py queries, analysis JSON decoding, page/report rendering (via Streamlit's
+AppTest), DemoAnalyzer against a local stub completions server (stub_llm.py) with
+configurable latency, llm_router hedging/fallback against two stub endpoints, cold-import
+and pooled-vs-new-client call times, and MinHash/LSH signature backfill, near-duplicate recall
+and similar-demo lookups against a linear scan. Prints one
+JSON document with latency percentiles, throughput and peak traced memory per benchmark, so
+results can be diffed between commits.
+
+The run writes its own secrets.toml (database + stub endpoint) into a temporary directory
+and works from there; it never touches the app's real secrets. --reset TRUNCATES the app
+tables in the target database, so only point it at a scratch database.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# -------------------------------------------
+# Measurement helpers
+# -------------------------------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, wall_seconds, peak_bytes, items=None):
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "n": len(values),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(_percentile(values, 50)),
+        "p90_ms": ms(_percentile(values, 90)),
+        "p99_ms": ms(_percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+        "throughput_per_s": round((items or len(values)) / wall_seconds, 2) if wall_seconds else None,
+        "peak_traced_mb": round(peak_bytes / 2**20, 3),
+    }
+
+def measure(results, name, fn, repeat=20, warmup=1, items=None):
+    """
+    Calls fn() `repeat` times after `warmup` untimed calls and stores summary stats under name.
+    `items` is the number of logical items processed per call, for throughput.
+    """
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[name] = summarize(latencies, wall, peak, items=(items or 1) * repeat)
+    print(f"  {name}: p50 {results[name]['p50_ms']} ms, p99 {results[name]['p99_ms']} ms", file=sys.stderr)
+
+
+# -------------------------------------------
+# Environment
+# -------------------------------------------
+def write_secrets(args, workdir):
+    """
+    Writes .streamlit/secrets.toml for the bench database and stub endpoint into workdir.
+    """
+    os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as fh:
+        fh.write(
+            f"""[postgres]
+host = {json.dumps(args.pg_host)}
+port = {args.pg_port}
+database = {json.dumps(args.pg_database)}
+user = {json.dumps(args.pg_user)}
+password = {json.dumps(args.pg_password)}
+pool_max = {max(10, args.llm_concurrency + 4)}
+
+[general]
+FAVICON_URL = ":bar_chart:"
+LOGO_URL = "https://example.com/logo.png"
+EXPLORE_PASSWORD = "bench"
+OPENAI_API_KEY = "bench"
+OPENAI_BASE_URL = "http://127.0.0.1:{args.stub_port}/v1/"
+ANALYSIS_CONCURRENCY = {args.llm_concurrency}
+"""
+        )
+
+
+def reset_tables():
+    from database import transaction
+    with transaction() as cur:
+        cur.execute(
+            "TRUNCATE demo_analysis, demo_minhash, reps, demo_score_rollup, analysis_cache, analysis_job RESTART IDENTITY"
+        )
+
+
+def seed(args, results):
+    from bench.synthetic import make_demo_rows, make_rep_names
+    from database import insert_demo_results, upsert_reps
+
+    reps = make_rep_names(args.reps, seed=args.seed)
+    upsert_reps(reps)
+
+    rows = list(make_demo_rows(reps, args.demos, seed=args.seed))
+    batch = 1000
+    latencies = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch):
+        t0 = time.perf_counter()
+        insert_demo_results(rows[i:i + batch])
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["seed.insert_demo_results_batch_1000"] = summarize(latencies, wall, peak, items=len(rows))
+    return reps
+
+
+# -------------------------------------------
+# Benchmarks
+# -------------------------------------------
+def bench_database(args, results, reps):
+    import database
+
+    rng = random.Random(args.seed)
+    rep_name, _team = rng.choice(reps)
+    filters = {"date_from": date(2023, 1, 1), "date_to": date(2024, 12, 31)}
+    r = args.repeat
+
+    measure(results, "db.fetch_result_filter_options", database.fetch_result_filter_options, repeat=r)
+    measure(results, "db.count_results", lambda: database.count_results(**filters), repeat=r)
+    measure(results, "db.fetch_results.first_page", lambda: database.fetch_results(**filters, page_size=25), repeat=r)
+    measure(results, "db.fetch_results.rep_filter",
+            lambda: database.fetch_results(rep_name=rep_name, **filters, page_size=25), repeat=r)
+    measure(results, "db.fetch_results.score_sort",
+            lambda: database.fetch_results(**filters, sort="score_desc", min_score=3, page_size=25), repeat=r)
+
+    page = database.fetch_results(**filters, page_size=25)
+    deep_cursor = database.results_cursor(database.fetch_results(page_size=args.demos // 2)[-1])
+    measure(results, "db.fetch_results.deep_page",
+            lambda: database.fetch_results(page_size=25, cursor=deep_cursor), repeat=r)
+    ids = [row[0] for row in page]
+    measure(results, "db.fetch_result_analysis",
+            lambda: database.fetch_result_analysis(rng.choice(ids)), repeat=r)
+    measure(results, "db.fetch_all_results", database.fetch_all_results, repeat=max(3, r // 5))
+    measure(results, "db.fetch_score_summary.rep", lambda: database.fetch_score_summary("rep"), repeat=r)
+    measure(results, "db.fetch_score_trend.team", lambda: database.fetch_score_trend("team"), repeat=r)
+    measure(results, "db.fetch_all_reps.cached", database.fetch_all_reps, repeat=r)
+
+    def uncached_reps():
+        database.get_rep_directory().invalidate()
+        database.fetch_all_reps()
+    measure(results, "db.fetch_all_reps.uncached", uncached_reps, repeat=r)
+    measure(results, "db.get_rep_team", lambda: database.get_rep_team(rep_name), repeat=r)
+
+    measure(results, "db.search_results", lambda: database.search_results("Epic integration", **filters), repeat=r)
+    measure(results, "db.search_results.rep_filter",
+            lambda: database.search_results("budget -billing", rep_name=rep_name), repeat=r)
+
+    from bench.synthetic import make_analysis, make_transcript
+    analysis_json = json.dumps(make_analysis(rng))
+    transcript = make_transcript(rng)
+    counter = iter(range(time.time_ns(), time.time_ns() + 10**9))
+    measure(results, "db.save_demo_result",
+            lambda: database.save_demo_result(rep_name, f"Bench {next(counter)}", date.today(), analysis_json, transcript),
+            repeat=r)
+    database.save_demo_result(rep_name, "Bench duplicate", date.today(), analysis_json, transcript)
+    measure(results, "db.save_demo_result.duplicate",
+            lambda: database.save_demo_result(rep_name, "Bench duplicate", date.today(), analysis_json, transcript),
+            repeat=r)
+
+    def save_batch():
+        database.save_demo_results(
+            (database.demo_result_key(rep_name, customer, date.today(), transcript),
+             rep_name, customer, date.today(), analysis_json, transcript)
+            for customer in (f"Bench {next(counter)}" for _ in range(100))
+        )
+    measure(results, "db.save_demo_results_100", save_batch, repeat=max(3, r // 5), items=100)
+
+
+def bench_mirror(args, results, reps, workdir):
+    import database
+    from mirror import AnalyticsMirror
+
+    rng = random.Random(args.seed)
+    rep_name, _team = rng.choice(reps)
+    filters = {"date_from": date(2023, 1, 1), "date_to": date(2024, 12, 31)}
+    r = args.repeat
+    mirror = AnalyticsMirror(os.path.join(workdir, "mirror.sqlite3"), background=False)
+
+    def full_sync():
+        mirror.rebuild()
+        mirror.sync()
+    measure(results, "mirror.sync.full", full_sync, repeat=1, warmup=0, items=database.count_results())
+    measure(results, "mirror.sync.incremental", mirror.sync, repeat=r)
+    measure(results, "mirror.count_results", lambda: mirror.count_results(**filters), repeat=r)
+    measure(results, "mirror.fetch_results.first_page", lambda: mirror.fetch_results(**filters, page_size=25), repeat=r)
+    measure(results, "mirror.fetch_results.rep_filter",
+            lambda: mirror.fetch_results(rep_name=rep_name, page_size=25), repeat=r)
+    measure(results, "mirror.fetch_results.score_sort",
+            lambda: mirror.fetch_results(**filters, sort="score_desc", page_size=25), repeat=r)
+    measure(results, "mirror.fetch_result_filter_options", mirror.fetch_result_filter_options, repeat=r)
+    measure(results, "mirror.fetch_pain_point_summary", lambda: mirror.fetch_pain_point_summary(**filters), repeat=r)
+
+
+def bench_decoding(args, results):
+    import database
+    from bench.synthetic import make_analysis
+
+    rng = random.Random(args.seed)
+    texts = [json.dumps(make_analysis(rng)) for _ in range(25)]
+    measure(results, "decode.analysis_json_page_25", lambda: [json.loads(t) for t in texts],
+            repeat=args.repeat * 5, items=len(texts))
+
+    from bench.synthetic import make_transcript
+    from preprocess import prepare_transcript, token_counter_name
+    long_transcript = make_transcript(rng, turns=args.long_turns)
+    measure(results, "preprocess.long_transcript", lambda: prepare_transcript(long_transcript),
+            repeat=max(3, args.repeat // 2))
+    prepared = prepare_transcript(long_transcript)
+    results["preprocess.long_transcript"].update(
+        original_tokens=prepared.original_tokens,
+        tokens=prepared.tokens,
+        token_counter=token_counter_name(),
+    )
+
+    # Full-table decode, i.e. what the original show_data did on every rerun.
+    measure(results, "decode.fetch_all_results", lambda: [row[5] for row in database.fetch_all_results()],
+            repeat=max(3, args.repeat // 5), items=args.demos)
+
+
+def _render_report_script():
+    # Runs inside AppTest as its own script.
+    import json
+    import os
+    from report import render_report
+    with open(os.environ["BENCH_ANALYSIS_FILE"]) as fh:
+        render_report(json.load(fh))
+
+def bench_rendering(args, results, workdir):
+    from streamlit.testing.v1 import AppTest
+    from bench.synthetic import make_analysis
+
+    analysis_file = os.path.join(workdir, "analysis.json")
+    with open(analysis_file, "w") as fh:
+        json.dump(make_analysis(random.Random(args.seed)), fh)
+    os.environ["BENCH_ANALYSIS_FILE"] = analysis_file
+
+    def render_report():
+        at = AppTest.from_function(_render_report_script, default_timeout=60)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        return at
+    measure(results, "render.report_page", render_report, repeat=args.repeat)
+    # Elements sent to the browser per report, which is what a rerun pays for.
+    results["render.report_page"]["markdown_elements"] = len(render_report().markdown)
+
+    # Building the markdown blocks, against a memo hit (hash + cache lookup).
+    import report
+    analysis = make_analysis(random.Random(args.seed))
+    measure(results, "render.build_report", lambda: report.build_report(analysis), repeat=args.repeat * 10)
+    measure(results, "render.get_report.memoized", lambda: report.get_report(analysis), repeat=args.repeat * 10)
+
+    def explore_rerun():
+        at = AppTest.from_file(os.path.join(REPO_ROOT, "pages", "1_Explore_Results.py"), default_timeout=60)
+        at.session_state["auth"] = True
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    measure(results, "render.explore_page", explore_rerun, repeat=args.repeat)
+
+
+def bench_analyzer(args, results):
+    import stub_llm
+    from analyzer import DemoAnalyzer
+    from batch import BatchItem, run_batch
+    from bench.synthetic import make_transcript
+
+    server, state = stub_llm.serve(port=args.stub_port, latency=args.llm_latency, jitter=args.llm_jitter)
+    try:
+        rng = random.Random(args.seed)
+        analyzer = DemoAnalyzer()
+        # Unique per run as well as per call: the analysis cache persists in the database.
+        counter = iter(range(time.time_ns(), time.time_ns() + 10**9))
+
+        measure(results, "llm.analyze.uncached",
+                lambda: analyzer.analyze(make_transcript(rng) + f"\nRep: run {next(counter)}"),
+                repeat=max(3, args.repeat // 2), warmup=0)
+
+        cached_transcript = make_transcript(rng) + f"\nRep: run {next(counter)}"
+        analyzer.analyze(cached_transcript)
+        measure(results, "llm.analyze.cache_hit", lambda: analyzer.analyze(cached_transcript), repeat=args.repeat)
+
+        long_transcript = make_transcript(rng, turns=args.long_turns)
+        state_before = state.requests
+        measure(results, "llm.analyze.long_transcript",
+                lambda: analyzer.analyze(long_transcript + f"\nRep: run {next(counter)}"), repeat=2, warmup=0)
+        results["llm.analyze.long_transcript"]["requests_per_call"] = (state.requests - state_before) / 2
+
+        items = [
+            BatchItem("Bench Rep", "Bench", date.today(), make_transcript(rng) + f"\nRep: batch {next(counter)}")
+            for _ in range(args.batch_size)
+        ]
+        measure(results, "llm.run_batch",
+                lambda: run_batch(items, analyzer, concurrency=args.llm_concurrency, max_retries=0),
+                repeat=1, warmup=0, items=len(items))
+    finally:
+        server.shutdown()
+
+
+def bench_routing(args, results):
+    """
+    llm_router against two stub endpoints: a primary with a slow tail (--route-slow-rate of
+    requests take --route-slow-latency seconds) and a steady secondary.
+    """
+    import stub_llm
+    from llm_router import LLMRouter, build_routes
+
+    primary, primary_state = stub_llm.serve(
+        port=args.stub_port + 1, latency=args.llm_latency, jitter=args.llm_jitter,
+        slow_rate=args.route_slow_rate, slow_latency=args.route_slow_latency,
+    )
+    secondary, secondary_state = stub_llm.serve(port=args.stub_port + 2, latency=args.llm_latency)
+    configs = [
+        {"name": "primary", "base_url": f"http://127.0.0.1:{args.stub_port + 1}/v1/", "timeout": 30},
+        {"name": "secondary", "base_url": f"http://127.0.0.1:{args.stub_port + 2}/v1/", "timeout": 30},
+    ]
+    request = {"messages": [{"role": "user", "content": "bench"}], "max_tokens": 800}
+    try:
+        for name, percentile in (("unhedged", 0), ("hedged_p90", 0.9)):
+            router = LLMRouter(build_routes(configs, "bench"), hedge_percentile=percentile,
+                               hedge_min_samples=10, hedge_after_seconds=args.route_slow_latency)
+            # Latency history for the hedge delay.
+            for _ in range(10):
+                router.complete(request)
+            before = secondary_state.requests
+            measure(results, f"route.{name}", lambda: router.complete(request), repeat=args.repeat * 2, warmup=0)
+            results[f"route.{name}"]["secondary_requests"] = secondary_state.requests - before
+
+        # Primary down: the breaker should stop sending it requests after a few failures.
+        primary_state.fail_rate = 1.0
+        router = LLMRouter(build_routes(configs, "bench", breaker_failures=3), hedge_percentile=0)
+        before = primary_state.requests
+        measure(results, "route.primary_down", lambda: router.complete(request), repeat=args.repeat, warmup=0)
+        results["route.primary_down"]["primary_requests"] = primary_state.requests - before
+    finally:
+        primary.shutdown()
+        secondary.shutdown()
+
+
+def bench_startup(args, results):
+    """
+    Cold imports in a fresh interpreter, and a warm call on the process-wide pooled client
+    against a new client (and so a new connection) per call, as before llm_router.
+    """
+    import subprocess
+    import stub_llm
+    from llm_router import LLMRouter, build_routes
+
+    # streamlit is the floor: every page imports it.
+    for module in ("streamlit", "analyzer", "llm_router", "openai"):
+        # warmup=1 fills the OS file cache; each timed call is a new interpreter.
+        measure(results, f"startup.import.{module}", lambda: subprocess.run(
+            [sys.executable, "-c", f"import {module}"], cwd=REPO_ROOT, check=True,
+        ), repeat=max(3, args.repeat // 4))
+
+    server, state = stub_llm.serve(port=args.stub_port + 3, latency=0.0)
+    configs = [{"name": "stub", "base_url": f"http://127.0.0.1:{args.stub_port + 3}/v1/"}]
+    request = {"messages": [{"role": "user", "content": "bench"}], "max_tokens": 800}
+    try:
+        router = LLMRouter(build_routes(configs, "bench"), hedge_percentile=0)
+        before = state.connections
+        measure(results, "startup.call.pooled_client", lambda: router.complete(request), repeat=args.repeat * 2)
+        results["startup.call.pooled_client"]["connections"] = state.connections - before
+
+        before = state.connections
+        measure(results, "startup.call.client_per_call",
+                lambda: LLMRouter(build_routes(configs, "bench"), hedge_percentile=0).complete(request),
+                repeat=args.repeat * 2)
+        results["startup.call.client_per_call"]["connections"] = state.connections - before
+    finally:
+        server.shutdown()
+
+
+def bench_similarity(args, results):
+    """
+    Signature backfill of the seeded transcripts, then lookups on an index of varied
+    transcripts (the seeded ones all share one small phrase list, so every pair looks ~55%
+    similar): near-duplicate recall for lightly edited copies, false matches for unrelated
+    transcripts, and LSH lookup latency against scanning every signature.
+    """
+    import database
+    import numpy as np
+    from bench.synthetic import make_varied_transcript
+    from similarity import NUM_PERM, SimilarityIndex, minhash
+
+    with database.transaction() as cur:
+        cur.execute("TRUNCATE demo_minhash")
+    index = SimilarityIndex(background=False)
+    count = database.count_results()
+    measure(results, "similarity.sync.backfill", index.sync, repeat=1, warmup=0, items=count)
+    measure(results, "similarity.sync.incremental", index.sync, repeat=args.repeat)
+    measure(results, "similarity.load.cold", lambda: SimilarityIndex(background=False).load(), repeat=3,
+            warmup=0, items=count)
+
+    rng = random.Random(args.seed)
+    corpus = [make_varied_transcript(rng) for _ in range(args.demos)]
+    index = SimilarityIndex(background=False)
+    t0 = time.perf_counter()
+    index.add(list(range(len(corpus))), np.stack([minhash(transcript) for transcript in corpus]))
+    results["similarity.index.build"] = {"n": len(corpus), "seconds": round(time.perf_counter() - t0, 3)}
+
+    def edited(transcript, rate):
+        # Drops the timestamps and replaces `rate` of the words, as a re-pasted, touched-up copy would.
+        words = transcript.split()
+        return " ".join(
+            f"x{rng.randrange(10**6)}" if rng.random() < rate else w for w in words if not w.startswith("[")
+        )
+
+    queries = rng.sample(range(len(corpus)), min(200, len(corpus)))
+    for rate in (0.0, 0.01, 0.03):
+        found = sum(
+            (index.find_duplicate(edited(corpus[i], rate)) or (None,))[0] == i for i in queries
+        )
+        results[f"similarity.find_duplicate.recall_edit_{rate}"] = round(found / len(queries), 3)
+    strangers = [make_varied_transcript(rng) for _ in range(len(queries))]
+    results["similarity.find_duplicate.false_matches"] = sum(index.find_duplicate(t) is not None for t in strangers)
+
+    ids = iter(rng.choices(range(len(corpus)), k=args.repeat * 10 + 1))
+    measure(results, "similarity.similar_to.lsh", lambda: index.similar_to(next(ids)), repeat=args.repeat * 10)
+    signatures = index._signatures[:len(corpus)]
+
+    def scan():
+        signature = signatures[next(ids)]
+        scores = (signatures == signature).mean(axis=1)
+        return np.argsort(-scores)[:11]
+    ids = iter(rng.choices(range(len(corpus)), k=args.repeat * 10 + 1))
+    measure(results, "similarity.similar_to.linear_scan", scan, repeat=args.repeat * 10)
+    results["similarity.signature_bytes"] = NUM_PERM * 4
+
+
+# -------------------------------------------
+# Entry point
+# -------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pg-host", default="localhost")
+    parser.add_argument("--pg-port", type=int, default=5432)
+    parser.add_argument("--pg-database", default="bench")
+    parser.add_argument("--pg-user", default="postgres")
+    parser.add_argument("--pg-password", default="")
+    parser.add_argument("--reset", action="store_true", help="truncate app tables and reseed")
+    parser.add_argument("--reps", type=int, default=50)
+    parser.add_argument("--demos", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--stub-port", type=int, default=8799)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub seconds per completion")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--long-turns", type=int, default=2000, help="speaker turns in the long transcript")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--route-slow-rate", type=float, default=0.1,
+                        help="fraction of primary-route requests that are slow (routing group)")
+    parser.add_argument("--route-slow-latency", type=float, default=2.0)
+    parser.add_argument("--only", nargs="*",
+                        choices=["database", "decoding", "rendering", "analyzer", "routing", "startup", "similarity"],
+                        help="run only these groups")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="demo-bench-")
+    write_secrets(args, workdir)
+    # st.secrets reads ./.streamlit/secrets.toml; make the bench config the project config.
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    from migrations import run_migrations
+    run_migrations()
+
+    results = {}
+    groups = set(args.only or ["database", "decoding", "rendering", "analyzer", "routing", "startup", "similarity"])
+    if args.reset:
+        reset_tables()
+        print("Seeding...", file=sys.stderr)
+        reps = seed(args, results)
+    else:
+        from bench.synthetic import make_rep_names
+        reps = make_rep_names(args.reps, seed=args.seed)
+
+    if "database" in groups:
+        print("Database:", file=sys.stderr)
+        bench_database(args, results, reps)
+        bench_mirror(args, results, reps, workdir)
+    if "decoding" in groups:
+        print("Decoding:", file=sys.stderr)
+        bench_decoding(args, results)
+    if "rendering" in groups:
+        print("Rendering:", file=sys.stderr)
+        bench_rendering(args, results, workdir)
+    if "analyzer" in groups:
+        print("Analyzer:", file=sys.stderr)
+        bench_analyzer(args, results)
+    if "routing" in groups:
+        print("Routing:", file=sys.stderr)
+        bench_routing(args, results)
+    if "startup" in groups:
+        print("Startup:", file=sys.stderr)
+        bench_startup(args, results)
+    if "similarity" in groups:
+        print("Similarity:", file=sys.stderr)
+        bench_similarity(args, results)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "demos": args.demos,
+            "reps": args.reps,
+            "seed": args.seed,
+            "llm_latency_s": args.llm_latency,
+            "llm_concurrency": args.llm_concurrency,
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# bench/synthetic.py
+"""
+Synthetic reps, transcripts and analyses shaped like production data, for benchmarks.
+Everything is derived from a seeded random.Random, so runs are reproducible.
+"""
+import json
+import random
+from datetime import date, timedelta
+
+from database import SCORE_KEYS
+
+FIRST_NAMES = ["Alex", "Jordan", "Sam", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST_NAMES = ["Garcia", "Smith", "Nguyen", "Patel", "Johnson", "Kim", "Lopez", "Brown", "Davis", "Wilson"]
+TEAMS = ["DME", "Ortho"]
+CUSTOMERS = ["Northside Clinic", "Lakeview Ortho", "Summit Health", "Riverbend FQHC", "Metro Rehab", "Pine Medical"]
+TOPICS = [
+    "Epic integration", "patient onboarding", "remote monitoring", "billing codes", "prior authorization",
+    "staff training", "HIPAA compliance", "reporting dashboards", "device shipping", "insurance coverage",
+]
+PHRASES = [
+    "Asked detailed questions about {t}",
+    "Did not connect {t} to the customer's goals",
+    "Customer raised concerns about {t}",
+    "Clear walkthrough of {t}",
+    "Follow up on {t} with a written summary",
+    "Confirmed budget owner for {t}",
+]
+
+
+def _points(rng, n):
+    return [rng.choice(PHRASES).format(t=rng.choice(TOPICS)) for _ in range(n)]
+
+
+def make_rep_names(n, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        suffix = f" {len(names)}" if len(names) >= len(FIRST_NAMES) * len(LAST_NAMES) else ""
+        names.add(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{suffix}")
+    return [(name, TEAMS[i % len(TEAMS)]) for i, name in enumerate(sorted(names))]
+
+
+def make_analysis(rng):
+    """
+    One analysis dict in the DemoAnalyzer schema, with realistic list lengths.
+    """
+    scores = {key: rng.randint(1, 5) for key in SCORE_KEYS}
+    areas = rng.sample(list(SCORE_KEYS), 3)
+    pain_points = {
+        "operational": _points(rng, rng.randint(1, 4)),
+        "technical": _points(rng, rng.randint(1, 4)),
+        "financial": _points(rng, rng.randint(0, 3)),
+    }
+    pain_points["priority_level"] = {
+        p: rng.choice(["High", "Medium", "Low"]) for p in pain_points["operational"] + pain_points["technical"]
+    }
+    return {
+        "scores": scores,
+        "strengths": {a: _points(rng, rng.randint(1, 3)) for a in areas[:2]},
+        "improvements": {a: _points(rng, rng.randint(1, 3)) for a in areas[1:]},
+        "examples": {a: _points(rng, 2) for a in areas},
+        "pain_points": pain_points,
+        "buying_signals": {"positive": _points(rng, rng.randint(1, 4)), "concerns": _points(rng, rng.randint(0, 3))},
+        "next_steps": [
+            {
+                "action": point,
+                "owner": rng.choice(["Rep", "Customer", "Solutions"]),
+                "deadline": rng.choice(["This week", "Next week", "End of month"]),
+                "priority": rng.choice(["High", "Medium", "Low"]),
+            }
+            for point in _points(rng, rng.randint(1, 4))
+        ],
+        "management_summary": {
+            "key_points": _points(rng, rng.randint(2, 5)),
+            "decisions": _points(rng, rng.randint(0, 2)),
+            "risks": _points(rng, rng.randint(1, 3)),
+            "recommendations": _points(rng, rng.randint(1, 3)),
+        },
+    }
+
+
+def make_transcript(rng, turns=40):
+    lines = []
+    for i in range(turns):
+        speaker = "Rep" if i % 2 == 0 else "Customer"
+        sentence = " ".join(rng.choice(PHRASES).format(t=rng.choice(TOPICS)) for _ in range(rng.randint(1, 4)))
+        lines.append(f"[00:{i // 60:02d}:{i % 60:02d}] {speaker}: {sentence}.")
+    return "\n".join(lines)
+
+
+def make_varied_transcript(rng, turns=40, vocabulary=5000):
+    """
+    A transcript drawn from a Zipf-distributed vocabulary of made-up words. Unlike
+    make_transcript, two of these share few word 3-grams, as unrelated real demos do.
+    """
+    weights = [1 / rank for rank in range(1, vocabulary + 1)]
+    lines = []
+    for i in range(turns):
+        speaker = "Rep" if i % 2 == 0 else "Customer"
+        words = rng.choices(range(vocabulary), weights, k=rng.randint(6, 30))
+        lines.append(f"[00:{i // 60:02d}:{i % 60:02d}] {speaker}: {' '.join(f'w{w}' for w in words)}.")
+    return "\n".join(lines)
+
+
+def make_demo_rows(reps, n, seed=0, start=date(2023, 1, 1), days=730):
+    """
+    Yields (rep_name, rep_team, customer_name, demo_date, analysis_json, transcript) tuples
+    for insert_demo_results.
+    """
+    rng = random.Random(seed)
+    for _ in range(n):
+        rep_name, team = rng.choice(reps)
+        yield (
+            rep_name,
+            team,
+            rng.choice(CUSTOMERS),
+            start + timedelta(days=rng.randrange(days)),
+            json.dumps(make_analysis(rng)),
+            make_transcript(rng),
+        )
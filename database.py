@@ -1,151 +1,1045 @@
 # database.py
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import Json, execute_values
 import streamlit as st
 
+from analysis_model import SCORE_KEYS
+from metrics import timed
+
+# ----------------------
+# Connection Pool
+# ----------------------
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Checkouts block (up to `checkout_timeout` seconds) when all `maxconn` connections are
+    in use. A connection that has been idle longer than `health_check_interval` seconds is
+    pinged before being handed out; closed or broken connections are discarded and replaced
+    with fresh ones, so a dropped server connection never outlives a single request.
+    """
+
+    def __init__(self, minconn, maxconn, health_check_interval=30, checkout_timeout=30, **conn_params):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **conn_params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}  # id(conn) -> time.monotonic() when it was returned
+        self._lock = threading.Lock()
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise pg_pool.PoolError(f"No database connection available after {self.checkout_timeout}s")
+        try:
+            # One retry: if the pooled connection is stale, the replacement is a fresh connect().
+            for _ in range(2):
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+            raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, broken=False):
+        try:
+            if broken or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the duration of the block and returns it to the pool.
+        Connections that fail with an OperationalError/InterfaceError are closed instead of reused.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken=broken or conn.closed)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
 @st.cache_resource
-def get_connection():
+def get_pool():
     """
-    Returns a cached connection to PostgreSQL using credentials from st.secrets["postgres"].
+    Returns the process-wide connection pool, configured from st.secrets["postgres"].
+    Optional keys: pool_min (default 1), pool_max (default 10), health_check_interval (seconds).
     """
-    conn = psycopg2.connect(
-        host=st.secrets["postgres"]["host"],
-        database=st.secrets["postgres"]["database"],
-        user=st.secrets["postgres"]["user"],
-        password=st.secrets["postgres"]["password"],
-        port=st.secrets["postgres"].get("port", 5432),
+    cfg = st.secrets["postgres"]
+    return ConnectionPool(
+        minconn=int(cfg.get("pool_min", 1)),
+        maxconn=int(cfg.get("pool_max", 10)),
+        health_check_interval=float(cfg.get("health_check_interval", 30)),
+        host=cfg["host"],
+        database=cfg["database"],
+        user=cfg["user"],
+        password=cfg["password"],
+        port=cfg.get("port", 5432),
     )
-    return conn
 
-def init_db():
+@contextmanager
+def transaction():
     """
-    Creates 'reps' and 'demo_analysis' tables if they don't already exist.
+    Yields a cursor on a pooled connection inside a single transaction.
+    Commits when the block succeeds, rolls back if it raises.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with get_pool().connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+
+# ----------------------
+# Reps Table Functions
+# ----------------------
+@timed("db")
+def _load_reps():
+    with transaction() as cur:
+        cur.execute("SELECT id, rep_name, team, created_at FROM reps ORDER BY rep_name ASC")
+        return cur.fetchall()
+
+class RepDirectory:
+    """
+    In-process index of the reps table (name -> id/team). It is loaded with one query and
+    reloaded only after `ttl_seconds` or when the rep write functions invalidate it, so rep
+    lookups on every rerun are dictionary accesses.
+    """
+
+    def __init__(self, ttl_seconds=300):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._rows = []
+        self._by_name = {}
+        self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
 
-    # Table: reps
-    cur.execute(
+    def _current(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl_seconds:
+                self._rows = _load_reps()
+                self._by_name = {row[1]: row for row in self._rows}
+                self._loaded_at = time.monotonic()
+            return self._rows, self._by_name
+
+    def rows(self):
         """
-        CREATE TABLE IF NOT EXISTS reps (
-            id SERIAL PRIMARY KEY,
-            rep_name TEXT UNIQUE NOT NULL,
-            team TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+        Returns list of tuples (id, rep_name, team, created_at), ordered by rep_name.
         """
-    )
+        return list(self._current()[0])
+
+    def names(self):
+        return [row[1] for row in self._current()[0]]
 
-    # Table: demo_analysis
-    cur.execute(
+    def get(self, rep_name):
         """
-        CREATE TABLE IF NOT EXISTS demo_analysis (
-            id SERIAL PRIMARY KEY,
-            rep_name TEXT NOT NULL,
-            rep_team TEXT NOT NULL,
-            customer_name TEXT,
-            demo_date DATE,
-            analysis_json TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+        Returns (id, rep_name, team, created_at) for rep_name, or None if not found.
         """
-    )
+        return self._current()[1].get(rep_name)
 
-    conn.commit()
-    cur.close()
-    #conn.close()
 
+@st.cache_resource
+def get_rep_directory():
+    """
+    Returns the process-wide RepDirectory. TTL is rep_cache_ttl in st.secrets["postgres"] (seconds).
+    """
+    return RepDirectory(ttl_seconds=float(st.secrets["postgres"].get("rep_cache_ttl", 300)))
 
-# ----------------------
-# Reps Table Functions
-# ----------------------
 def fetch_all_reps():
     """
-    Returns list of tuples (id, rep_name, team, created_at).
+    Returns list of tuples (id, rep_name, team, created_at), served from the rep directory.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, rep_name, team, created_at FROM reps ORDER BY rep_name ASC")
-    rows = cur.fetchall()
-    cur.close()
-    #conn.close()
-    return rows
+    return get_rep_directory().rows()
 
 def insert_rep(rep_name, team):
     """
-    Inserts a new rep into 'reps' table (ignores duplicates).
+    Adds a rep, or moves an existing one to `team`.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO reps (rep_name, team)
-        VALUES (%s, %s)
-        ON CONFLICT (rep_name) DO NOTHING
-        """,
-        (rep_name, team),
-    )
-    conn.commit()
-    cur.close()
-    #conn.close()
+    upsert_reps([(rep_name, team)])
 
+@timed("db")
+def upsert_reps(rows):
+    """
+    Adds or updates many reps in one statement. rows: iterable of (rep_name, team); a name
+    listed twice keeps its last team. Returns (inserted, updated); reps whose team is
+    unchanged count as neither.
+    """
+    rows = list({rep_name: (rep_name, team) for rep_name, team in rows}.values())
+    if not rows:
+        return 0, 0
+    with transaction() as cur:
+        # xmax = 0 only for freshly inserted rows; unchanged teams are filtered by the WHERE.
+        results = execute_values(
+            cur,
+            """
+            INSERT INTO reps (rep_name, team)
+            VALUES %s
+            ON CONFLICT (rep_name) DO UPDATE SET team = EXCLUDED.team
+            WHERE reps.team IS DISTINCT FROM EXCLUDED.team
+            RETURNING xmax = 0
+            """,
+            rows,
+            page_size=1000,
+            fetch=True,
+        )
+    get_rep_directory().invalidate()
+    inserted = sum(1 for (is_new,) in results if is_new)
+    return inserted, len(results) - inserted
+
+@timed("db")
+def apply_rep_changes(added=(), updated=(), deleted=()):
+    """
+    Applies edits from the rep grid in one transaction: `deleted` rep ids, `updated`
+    (id, rep_name, team) rows and `added` (rep_name, team) rows. Either all apply or none.
+    """
+    added, updated, deleted = list(added), list(updated), list(deleted)
+    with transaction() as cur:
+        if deleted:
+            cur.execute("DELETE FROM reps WHERE id = ANY(%s)", (deleted,))
+        if updated:
+            execute_values(
+                cur,
+                """
+                UPDATE reps SET rep_name = v.rep_name, team = v.team
+                FROM (VALUES %s) AS v (id, rep_name, team)
+                WHERE reps.id = v.id
+                """,
+                updated,
+            )
+        if added:
+            execute_values(cur, "INSERT INTO reps (rep_name, team) VALUES %s", added)
+    get_rep_directory().invalidate()
+
+@timed("db")
 def delete_rep(rep_id):
     """
     Removes a rep by ID.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM reps WHERE id = %s", (rep_id,))
-    conn.commit()
-    cur.close()
-    #conn.close()
+    with transaction() as cur:
+        cur.execute("DELETE FROM reps WHERE id = %s", (rep_id,))
+    get_rep_directory().invalidate()
 
 def get_rep_team(rep_name):
     """
     Returns the team (e.g. 'DME' or 'Ortho') for the given rep_name, or None if not found.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT team FROM reps WHERE rep_name = %s", (rep_name,))
-    row = cur.fetchone()
-    cur.close()
-    #conn.close()
-    return row[0] if row else None
+    row = get_rep_directory().get(rep_name)
+    return row[2] if row else None
 
 
 # -----------------------------
 # Demo Analysis Table Functions
 # -----------------------------
-def insert_demo_result(rep_name, rep_team, customer_name, demo_date, analysis_json):
+def demo_result_key(rep_name, customer_name, demo_date, transcript=None, analysis_json=None):
     """
-    Insert a record into demo_analysis table.
+    Idempotency key of a saved analysis: sha256 over the rep, customer, demo date and the
+    transcript (or, without one, the analysis). Saving the same demo twice gives the same key.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO demo_analysis (rep_name, rep_team, customer_name, demo_date, analysis_json)
-        VALUES (%s, %s, %s, %s, %s)
-        """,
-        (rep_name, rep_team, customer_name, demo_date, analysis_json),
+    material = json.dumps(
+        [rep_name, customer_name, str(demo_date) if demo_date else None, transcript or analysis_json],
+        sort_keys=True,
     )
-    conn.commit()
-    cur.close()
-    #conn.close()
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
 
+@timed("db")
+def save_demo_result(rep_name, customer_name, demo_date, analysis_json, transcript=None, idempotency_key=None):
+    """
+    Saves one analysis, idempotently: a second save with the same key (default:
+    demo_result_key) returns the existing row. The team is looked up from reps in the same
+    statement ('Unknown' for reps that are not listed).
+    Returns (id, rep_team, inserted).
+    """
+    key = idempotency_key or demo_result_key(rep_name, customer_name, demo_date, transcript, analysis_json)
+    with transaction() as cur:
+        # The no-op DO UPDATE makes RETURNING yield the existing row on a conflict;
+        # xmax = 0 only for a freshly inserted row.
+        cur.execute(
+            """
+            INSERT INTO demo_analysis
+                (idempotency_key, rep_name, rep_team, customer_name, demo_date, analysis_json, transcript)
+            SELECT %s, %s, COALESCE((SELECT team FROM reps WHERE rep_name = %s), 'Unknown'), %s, %s, %s, %s
+            ON CONFLICT (idempotency_key) DO UPDATE SET idempotency_key = EXCLUDED.idempotency_key
+            RETURNING id, rep_team, xmax = 0
+            """,
+            (key, rep_name, rep_name, customer_name, demo_date, analysis_json, transcript),
+        )
+        return cur.fetchone()
+
+@timed("db")
+def save_demo_results(rows):
+    """
+    Saves many analyses in one statement and one transaction, skipping keys that are already
+    saved. rows: iterable of (idempotency_key, rep_name, customer_name, demo_date,
+    analysis_json, transcript). Teams are resolved from reps as in save_demo_result.
+    Returns the number of rows inserted.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with transaction() as cur:
+        inserted = execute_values(
+            cur,
+            """
+            INSERT INTO demo_analysis
+                (idempotency_key, rep_name, rep_team, customer_name, demo_date, analysis_json, transcript)
+            SELECT v.idempotency_key, v.rep_name, COALESCE(r.team, 'Unknown'), v.customer_name,
+                   v.demo_date::date, v.analysis_json::jsonb, v.transcript
+            FROM (VALUES %s) AS v (idempotency_key, rep_name, customer_name, demo_date, analysis_json, transcript)
+            LEFT JOIN reps r ON r.rep_name = v.rep_name
+            ON CONFLICT (idempotency_key) DO NOTHING
+            RETURNING id
+            """,
+            rows,
+            page_size=500,
+            fetch=True,
+        )
+    return len(inserted)
+
+@timed("db")
+def insert_demo_results(rows):
+    """
+    Inserts many records into demo_analysis in one statement and one transaction, with the
+    teams given and no idempotency keys (bulk loads such as bench seeding).
+    rows: iterable of (rep_name, rep_team, customer_name, demo_date, analysis_json, transcript).
+    Returns the number of rows inserted.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with transaction() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO demo_analysis (rep_name, rep_team, customer_name, demo_date, analysis_json, transcript)
+            VALUES %s
+            """,
+            rows,
+            page_size=500,
+        )
+    return len(rows)
+
+def _results_filter_clause(rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None):
+    """
+    Builds a parameterized WHERE clause for demo_analysis filters.
+    Returns (list_of_sql_conditions, list_of_params).
+    """
+    conditions = []
+    params = []
+    if rep_name:
+        conditions.append("rep_name = %s")
+        params.append(rep_name)
+    if rep_team:
+        conditions.append("rep_team = %s")
+        params.append(rep_team)
+    if date_from:
+        conditions.append("demo_date >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append("demo_date <= %s")
+        params.append(date_to)
+    if min_score is not None:
+        conditions.append("score_overall >= %s")
+        params.append(min_score)
+    return conditions, params
+
+# sort name -> (ORDER BY, keyset condition selecting rows after the cursor, cursor columns)
+RESULT_SORTS = {
+    "newest": ("id DESC", "id < %s", ("id",)),
+    "score_desc": ("score_overall DESC, id DESC", "(score_overall, id) < (%s, %s)", ("score_overall", "id")),
+    "score_asc": ("score_overall ASC, id ASC", "(score_overall, id) > (%s, %s)", ("score_overall", "id")),
+}
+RESULT_COLUMNS = (
+    "id", "rep_name", "rep_team", "customer_name", "demo_date", "created_at", "score_overall",
+)
+
+def results_cursor(row, sort="newest"):
+    """
+    Returns the keyset cursor for the page following `row` (the last row of a fetch_results page).
+    """
+    return tuple(row[RESULT_COLUMNS.index(col)] for col in RESULT_SORTS[sort][2])
+
+@timed("db")
+def fetch_results(rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None,
+                  sort="newest", page_size=25, cursor=None):
+    """
+    Returns one page of summary rows (id, rep_name, rep_team, customer_name, demo_date,
+    created_at, score_overall) matching the filters, in `sort` order (see RESULT_SORTS).
+    The analysis itself is not fetched; use fetch_result_analysis for the record being viewed.
+    Pass results_cursor(last_row_of_previous_page, sort) as cursor to get the next page.
+    Score sorts skip rows without scores.
+    """
+    order_by, after_cursor, _ = RESULT_SORTS[sort]
+    conditions, params = _results_filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+    if sort != "newest":
+        conditions.append("score_overall IS NOT NULL")
+    if cursor is not None:
+        conditions.append(after_cursor)
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with transaction() as cur:
+        cur.execute(
+            f"""
+            SELECT {", ".join(RESULT_COLUMNS)}
+            FROM demo_analysis
+            {where}
+            ORDER BY {order_by}
+            LIMIT %s
+            """,
+            (*params, page_size),
+        )
+        rows = cur.fetchall()
+    return rows
+
+@timed("db")
+def count_results(rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None):
+    """
+    Returns the number of demo_analysis rows matching the filters.
+    """
+    conditions, params = _results_filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with transaction() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM demo_analysis {where}", params)
+        count = cur.fetchone()[0]
+    return count
+
+@timed("db")
+def search_results(query, rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None, limit=50):
+    """
+    Full-text search over transcripts and analysis text (web-search syntax: quoted phrases,
+    OR, -word). Returns up to `limit` rows (*RESULT_COLUMNS, rank, snippet), best match first.
+    Matching uses the GIN index on search_tsv; snippets are built for the returned rows only.
+    """
+    conditions, params = _results_filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+    where = "".join(f" AND {c}" for c in conditions)
+    with transaction() as cur:
+        cur.execute(
+            f"""
+            WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query),
+            hits AS (
+                SELECT {", ".join(RESULT_COLUMNS)}, analysis_json, transcript,
+                       ts_rank_cd(search_tsv, q.query) AS rank
+                FROM demo_analysis, q
+                WHERE search_tsv @@ q.query{where}
+                ORDER BY rank DESC, id DESC
+                LIMIT %s
+            )
+            SELECT {", ".join(RESULT_COLUMNS)}, rank,
+                   ts_headline('english', demo_analysis_text(analysis_json) || ' ' || COALESCE(transcript, ''),
+                               q.query, 'MaxFragments=2, MaxWords=18, MinWords=6, StartSel=**, StopSel=**')
+            FROM hits, q
+            ORDER BY rank DESC, id DESC
+            """,
+            (query, *params, limit),
+        )
+        return cur.fetchall()
+
+@timed("db")
+def fetch_result_analysis(result_id):
+    """
+    Returns the analysis dict of one demo_analysis row, or None if the row does not exist.
+    """
+    with transaction() as cur:
+        cur.execute("SELECT analysis_json FROM demo_analysis WHERE id = %s", (result_id,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+@timed("db")
+def fetch_result_transcript(result_id):
+    """
+    Returns the stored transcript of one demo_analysis row (None for rows saved before transcripts were kept).
+    """
+    with transaction() as cur:
+        cur.execute("SELECT transcript FROM demo_analysis WHERE id = %s", (result_id,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+@timed("db")
+def fetch_result_filter_options():
+    """
+    Returns (rep_names, teams, min_demo_date, max_demo_date) for building the result filters.
+    """
+    with transaction() as cur:
+        cur.execute("SELECT DISTINCT rep_name FROM demo_analysis ORDER BY rep_name")
+        rep_names = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT DISTINCT rep_team FROM demo_analysis ORDER BY rep_team")
+        teams = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT MIN(demo_date), MAX(demo_date) FROM demo_analysis")
+        min_date, max_date = cur.fetchone()
+    return rep_names, teams, min_date, max_date
+
+EXPORT_COLUMNS = RESULT_COLUMNS + ("analysis_json",)
+
+def iter_results(rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None, itersize=2000):
+    """
+    Yields (id, rep_name, rep_team, customer_name, demo_date, created_at, score_overall,
+    analysis_json) for every matching row, oldest first, through a server-side (named) cursor
+    that fetches `itersize` rows per round trip, so memory use does not grow with the result.
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    conditions, params = _results_filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with get_pool().connection() as conn:
+        try:
+            with conn.cursor(name="iter_results") as cur:
+                cur.itersize = itersize
+                cur.execute(
+                    f"SELECT {', '.join(EXPORT_COLUMNS)} FROM demo_analysis {where} ORDER BY id",
+                    params,
+                )
+                yield from cur
+        finally:
+            # Named cursors live in a transaction; end it so the connection goes back clean.
+            if not conn.closed:
+                conn.rollback()
+
+# Columns copied to the local analytics mirror (mirror.py). The analysis comes as JSON text,
+# which the mirror stores as is.
+MIRROR_COLUMNS = RESULT_COLUMNS + tuple(f"score_{key}" for key in SCORE_KEYS) + ("analysis_json",)
+_MIRROR_SELECT = ", ".join(MIRROR_COLUMNS[:-1]) + ", analysis_json::text"
+
+@timed("db")
+def fetch_results_after(after_id, limit=2000):
+    """
+    Returns up to `limit` rows of MIRROR_COLUMNS with id > after_id, in id order.
+    """
+    with transaction() as cur:
+        cur.execute(
+            f"SELECT {_MIRROR_SELECT} FROM demo_analysis WHERE id > %s ORDER BY id LIMIT %s",
+            (after_id, limit),
+        )
+        return cur.fetchall()
+
+@timed("db")
+def fetch_results_by_ids(ids):
+    """
+    Returns the rows of MIRROR_COLUMNS for the given ids that exist, in id order.
+    """
+    with transaction() as cur:
+        cur.execute(
+            f"SELECT {_MIRROR_SELECT} FROM demo_analysis WHERE id = ANY(%s) ORDER BY id",
+            (list(ids),),
+        )
+        return cur.fetchall()
+
+@timed("db")
+def fetch_result_ids(after_id, up_to_id):
+    """
+    Returns the ids in (after_id, up_to_id] that exist; an index-only scan of the primary key.
+    """
+    with transaction() as cur:
+        cur.execute(
+            "SELECT id FROM demo_analysis WHERE id > %s AND id <= %s ORDER BY id",
+            (after_id, up_to_id),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+@timed("db")
 def fetch_all_results():
     """
     Returns rows: (id, rep_name, rep_team, customer_name, demo_date, analysis_json, created_at).
+    analysis_json is JSONB and arrives already decoded as a dict.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, rep_name, rep_team, customer_name, demo_date, analysis_json, created_at
-        FROM demo_analysis
-        ORDER BY id DESC
-        """
-    )
-    rows = cur.fetchall()
-    cur.close()
-    #conn.close()
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT id, rep_name, rep_team, customer_name, demo_date, analysis_json, created_at
+            FROM demo_analysis
+            ORDER BY id DESC
+            """
+        )
+        rows = cur.fetchall()
     return rows
+
+
+# ---------------------------
+# Analysis Cache Functions
+# ---------------------------
+@timed("db")
+def fetch_cached_analysis(cache_key, ttl_seconds):
+    """
+    Returns (analysis_json, analysis_blob, age_seconds) cached for cache_key if younger than
+    ttl_seconds, else None. One of the first two is set: the blob (see
+    analysis_model.Analysis.to_compact) for rows written since migration 11, the JSON text for
+    older ones. Records the hit on the row.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_cache
+            SET last_hit_at = CURRENT_TIMESTAMP, hit_count = hit_count + 1
+            WHERE cache_key = %s
+              AND created_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+            RETURNING analysis_json, analysis_blob, EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at)
+            """,
+            (cache_key, ttl_seconds),
+        )
+        row = cur.fetchone()
+    return (row[0], bytes(row[1]) if row[1] is not None else None, float(row[2])) if row else None
+
+@timed("db")
+def store_cached_analysis(cache_key, model, prompt_version, analysis_json=None, analysis_blob=None):
+    """
+    Inserts or refreshes a cached analysis, given as JSON text or as a compact blob.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO analysis_cache (cache_key, model, prompt_version, analysis_json, analysis_blob)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (cache_key) DO UPDATE
+            SET analysis_json = EXCLUDED.analysis_json,
+                analysis_blob = EXCLUDED.analysis_blob,
+                created_at = CURRENT_TIMESTAMP,
+                last_hit_at = CURRENT_TIMESTAMP
+            """,
+            (cache_key, model, prompt_version, analysis_json,
+             psycopg2.Binary(analysis_blob) if analysis_blob is not None else None),
+        )
+
+@timed("db")
+def purge_analysis_cache(ttl_seconds):
+    """
+    Deletes cached analyses older than ttl_seconds. Returns the number of rows removed.
+    """
+    with transaction() as cur:
+        cur.execute(
+            "DELETE FROM analysis_cache WHERE created_at <= CURRENT_TIMESTAMP - make_interval(secs => %s)",
+            (ttl_seconds,),
+        )
+        return cur.rowcount
+
+
+# ---------------------------
+# Score Rollup Functions
+# ---------------------------
+ROLLUP_GROUPS = {"rep": ("rep_name", "rep_team"), "team": ("rep_team",)}
+
+def _rollup_filter_clause(date_from=None, date_to=None, rep_team=None):
+    conditions, params = [], []
+    if date_from:
+        conditions.append("week_start >= date_trunc('week', %s::date)")
+        params.append(date_from)
+    if date_to:
+        conditions.append("week_start <= %s")
+        params.append(date_to)
+    if rep_team:
+        conditions.append("rep_team = %s")
+        params.append(rep_team)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+@timed("db")
+def fetch_score_summary(group_by="rep", date_from=None, date_to=None, rep_team=None):
+    """
+    Per-rep (group_by="rep") or per-team averages from demo_score_rollup.
+    Returns rows: (*group_columns, demo_count, avg_<score> for each SCORE_KEYS, avg_overall),
+    best average first. Averages are None when nothing in the group was scored.
+    """
+    group_columns = ", ".join(ROLLUP_GROUPS[group_by])
+    averages = ", ".join(
+        f"ROUND(SUM(sum_{key}) / NULLIF(SUM(n_{key}), 0), 2)" for key in (*SCORE_KEYS, "overall")
+    )
+    where, params = _rollup_filter_clause(date_from, date_to, rep_team)
+    with transaction() as cur:
+        cur.execute(
+            f"""
+            SELECT {group_columns}, SUM(demo_count)::int, {averages}
+            FROM demo_score_rollup
+            {where}
+            GROUP BY {group_columns}
+            HAVING SUM(demo_count) > 0
+            ORDER BY SUM(sum_overall) / NULLIF(SUM(n_overall), 0) DESC NULLS LAST, {group_columns}
+            """,
+            params,
+        )
+        return cur.fetchall()
+
+@timed("db")
+def fetch_rollup_teams():
+    """
+    Returns the teams that have demos counted in demo_score_rollup, alphabetically.
+    """
+    with transaction() as cur:
+        cur.execute("SELECT DISTINCT rep_team FROM demo_score_rollup WHERE demo_count > 0 ORDER BY rep_team")
+        return [row[0] for row in cur.fetchall()]
+
+@timed("db")
+def fetch_score_trend(group_by="team", date_from=None, date_to=None, rep_team=None):
+    """
+    Weekly overall-score averages. Returns rows: (week_start, group_name, demo_count, avg_overall).
+    """
+    group_column = ROLLUP_GROUPS[group_by][0]
+    where, params = _rollup_filter_clause(date_from, date_to, rep_team)
+    with transaction() as cur:
+        cur.execute(
+            f"""
+            SELECT week_start, {group_column}, SUM(demo_count)::int,
+                   ROUND(SUM(sum_overall) / NULLIF(SUM(n_overall), 0), 2)
+            FROM demo_score_rollup
+            {where}
+            GROUP BY week_start, {group_column}
+            HAVING SUM(demo_count) > 0
+            ORDER BY week_start, {group_column}
+            """,
+            params,
+        )
+        return cur.fetchall()
+
+
+
+# ---------------------------
+# Analysis Job Functions
+# ---------------------------
+JOB_COLUMNS = (
+    "id", "status", "rep_name", "customer_name", "demo_date", "analysis_json", "error",
+    "attempts", "demo_result_id", "created_at", "started_at", "finished_at",
+)
+
+@timed("db")
+def insert_analysis_job(rep_name, customer_name, demo_date, transcript):
+    """
+    Queues a transcript for background analysis. Returns the job id.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            INSERT INTO analysis_job (rep_name, customer_name, demo_date, transcript)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+            """,
+            (rep_name, customer_name, demo_date, transcript),
+        )
+        return cur.fetchone()[0]
+
+@timed("db")
+def claim_analysis_job(stale_seconds):
+    """
+    Marks the oldest queued job running and returns (id, transcript, attempts), or None.
+    Jobs left running for more than stale_seconds (their worker died) are claimed again.
+    SKIP LOCKED lets any number of workers, in any number of processes, claim concurrently.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_job
+            SET status = 'running', started_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM analysis_job
+                WHERE status = 'queued'
+                   OR (status = 'running' AND started_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, transcript, attempts
+            """,
+            (stale_seconds,),
+        )
+        return cur.fetchone()
+
+@timed("db")
+def update_analysis_job_sections(job_id, sections):
+    """
+    Merges finished analysis sections (dict) into a running job's analysis_json.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_job
+            SET analysis_json = COALESCE(analysis_json, '{}'::jsonb) || %s
+            WHERE id = %s
+            """,
+            (Json(sections), job_id),
+        )
+
+@timed("db")
+def finish_analysis_job(job_id, analysis=None, error=None, requeue=False):
+    """
+    Records the outcome of a job: done with `analysis`, failed with `error`, or back to
+    queued (keeping `error`) when requeue is set.
+    """
+    status = "queued" if requeue else ("failed" if error else "done")
+    with transaction() as cur:
+        cur.execute(
+            """
+            UPDATE analysis_job
+            SET status = %s,
+                analysis_json = COALESCE(%s, analysis_json),
+                error = %s,
+                finished_at = CASE WHEN %s = 'queued' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE id = %s
+            """,
+            (status, Json(analysis) if analysis is not None else None, error, status, job_id),
+        )
+
+@timed("db")
+def fetch_analysis_job(job_id, include_transcript=False):
+    """
+    Returns a dict of JOB_COLUMNS for one job (plus "transcript" if requested), or None.
+    """
+    columns = JOB_COLUMNS + (("transcript",) if include_transcript else ())
+    with transaction() as cur:
+        cur.execute(f"SELECT {', '.join(columns)} FROM analysis_job WHERE id = %s", (job_id,))
+        row = cur.fetchone()
+    return dict(zip(columns, row)) if row else None
+
+@timed("db")
+def fetch_recent_jobs(limit=20):
+    """
+    Returns rows (id, status, rep_name, customer_name, demo_date, demo_result_id, created_at,
+    finished_at) for the most recent jobs, newest first.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT id, status, rep_name, customer_name, demo_date, demo_result_id, created_at, finished_at
+            FROM analysis_job
+            ORDER BY id DESC
+            LIMIT %s
+            """,
+            (limit,),
+        )
+        return cur.fetchall()
+
+@timed("db")
+def mark_analysis_job_saved(job_id, demo_result_id):
+    with transaction() as cur:
+        cur.execute(
+            "UPDATE analysis_job SET demo_result_id = %s WHERE id = %s",
+            (demo_result_id, job_id),
+        )
+
+# ---------------------------
+# Transcript MinHash Functions
+# ---------------------------
+@timed("db")
+def fetch_transcripts_without_minhash(after_id=0, limit=500):
+    """
+    Returns up to `limit` (id, transcript) rows with id > after_id that have a transcript but
+    no signature in demo_minhash yet, oldest first.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT d.id, d.transcript
+            FROM demo_analysis d
+            WHERE d.id > %s
+              AND d.transcript IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM demo_minhash m WHERE m.result_id = d.id)
+            ORDER BY d.id
+            LIMIT %s
+            """,
+            (after_id, limit),
+        )
+        return cur.fetchall()
+
+@timed("db")
+def store_minhashes(rows):
+    """
+    Stores (result_id, signature bytes) rows; ids that already have a signature (or whose demo
+    was deleted meanwhile) are skipped. Returns the number stored.
+    """
+    if not rows:
+        return 0
+    with transaction() as cur:
+        stored = execute_values(
+            cur,
+            """
+            INSERT INTO demo_minhash (result_id, signature)
+            SELECT v.result_id, v.signature
+            FROM (VALUES %s) AS v (result_id, signature)
+            JOIN demo_analysis d ON d.id = v.result_id
+            ON CONFLICT (result_id) DO NOTHING
+            RETURNING result_id
+            """,
+            [(result_id, psycopg2.Binary(signature)) for result_id, signature in rows],
+            page_size=1000,
+            fetch=True,
+        )
+    return len(stored)
+
+@timed("db")
+def fetch_minhashes_after(after_seq, limit=5000):
+    """
+    Returns up to `limit` (seq, result_id, signature bytes) rows with seq > after_seq, in
+    seq (insertion) order.
+    """
+    with transaction() as cur:
+        cur.execute(
+            "SELECT seq, result_id, signature FROM demo_minhash WHERE seq > %s ORDER BY seq LIMIT %s",
+            (after_seq, limit),
+        )
+        return [(seq, result_id, bytes(signature)) for seq, result_id, signature in cur.fetchall()]
+
+# ---------------------------
+# Metric Span Functions
+# ---------------------------
+# Not @timed: these are called by the metrics flush itself and by the Ops page.
+def insert_metric_spans(spans):
+    """
+    Inserts spans (recorded_at, kind, name, duration_ms, attrs_dict) in one statement.
+    Returns the number of rows inserted.
+    """
+    with transaction() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO metric_span (recorded_at, kind, name, duration_ms, attrs) VALUES %s",
+            [(at, kind, name, duration_ms, Json(attrs)) for at, kind, name, duration_ms, attrs in spans],
+            page_size=1000,
+        )
+    return len(spans)
+
+def fetch_span_latency(since, kinds=None):
+    """
+    Latency percentiles per (kind, name) for spans recorded after `since`.
+    Returns rows: (kind, name, calls, errors, p50_ms, p90_ms, p99_ms, max_ms, total_ms),
+    slowest p90 first.
+    """
+    kind_filter = "AND kind = ANY(%s)" if kinds else ""
+    with transaction() as cur:
+        cur.execute(
+            f"""
+            SELECT kind, name, COUNT(*), COUNT(*) FILTER (WHERE attrs ? 'error'),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms),
+                   percentile_cont(0.9) WITHIN GROUP (ORDER BY duration_ms),
+                   percentile_cont(0.99) WITHIN GROUP (ORDER BY duration_ms),
+                   MAX(duration_ms), SUM(duration_ms)
+            FROM metric_span
+            WHERE recorded_at > %s {kind_filter}
+            GROUP BY kind, name
+            ORDER BY 6 DESC
+            """,
+            (since, list(kinds)) if kinds else (since,),
+        )
+        return cur.fetchall()
+
+def fetch_token_usage(since):
+    """
+    LLM token spend per day and model from completion spans recorded after `since`.
+    Returns rows: (day, model, requests, prompt_tokens, completion_tokens).
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT recorded_at::date, attrs->>'model', COUNT(*),
+                   COALESCE(SUM((attrs->>'prompt_tokens')::int), 0),
+                   COALESCE(SUM((attrs->>'completion_tokens')::int), 0)
+            FROM metric_span
+            WHERE kind = 'llm' AND name = 'chat_completion' AND recorded_at > %s
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            """,
+            (since,),
+        )
+        return cur.fetchall()
+
+def fetch_parse_fallbacks(since):
+    """
+    Returns (responses_parsed, responses_needing_fallback) for LLM responses after `since`.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE (attrs->>'fallback')::boolean)
+            FROM metric_span
+            WHERE kind = 'llm' AND name = 'parse' AND recorded_at > %s
+            """,
+            (since,),
+        )
+        return cur.fetchone()
+
+def fetch_preprocess_savings(since):
+    """
+    Returns (transcripts, original_tokens, tokens_sent) over preprocess spans after `since`.
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT COUNT(*),
+                   COALESCE(SUM((attrs->>'original_tokens')::int), 0),
+                   COALESCE(SUM((attrs->>'tokens')::int), 0)
+            FROM metric_span
+            WHERE kind = 'llm' AND name = 'preprocess' AND recorded_at > %s
+            """,
+            (since,),
+        )
+        return cur.fetchone()
+
+def fetch_slowest_spans(kind, since, limit=20):
+    """
+    Returns the `limit` slowest individual spans of `kind` after `since`:
+    rows (recorded_at, name, duration_ms, attrs).
+    """
+    with transaction() as cur:
+        cur.execute(
+            """
+            SELECT recorded_at, name, duration_ms, attrs
+            FROM metric_span
+            WHERE kind = %s AND recorded_at > %s
+            ORDER BY duration_ms DESC
+            LIMIT %s
+            """,
+            (kind, since, limit),
+        )
+        return cur.fetchall()
+
+def purge_metric_spans(older_than_days):
+    """
+    Deletes spans older than the given number of days. Returns the number of rows removed.
+    """
+    with transaction() as cur:
+        cur.execute(
+            "DELETE FROM metric_span WHERE recorded_at < CURRENT_TIMESTAMP - make_interval(days => %s)",
+            (older_than_days,),
+        )
+        return cur.rowcount
@@ -0,0 +1,146 @@
+# export.py
+"""
+Streaming export of demo results to CSV or newline-delimited JSON, with the analysis
+flattened into one column per field. Rows come from database.iter_results (a server-side
+cursor) and are written one at a time, so memory stays flat however many rows match.
+
+    python export.py --format csv --team DME --from 2024-01-01 --output dme.csv
+
+Run from the app directory so .streamlit/secrets.toml supplies the database settings.
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+
+from database import SCORE_KEYS, iter_results
+from metrics import span
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+LIST_SEPARATOR = " | "
+
+# (column, path into the analysis) for list-valued fields
+LIST_FIELDS = (
+    ("pain_points_operational", ("pain_points", "operational")),
+    ("pain_points_technical", ("pain_points", "technical")),
+    ("pain_points_financial", ("pain_points", "financial")),
+    ("buying_signals_positive", ("buying_signals", "positive")),
+    ("buying_signals_concerns", ("buying_signals", "concerns")),
+    ("key_points", ("management_summary", "key_points")),
+    ("decisions", ("management_summary", "decisions")),
+    ("risks", ("management_summary", "risks")),
+    ("recommendations", ("management_summary", "recommendations")),
+)
+# sections shaped {area: [points]}
+AREA_FIELDS = ("strengths", "improvements", "examples")
+
+EXPORT_FIELDS = (
+    "id", "rep_name", "rep_team", "customer_name", "demo_date", "created_at", "score_overall",
+    *(f"score_{key}" for key in SCORE_KEYS),
+    *AREA_FIELDS,
+    *(column for column, _ in LIST_FIELDS),
+    "next_steps",
+)
+
+
+def _dig(analysis, path):
+    value = analysis
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value if isinstance(value, list) else []
+
+def flatten_analysis(analysis: dict, join=True) -> dict:
+    """
+    One column per analysis field. With join=True (CSV) lists become LIST_SEPARATOR-joined
+    text; with join=False (NDJSON) they stay lists.
+    """
+    analysis = analysis or {}
+    scores = analysis.get("scores") or {}
+    flat = {f"score_{key}": scores.get(key) for key in SCORE_KEYS}
+    for section in AREA_FIELDS:
+        areas = analysis.get(section) or {}
+        flat[section] = [f"{area}: {point}" for area, points in areas.items() for point in points or []]
+    for column, path in LIST_FIELDS:
+        flat[column] = _dig(analysis, path)
+    flat["next_steps"] = [
+        " / ".join(str(step.get(k, "")) for k in ("action", "owner", "deadline", "priority"))
+        for step in analysis.get("next_steps") or []
+        if isinstance(step, dict)
+    ]
+    if join:
+        flat = {k: LIST_SEPARATOR.join(map(str, v)) if isinstance(v, list) else v for k, v in flat.items()}
+    return flat
+
+def export_records(rows, join=True):
+    """
+    Turns iter_results rows into flat dicts keyed by EXPORT_FIELDS.
+    """
+    for id_val, rep_name, rep_team, customer_name, demo_date, created_at, score_overall, analysis in rows:
+        record = {
+            "id": id_val,
+            "rep_name": rep_name,
+            "rep_team": rep_team,
+            "customer_name": customer_name,
+            "demo_date": demo_date.isoformat() if demo_date else None,
+            "created_at": created_at.isoformat() if created_at else None,
+            "score_overall": float(score_overall) if score_overall is not None else None,
+        }
+        record.update(flatten_analysis(analysis, join=join))
+        yield record
+
+def write_export(out, fmt="csv", itersize=2000, source=None, **filters):
+    """
+    Streams the results matching `filters` (see database.iter_results) to the text file `out`.
+    `source` is the row iterator to read from (default database.iter_results;
+    AnalyticsMirror.iter_results gives the same rows). Returns the number of rows written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    count = 0
+    with span("export", fmt) as attrs:
+        rows = (source or iter_results)(**filters, itersize=itersize)
+        records = export_records(rows, join=fmt == "csv")
+        if fmt == "csv":
+            writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in records:
+                out.write(json.dumps(record, default=str) + "\n")
+                count += 1
+        attrs["rows"] = count
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export demo results as CSV or NDJSON.")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--rep", help="rep name")
+    parser.add_argument("--team")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="YYYY-MM-DD")
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--itersize", type=int, default=2000, help="rows fetched per round trip")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    filters = {
+        "rep_name": args.rep,
+        "rep_team": args.team,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "min_score": args.min_score,
+    }
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            count = write_export(out, args.format, args.itersize, **filters)
+    else:
+        count = write_export(sys.stdout, args.format, args.itersize, **filters)
+    print(f"Exported {count} row(s).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
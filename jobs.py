@@ -0,0 +1,151 @@
+# jobs.py
+"""
+Background analysis jobs. Transcripts are queued in the analysis_job table and analyzed by a
+pool of worker threads that lives for the whole server process, so an analysis survives
+reruns, page changes and closed browser tabs; the UI only polls the job row.
+"""
+import logging
+import threading
+
+import streamlit as st
+
+from analyzer import DemoAnalyzer
+from database import (
+    claim_analysis_job,
+    finish_analysis_job,
+    insert_analysis_job,
+    update_analysis_job_sections,
+)
+
+DEFAULT_WORKERS = 2
+DEFAULT_POLL_SECONDS = 5
+DEFAULT_MAX_ATTEMPTS = 3
+# A job still "running" after this long is assumed to belong to a dead worker and is retried.
+DEFAULT_STALE_SECONDS = 15 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkerPool:
+    """
+    `workers` daemon threads that claim queued jobs (see claim_analysis_job) and run them.
+    Sections are written to the job row as they stream in. Idle workers poll every
+    `poll_seconds` for jobs queued by other processes; notify() wakes them at once.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, poll_seconds=DEFAULT_POLL_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, stale_seconds=DEFAULT_STALE_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.stale_seconds = stale_seconds
+        self._wake = threading.Condition()
+        self._pending_wakeups = 0
+        self._lock = threading.Lock()
+        self.busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_error = None
+        self._threads = [
+            threading.Thread(target=self._run, name=f"analysis-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def notify(self):
+        with self._wake:
+            self._pending_wakeups += 1
+            self._wake.notify()
+
+    def _wait(self):
+        with self._wake:
+            if not self._pending_wakeups:
+                self._wake.wait(self.poll_seconds)
+            self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+    def _run(self):
+        analyzer = DemoAnalyzer()
+        while True:
+            try:
+                job = claim_analysis_job(self.stale_seconds)
+            except Exception:
+                job = None
+            if job is None:
+                self._wait()
+                continue
+            with self._lock:
+                self.busy += 1
+            ok = False
+            try:
+                self._execute(analyzer, *job)
+                ok = True
+            except Exception as e:
+                # Usually the database went away while saving. The job stays "running" and is
+                # claimed again once stale; this worker backs off and keeps going.
+                logger.exception("Analysis job %s could not be finished", job[0])
+                self.last_error = f"Job #{job[0]}: {e}"
+            finally:
+                with self._lock:
+                    self.busy -= 1
+            if not ok:
+                self._wait()
+
+    def _execute(self, analyzer, job_id, transcript, attempts):
+        if attempts > self.max_attempts:
+            finish_analysis_job(job_id, error=f"Gave up after {self.max_attempts} attempts")
+            with self._lock:
+                self.failed += 1
+            return
+        try:
+            analysis = {}
+            for name, value in analyzer.analyze_stream(transcript):
+                analysis[name] = value
+                update_analysis_job_sections(job_id, {name: value})
+            if not analysis:
+                raise ValueError("Empty analysis")
+        except Exception as e:
+            retry = attempts < self.max_attempts
+            finish_analysis_job(job_id, error=str(e), requeue=retry)
+            if not retry:
+                with self._lock:
+                    self.failed += 1
+            return
+        finish_analysis_job(job_id, analysis=analysis)
+        with self._lock:
+            self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "completed": self.completed,
+                "failed": self.failed,
+                "last_error": self.last_error,
+            }
+
+
+@st.cache_resource
+def get_job_workers():
+    """
+    Starts the process-wide JobWorkerPool on first use. Sized by ANALYSIS_WORKERS; polling,
+    retries and staleness by JOB_POLL_SECONDS, JOB_MAX_ATTEMPTS and JOB_STALE_SECONDS
+    in st.secrets["general"].
+    """
+    general = st.secrets["general"]
+    return JobWorkerPool(
+        workers=int(general.get("ANALYSIS_WORKERS", DEFAULT_WORKERS)),
+        poll_seconds=float(general.get("JOB_POLL_SECONDS", DEFAULT_POLL_SECONDS)),
+        max_attempts=int(general.get("JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        stale_seconds=float(general.get("JOB_STALE_SECONDS", DEFAULT_STALE_SECONDS)),
+    )
+
+
+def submit_analysis_job(rep_name, customer_name, demo_date, transcript):
+    """
+    Queues a transcript and wakes a worker. Returns the job id.
+    """
+    job_id = insert_analysis_job(rep_name, customer_name, demo_date, transcript)
+    get_job_workers().notify()
+    return job_id
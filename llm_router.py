@@ -0,0 +1,416 @@
+# llm_router.py
+"""
+Routing of chat completions over one or more OpenAI-compatible endpoints.
+
+Routes are tried in their configured order (the fallback order). Each request has a timeout;
+a route whose requests keep failing is skipped for a while by its circuit breaker; and when
+the first route is slower than its usual latency (a percentile of its recent requests), a
+duplicate "hedge" request goes to the next route and the first valid response wins.
+
+Routes come from st.secrets, for example:
+
+    [[llm_routes]]
+    name = "primary"
+    model = "gpt-3.5-turbo"
+    timeout = 60
+    connect_timeout = 5                        # optional, seconds to open a connection
+
+    [[llm_routes]]
+    name = "backup"
+    model = "gpt-4o-mini"
+    base_url = "https://other-endpoint/v1/"   # optional, default OpenAI
+    api_key = "..."                            # optional, default OPENAI_API_KEY
+
+Without [[llm_routes]] there is a single route built from OPENAI_API_KEY / OPENAI_BASE_URL.
+Each route keeps one client with a keep-alive connection pool for the life of the process, so
+requests after the first skip the TCP/TLS handshake. The openai package (about half a second
+to import) is only imported when the router is first built.
+Everything can be exercised locally with stub_llm.py servers (see bench/run.py --only routing).
+"""
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import streamlit as st
+
+from metrics import span
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+# Per route. Hedges and parallel chunk requests each hold a connection while they run.
+DEFAULT_MAX_CONNECTIONS = 20
+# Idle connections are kept this long (httpx's default is 5 s, shorter than a user's pause).
+DEFAULT_KEEPALIVE_SECONDS = 120.0
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+# Hedge delay used until a route has enough latency samples.
+DEFAULT_HEDGE_AFTER_SECONDS = 20.0
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_RESET_SECONDS = 30.0
+
+
+class RouterError(Exception):
+    """
+    Raised when no route produced a valid response. `errors` maps route name -> exception.
+    """
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or {}
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects requests for
+    `reset_seconds`; then lets one trial request through (half-open). A success closes it,
+    a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_FAILURES, reset_seconds=DEFAULT_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        For a request abandoned before it succeeded or failed: frees the half-open trial slot.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyWindow:
+    """
+    The last `size` latencies (seconds) of successful requests, for percentile hedge delays.
+    """
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+@dataclass
+class Route:
+    name: str
+    model: str
+    client: object
+    timeout: float = DEFAULT_TIMEOUT
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    # Separate windows: total time for plain requests, time to first token for streams.
+    latency: dict = field(default_factory=lambda: {False: LatencyWindow(), True: LatencyWindow()})
+
+
+class LLMRouter:
+    def __init__(self, routes, hedge_percentile=DEFAULT_HEDGE_PERCENTILE,
+                 hedge_min_samples=DEFAULT_HEDGE_MIN_SAMPLES, hedge_after_seconds=DEFAULT_HEDGE_AFTER_SECONDS):
+        if not routes:
+            raise ValueError("LLMRouter needs at least one route")
+        self.routes = list(routes)
+        # 0 disables hedging; failed requests still fall back to the next route.
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_after_seconds = hedge_after_seconds
+
+    def hedge_delay(self, route, stream):
+        window = route.latency[stream]
+        if len(window) >= self.hedge_min_samples:
+            return window.percentile(self.hedge_percentile)
+        return self.hedge_after_seconds
+
+    def status(self):
+        """
+        Returns [(route name, model, breaker state, p50 s, p95 s)] for display.
+        """
+        return [
+            (r.name, r.model, r.breaker.state, r.latency[False].percentile(0.5), r.latency[False].percentile(0.95))
+            for r in self.routes
+        ]
+
+    # ---------- attempts (run on their own threads) ----------
+    def _attempt(self, attempt_id, route, request, stream, events, cancelled):
+        started = time.perf_counter()
+        with span("llm", "chat_completion", route=route.name, model=route.model, stream=stream,
+                  max_tokens=request.get("max_tokens")) as attrs:
+            try:
+                response = route.client.chat.completions.create(
+                    model=route.model,
+                    stream=stream,
+                    **({"stream_options": {"include_usage": True}} if stream else {}),
+                    **request,
+                )
+                if not stream:
+                    _record_usage(attrs, response.usage)
+                    route.latency[False].add(time.perf_counter() - started)
+                    route.breaker.record_success()
+                    events.put((attempt_id, "done", response.choices[0].message.content.strip()))
+                    return
+                first = True
+                for chunk in response:
+                    if cancelled.is_set():
+                        attrs["cancelled"] = True
+                        route.breaker.release()
+                        response.close()
+                        return
+                    if chunk.usage is not None:
+                        _record_usage(attrs, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first:
+                            first = False
+                            attrs["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                            route.latency[True].add(time.perf_counter() - started)
+                        events.put((attempt_id, "chunk", chunk.choices[0].delta.content))
+                route.breaker.record_success()
+                events.put((attempt_id, "done", None))
+            except Exception as e:
+                attrs["error"] = type(e).__name__
+                if cancelled.is_set():
+                    route.breaker.release()
+                else:
+                    route.breaker.record_failure()
+                events.put((attempt_id, "error", e))
+
+    # ---------- racing ----------
+    def _race(self, request, stream, validate=None):
+        """
+        Generator driving the attempts. Yields ("chunk", text) items from the winning stream,
+        then one ("done", text_or_None, route). See complete()/stream().
+        """
+        remaining = list(self.routes)
+        events = queue.Queue()
+        cancel_events = []  # per attempt
+        launched, errors, active = [], {}, set()
+        winner = None
+        hedge_at = None
+
+        def launch():
+            # Breakers are asked only here, so a half-open route's single trial is claimed by
+            # an attempt that actually runs (and so always succeeds, fails or is released).
+            while remaining:
+                route = remaining.pop(0)
+                if route.breaker.allow():
+                    break
+            else:
+                return None
+            attempt_id = len(launched)
+            launched.append(route)
+            cancel_events.append(threading.Event())
+            active.add(attempt_id)
+            threading.Thread(
+                target=self._attempt,
+                args=(attempt_id, route, request, stream, events, cancel_events[attempt_id]),
+                name=f"llm-{route.name}",
+                daemon=True,
+            ).start()
+            return route
+
+        def schedule_hedge(route):
+            nonlocal hedge_at
+            more = route is not None and bool(remaining)
+            hedge_at = time.monotonic() + self.hedge_delay(route, stream) if (more and self.hedge_percentile) else None
+
+        first = launch()
+        if first is None:
+            raise RouterError("All LLM routes are unavailable (circuit breakers open).")
+        schedule_hedge(first)
+        with span("llm", "route", stream=stream) as route_attrs:
+            try:
+                while True:
+                    timeout = None if (winner is not None or hedge_at is None) else max(0.0, hedge_at - time.monotonic())
+                    try:
+                        attempt_id, kind, payload = events.get(timeout=timeout)
+                    except queue.Empty:
+                        # The leading attempt is slower than usual: hedge on the next route.
+                        route_attrs["hedged"] = True
+                        schedule_hedge(launch())
+                        continue
+
+                    if winner is not None and attempt_id != winner:
+                        continue
+                    if kind == "error":
+                        active.discard(attempt_id)
+                        errors[launched[attempt_id].name] = payload
+                        if winner is not None:
+                            raise payload
+                        if not active:
+                            # Fall back at once instead of waiting for the hedge delay.
+                            schedule_hedge(launch())
+                        if not active:
+                            raise RouterError(
+                                "All LLM routes failed: "
+                                + "; ".join(f"{name}: {e}" for name, e in errors.items()),
+                                errors,
+                            )
+                        continue
+                    if kind == "done" and not stream and validate is not None:
+                        try:
+                            validate(payload)
+                        except ValueError as e:
+                            active.discard(attempt_id)
+                            errors[launched[attempt_id].name] = e
+                            if not active:
+                                schedule_hedge(launch())
+                            if active:
+                                continue
+                            # Nothing better is coming: return it and let the caller's own
+                            # parsing report the error.
+                            route_attrs["invalid"] = True
+                    if winner is None:
+                        winner = attempt_id
+                        route_attrs.update(route=launched[winner].name, attempts=len(launched))
+                        # The others are abandoned; streams stop reading, plain requests
+                        # finish on their own thread and are ignored.
+                        for i, cancelled in enumerate(cancel_events):
+                            if i != winner:
+                                cancelled.set()
+                    if kind == "chunk":
+                        yield "chunk", payload
+                    else:
+                        yield "done", payload, launched[winner]
+                        return
+            finally:
+                # Also reached when the caller stops reading a stream early.
+                for cancelled in cancel_events:
+                    cancelled.set()
+
+    def complete(self, request, validate=None):
+        """
+        Runs one chat completion (request = create() kwargs except model/stream/timeout).
+        `validate(text)` may raise ValueError to reject a response, which then counts as a
+        failed attempt. Returns (text, route). Raises RouterError if every route fails.
+        """
+        for item in self._race(request, stream=False, validate=validate):
+            if item[0] == "done":
+                return item[1], item[2]
+        raise RouterError("No response")
+
+    def stream(self, request):
+        """
+        Generator of text deltas from the first route to produce one. Hedging applies to the
+        time to first token; once a stream has won, a failure in it is raised as is.
+        """
+        for item in self._race(request, stream=True):
+            if item[0] == "chunk":
+                yield item[1]
+
+
+def _record_usage(attrs, usage):
+    if usage is not None:
+        attrs["prompt_tokens"] = usage.prompt_tokens
+        attrs["completion_tokens"] = usage.completion_tokens
+
+
+def build_routes(route_configs, default_api_key, default_base_url=None, default_model="gpt-3.5-turbo",
+                 breaker_failures=DEFAULT_BREAKER_FAILURES, breaker_reset_seconds=DEFAULT_BREAKER_RESET_SECONDS,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, keepalive_seconds=DEFAULT_KEEPALIVE_SECONDS):
+    """
+    Routes from a list of dicts (name, model, base_url, api_key, timeout, connect_timeout), in
+    fallback order. An empty list gives one route for default_model at default_base_url.
+    """
+    import openai
+
+    # The Limits class of the httpx the installed openai is built on (httpx or httpx2).
+    limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_seconds,
+    )
+    route_configs = list(route_configs or []) or [{"name": "default", "model": default_model}]
+    routes = []
+    for i, cfg in enumerate(route_configs):
+        timeout = float(cfg.get("timeout", DEFAULT_TIMEOUT))
+        client = openai.OpenAI(
+            api_key=cfg.get("api_key") or default_api_key,
+            base_url=cfg.get("base_url") or default_base_url or None,
+            timeout=openai.Timeout(timeout, connect=float(cfg.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT))),
+            # Retries are the router's job (fallback, hedging), not the client's.
+            max_retries=0,
+            http_client=openai.DefaultHttpxClient(limits=limits),
+        )
+        routes.append(Route(
+            name=cfg.get("name") or f"route{i + 1}",
+            model=cfg.get("model") or default_model,
+            client=client,
+            timeout=timeout,
+            breaker=CircuitBreaker(breaker_failures, breaker_reset_seconds),
+        ))
+    return routes
+
+
+@st.cache_resource
+def get_llm_router(default_model="gpt-3.5-turbo"):
+    """
+    Returns the process-wide LLMRouter, so breaker state and latency history are shared by
+    every session. Tunable in st.secrets["general"] with LLM_HEDGE_PERCENTILE (0 disables
+    hedging), LLM_HEDGE_MIN_SAMPLES, LLM_HEDGE_AFTER_SECONDS, LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_SECONDS, LLM_MAX_CONNECTIONS and LLM_KEEPALIVE_SECONDS.
+    """
+    general = st.secrets["general"]
+    # Includes importing openai on a cold process; recorded so cold starts show up on Ops.
+    with span("llm", "router_init") as attrs:
+        routes = build_routes(
+            [dict(cfg) for cfg in st.secrets.get("llm_routes", [])],
+            default_api_key=general["OPENAI_API_KEY"],
+            default_base_url=general.get("OPENAI_BASE_URL"),
+            default_model=default_model,
+            breaker_failures=int(general.get("LLM_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES)),
+            breaker_reset_seconds=float(general.get("LLM_BREAKER_RESET_SECONDS", DEFAULT_BREAKER_RESET_SECONDS)),
+            max_connections=int(general.get("LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+            keepalive_seconds=float(general.get("LLM_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_SECONDS)),
+        )
+        attrs["routes"] = len(routes)
+    return LLMRouter(
+        routes,
+        hedge_percentile=float(general.get("LLM_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)),
+        hedge_min_samples=int(general.get("LLM_HEDGE_MIN_SAMPLES", DEFAULT_HEDGE_MIN_SAMPLES)),
+        hedge_after_seconds=float(general.get("LLM_HEDGE_AFTER_SECONDS", DEFAULT_HEDGE_AFTER_SECONDS)),
+    )
@@ -0,0 +1,162 @@
+# metrics.py
+"""
+Timing spans for the hot paths: LLM requests, database queries and script reruns.
+Spans are buffered in memory and written to the metric_span table in batches by a
+background thread, so recording one costs a list append, not a round trip.
+"""
+import atexit
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg2
+import streamlit as st
+
+try:
+    # st.rerun() / st.stop() unwind the script with these; they are control flow, not errors.
+    from streamlit.runtime.scriptrunner import RerunException, StopException
+    SCRIPT_CONTROL_EXCEPTIONS = (RerunException, StopException)
+except ImportError:
+    SCRIPT_CONTROL_EXCEPTIONS = ()
+
+DEFAULT_FLUSH_SIZE = 200
+DEFAULT_FLUSH_SECONDS = 10
+# Spans beyond this are dropped (oldest first) if the database is unreachable for a while.
+MAX_BUFFERED = 20_000
+
+
+class MetricsBuffer:
+    """
+    Thread-safe buffer of spans (recorded_at, kind, name, duration_ms, attrs).
+    A daemon thread flushes it every `flush_seconds`, or as soon as `flush_size` spans are
+    waiting, and once more at interpreter exit.
+    """
+
+    def __init__(self, flush_size=DEFAULT_FLUSH_SIZE, flush_seconds=DEFAULT_FLUSH_SECONDS, enabled=True):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self._spans = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.last_error = None
+        if enabled:
+            threading.Thread(target=self._run, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def record(self, kind, name, duration_ms, attrs=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._spans.append((datetime.now(), kind, name, duration_ms, attrs or {}))
+            self.recorded += 1
+            overflow = len(self._spans) - MAX_BUFFERED
+            if overflow > 0:
+                del self._spans[:overflow]
+                self.dropped += overflow
+            pending = len(self._spans)
+        if pending >= self.flush_size:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Writes all buffered spans in one statement. Returns the number written; on a database
+        error the spans are put back and retried on the next flush. Any other error also puts
+        them back, and is re-raised.
+        """
+        from database import insert_metric_spans
+
+        with self._flush_lock:
+            with self._lock:
+                spans, self._spans = self._spans, []
+            if not spans:
+                return 0
+            try:
+                written = insert_metric_spans(spans)
+            except Exception as e:
+                # Whatever failed, the spans go back in the buffer; only database errors are expected.
+                with self._lock:
+                    self._spans[:0] = spans
+                    self.last_error = str(e)
+                if isinstance(e, psycopg2.Error):
+                    return 0
+                raise
+            with self._lock:
+                self.flushed += written
+                self.last_error = None
+            return written
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Never let a metrics failure take the flush thread down; it shows in stats().
+                with self._lock:
+                    self.last_error = str(e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "buffered": len(self._spans),
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "last_error": self.last_error,
+            }
+
+
+@st.cache_resource
+def get_metrics():
+    """
+    Returns the process-wide MetricsBuffer. Tunable with METRICS_FLUSH_SIZE, METRICS_FLUSH_SECONDS
+    and METRICS_ENABLED in st.secrets["general"].
+    """
+    general = st.secrets["general"]
+    return MetricsBuffer(
+        flush_size=int(general.get("METRICS_FLUSH_SIZE", DEFAULT_FLUSH_SIZE)),
+        flush_seconds=float(general.get("METRICS_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS)),
+        enabled=bool(general.get("METRICS_ENABLED", True)),
+    )
+
+
+@contextmanager
+def span(kind, name, **attrs):
+    """
+    Times the block and records it as a span. Yields the attrs dict so the block can add
+    details (token counts, flags). An exception escaping the block is recorded as attrs["error"],
+    except Streamlit's rerun/stop signals.
+    """
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except SCRIPT_CONTROL_EXCEPTIONS:
+        raise
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        get_metrics().record(kind, name, (time.perf_counter() - started) * 1000, attrs)
+
+
+def timed(kind, name=None):
+    """
+    Decorator recording every call of the function as a span named after it.
+    """
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,507 @@
+# migrations.py
+import streamlit as st
+
+from database import SCORE_KEYS, get_pool
+
+# Arbitrary application-wide key for pg_advisory_lock, so only one process migrates at a time.
+MIGRATION_LOCK_ID = 7_301_946_515
+
+
+# -------------------------------------------
+# Migration steps
+# -------------------------------------------
+# Every step receives a cursor and runs in its own transaction. Steps written before this
+# runner existed use IF NOT EXISTS / catalog checks, because databases created by the old
+# init_db() already have part of the schema.
+
+def _create_base_tables(cur):
+    """
+    Creates 'reps' and 'demo_analysis' (the original schema).
+    """
+    # Table: reps
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reps (
+            id SERIAL PRIMARY KEY,
+            rep_name TEXT UNIQUE NOT NULL,
+            team TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+    # Table: demo_analysis
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS demo_analysis (
+            id SERIAL PRIMARY KEY,
+            rep_name TEXT NOT NULL,
+            rep_team TEXT NOT NULL,
+            customer_name TEXT,
+            demo_date DATE,
+            analysis_json TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+def _create_analysis_cache(cur):
+    """
+    Creates analysis_cache, the persistent tier of the LLM analysis cache.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            analysis_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            hit_count INTEGER DEFAULT 0
+        )
+        """
+    )
+
+def _upgrade_demo_analysis(cur):
+    """
+    Stores analysis_json as JSONB and keeps one SMALLINT column per score plus score_overall
+    (their average) in sync through a BEFORE INSERT/UPDATE trigger, so score filters and
+    sorting never decode JSON. Existing rows get their scores in _backfill_demo_scores.
+    """
+    cur.execute(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'demo_analysis' AND column_name = 'analysis_json'
+        """
+    )
+    if cur.fetchone()[0] != "jsonb":
+        # Rows whose text is not valid JSON become NULL rather than failing the conversion.
+        cur.execute(
+            """
+            CREATE OR REPLACE FUNCTION try_jsonb(value TEXT) RETURNS JSONB AS $$
+            BEGIN
+                RETURN value::jsonb;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql IMMUTABLE
+            """
+        )
+        cur.execute("ALTER TABLE demo_analysis ALTER COLUMN analysis_json TYPE JSONB USING try_jsonb(analysis_json)")
+
+    for key in SCORE_KEYS:
+        cur.execute(f"ALTER TABLE demo_analysis ADD COLUMN IF NOT EXISTS score_{key} SMALLINT")
+    cur.execute("ALTER TABLE demo_analysis ADD COLUMN IF NOT EXISTS score_overall NUMERIC(3, 2)")
+
+    # A score counts if it is a JSON number or a numeric string ("4") between 1 and 5; anything
+    # else is NULL, so a stray value can neither overflow SMALLINT nor score_overall NUMERIC(3, 2).
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION demo_score(analysis JSONB, score_key TEXT) RETURNS SMALLINT AS $$
+            SELECT CASE WHEN v BETWEEN 1 AND 5 THEN round(v)::smallint END
+            FROM (
+                SELECT CASE
+                    WHEN jsonb_typeof(analysis -> 'scores' -> score_key) = 'number'
+                      OR (analysis -> 'scores' ->> score_key) ~ '^[[:space:]]*[0-9]+([.][0-9]+)?[[:space:]]*$'
+                    THEN (analysis -> 'scores' ->> score_key)::numeric
+                END AS v
+            ) AS score
+        $$ LANGUAGE sql IMMUTABLE
+        """
+    )
+    assignments = "\n".join(
+        f"NEW.score_{key} := demo_score(NEW.analysis_json, '{key}');" for key in SCORE_KEYS
+    )
+    score_columns = ", ".join(f"NEW.score_{key}" for key in SCORE_KEYS)
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION demo_analysis_extract_scores() RETURNS trigger AS $$
+        BEGIN
+            {assignments}
+            SELECT round(avg(s), 2) INTO NEW.score_overall
+            FROM unnest(ARRAY[{score_columns}]) AS s;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute("DROP TRIGGER IF EXISTS demo_analysis_scores ON demo_analysis")
+    cur.execute(
+        """
+        CREATE TRIGGER demo_analysis_scores
+        BEFORE INSERT OR UPDATE OF analysis_json ON demo_analysis
+        FOR EACH ROW EXECUTE FUNCTION demo_analysis_extract_scores()
+        """
+    )
+
+    cur.execute("CREATE INDEX IF NOT EXISTS demo_analysis_rep_date_idx ON demo_analysis (rep_name, demo_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS demo_analysis_team_date_idx ON demo_analysis (rep_team, demo_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS demo_analysis_score_idx ON demo_analysis (score_overall, id)")
+
+def _rollup_upsert_sql(record, sign):
+    # One signed contribution of `record` (NEW or OLD) to its (rep, team, week) rollup row.
+    # Demos with neither a demo_date nor a created_at have no week and are not counted.
+    columns = ["demo_count"]
+    values = [f"{sign}1"]
+    for key in (*SCORE_KEYS, "overall"):
+        columns += [f"sum_{key}", f"n_{key}"]
+        values += [
+            f"{sign}COALESCE({record}.score_{key}, 0)",
+            f"{sign}({record}.score_{key} IS NOT NULL)::int",
+        ]
+    updates = ", ".join(f"{c} = demo_score_rollup.{c} + EXCLUDED.{c}" for c in columns)
+    week = f"demo_week({record}.demo_date, {record}.created_at)"
+    return f"""
+            IF {week} IS NOT NULL THEN
+                INSERT INTO demo_score_rollup (rep_name, rep_team, week_start, {", ".join(columns)})
+                VALUES ({record}.rep_name, {record}.rep_team, {week}, {", ".join(values)})
+                ON CONFLICT (rep_name, rep_team, week_start) DO UPDATE SET {updates};
+            END IF;"""
+
+def _create_score_rollup(cur):
+    """
+    Creates demo_score_rollup: per (rep, team, week) demo counts plus score sums and counts,
+    kept current by an AFTER trigger on demo_analysis, so dashboards read a table whose size
+    depends on reps x weeks rather than on the number of demos. Averages are sum_x / n_x.
+    On first creation it is filled from the existing rows.
+    """
+    cur.execute("SELECT to_regclass('demo_score_rollup') IS NULL")
+    is_new = cur.fetchone()[0]
+
+    score_columns = ",\n".join(
+        f"                sum_{key} NUMERIC NOT NULL DEFAULT 0,\n                n_{key} INTEGER NOT NULL DEFAULT 0"
+        for key in (*SCORE_KEYS, "overall")
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS demo_score_rollup (
+            rep_name TEXT NOT NULL,
+            rep_team TEXT NOT NULL,
+            week_start DATE NOT NULL,
+            demo_count INTEGER NOT NULL DEFAULT 0,
+{score_columns},
+            PRIMARY KEY (rep_name, rep_team, week_start)
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS demo_score_rollup_week_idx ON demo_score_rollup (week_start)")
+    # Demos without a demo_date are counted in the week they were created. No CURRENT_DATE
+    # fallback: the function must stay IMMUTABLE so OLD and NEW rows map to the same week.
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION demo_week(demo_date DATE, created_at TIMESTAMP) RETURNS DATE AS $$
+            SELECT date_trunc('week', COALESCE(demo_date, created_at::date))::date
+        $$ LANGUAGE sql IMMUTABLE
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION demo_analysis_rollup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN{_rollup_upsert_sql("OLD", "-")}
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN{_rollup_upsert_sql("NEW", "+")}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    if is_new:
+        # Block writers while the trigger is installed and the existing rows are summed,
+        # so no demo is counted twice or missed.
+        cur.execute("LOCK TABLE demo_analysis IN SHARE ROW EXCLUSIVE MODE")
+        sums = ", ".join(
+            f"COALESCE(SUM(score_{key}), 0), COUNT(score_{key})" for key in (*SCORE_KEYS, "overall")
+        )
+        columns = ", ".join(f"sum_{key}, n_{key}" for key in (*SCORE_KEYS, "overall"))
+        cur.execute(
+            f"""
+            INSERT INTO demo_score_rollup (rep_name, rep_team, week_start, demo_count, {columns})
+            SELECT rep_name, rep_team, demo_week(demo_date, created_at), COUNT(*), {sums}
+            FROM demo_analysis
+            WHERE demo_week(demo_date, created_at) IS NOT NULL
+            GROUP BY rep_name, rep_team, demo_week(demo_date, created_at)
+            """
+        )
+
+    cur.execute("DROP TRIGGER IF EXISTS demo_analysis_rollup ON demo_analysis")
+    cur.execute(
+        """
+        CREATE TRIGGER demo_analysis_rollup
+        AFTER INSERT OR UPDATE OR DELETE ON demo_analysis
+        FOR EACH ROW EXECUTE FUNCTION demo_analysis_rollup()
+        """
+    )
+
+def _backfill_demo_scores(cur, batch_size=1000):
+    """
+    Fills the score columns of existing demo_analysis rows, committing one id range at a time
+    so the table is never locked as a whole. Rows already scored are skipped, so an interrupted
+    run simply resumes.
+    """
+    cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM demo_analysis")
+    min_id, max_id = cur.fetchone()
+
+    for start in range(min_id - 1, max_id, batch_size):
+        # Re-assigning analysis_json fires the score-extraction trigger.
+        cur.execute(
+            """
+            UPDATE demo_analysis SET analysis_json = analysis_json
+            WHERE id > %s AND id <= %s AND score_overall IS NULL AND analysis_json ? 'scores'
+            """,
+            (start, start + batch_size),
+        )
+        cur.connection.commit()
+
+def _create_metric_spans(cur):
+    """
+    Creates metric_span, where metrics.py flushes timing spans (LLM calls, queries, reruns).
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS metric_span (
+            id BIGSERIAL PRIMARY KEY,
+            recorded_at TIMESTAMP NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            duration_ms DOUBLE PRECISION NOT NULL,
+            attrs JSONB NOT NULL DEFAULT '{}'
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS metric_span_kind_time_idx ON metric_span (kind, recorded_at)")
+
+def _create_analysis_jobs(cur):
+    """
+    Creates analysis_job, the persistent queue worked by jobs.py. analysis_json fills in
+    section by section while a job runs; demo_result_id is set once the result is saved.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS analysis_job (
+            id BIGSERIAL PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            rep_name TEXT NOT NULL,
+            customer_name TEXT,
+            demo_date DATE,
+            transcript TEXT NOT NULL,
+            analysis_json JSONB,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            demo_result_id INTEGER REFERENCES demo_analysis (id) ON DELETE SET NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """
+    )
+    # Workers only look for queued or running jobs; keep that lookup off the finished history.
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS analysis_job_pending_idx ON analysis_job (id)
+        WHERE status IN ('queued', 'running')
+        """
+    )
+
+
+# Analysis text that is worth searching besides the transcript.
+SEARCH_ANALYSIS_PATHS = (
+    "$.pain_points.operational[*]",
+    "$.pain_points.technical[*]",
+    "$.pain_points.financial[*]",
+    "$.buying_signals.concerns[*]",
+    "$.management_summary.risks[*]",
+    "$.management_summary.recommendations[*]",
+)
+
+def _create_transcript_search(cur):
+    """
+    Adds demo_analysis.transcript and search_tsv, a tsvector over the analysis text (weight A)
+    and the transcript (weight B) with a GIN index, maintained by a BEFORE trigger.
+    Existing rows get their vectors in _backfill_search_vectors.
+    """
+    cur.execute("ALTER TABLE demo_analysis ADD COLUMN IF NOT EXISTS transcript TEXT")
+    cur.execute("ALTER TABLE demo_analysis ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR")
+
+    paths = ", ".join(f"'{path}'" for path in SEARCH_ANALYSIS_PATHS)
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION demo_analysis_text(analysis JSONB) RETURNS TEXT AS $$
+            SELECT COALESCE(string_agg(item #>> '{{}}', ' '), '')
+            FROM unnest(ARRAY[{paths}]::jsonpath[]) AS path,
+                 jsonb_path_query(COALESCE(analysis, '{{}}'::jsonb), path) AS item
+        $$ LANGUAGE sql IMMUTABLE
+        """
+    )
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION demo_search_vector(analysis JSONB, transcript TEXT) RETURNS TSVECTOR AS $$
+            SELECT setweight(to_tsvector('english', demo_analysis_text(analysis)), 'A')
+                || setweight(to_tsvector('english', COALESCE(transcript, '')), 'B')
+        $$ LANGUAGE sql IMMUTABLE
+        """
+    )
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION demo_analysis_update_search() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_tsv := demo_search_vector(NEW.analysis_json, NEW.transcript);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute("DROP TRIGGER IF EXISTS demo_analysis_search ON demo_analysis")
+    cur.execute(
+        """
+        CREATE TRIGGER demo_analysis_search
+        BEFORE INSERT OR UPDATE OF analysis_json, transcript ON demo_analysis
+        FOR EACH ROW EXECUTE FUNCTION demo_analysis_update_search()
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS demo_analysis_search_idx ON demo_analysis USING GIN (search_tsv)")
+
+    # The rollup only depends on these columns; skip it for updates that touch nothing else
+    # (such as the search backfill below).
+    rollup_columns = ", ".join(
+        ("rep_name", "rep_team", "demo_date", "created_at", "analysis_json", *(f"score_{k}" for k in SCORE_KEYS),
+         "score_overall")
+    )
+    cur.execute("DROP TRIGGER IF EXISTS demo_analysis_rollup ON demo_analysis")
+    cur.execute(
+        f"""
+        CREATE TRIGGER demo_analysis_rollup
+        AFTER INSERT OR DELETE OR UPDATE OF {rollup_columns} ON demo_analysis
+        FOR EACH ROW EXECUTE FUNCTION demo_analysis_rollup()
+        """
+    )
+
+def _backfill_search_vectors(cur, batch_size=1000):
+    """
+    Computes search_tsv for existing rows one id range per transaction, like _backfill_demo_scores.
+    """
+    cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM demo_analysis")
+    min_id, max_id = cur.fetchone()
+
+    for start in range(min_id - 1, max_id, batch_size):
+        cur.execute(
+            """
+            UPDATE demo_analysis SET search_tsv = demo_search_vector(analysis_json, transcript)
+            WHERE id > %s AND id <= %s AND search_tsv IS NULL
+            """,
+            (start, start + batch_size),
+        )
+        cur.connection.commit()
+
+def _add_idempotency_key(cur):
+    """
+    Adds demo_analysis.idempotency_key with a unique index, so saving the same analysis twice
+    (double clicks, reruns, retried batch flushes) upserts instead of duplicating the row.
+    Rows saved before this have no key and are left as they are.
+    """
+    cur.execute("ALTER TABLE demo_analysis ADD COLUMN IF NOT EXISTS idempotency_key TEXT")
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS demo_analysis_idempotency_key_idx ON demo_analysis (idempotency_key)"
+    )
+
+def _add_compact_cache_column(cur):
+    """
+    Adds analysis_cache.analysis_blob for analyses in analysis_model's compact form. New rows
+    store only the blob; rows written before this keep their analysis_json and stay readable.
+    """
+    cur.execute("ALTER TABLE analysis_cache ADD COLUMN IF NOT EXISTS analysis_blob BYTEA")
+    cur.execute("ALTER TABLE analysis_cache ALTER COLUMN analysis_json DROP NOT NULL")
+
+def _create_minhash(cur):
+    """
+    Creates demo_minhash: one MinHash signature per stored transcript (see similarity.py).
+    seq orders rows by insertion, so processes can load signatures added since their last look.
+    Signatures are filled in by the similarity index, not here.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS demo_minhash (
+            result_id INTEGER PRIMARY KEY REFERENCES demo_analysis (id) ON DELETE CASCADE,
+            seq BIGSERIAL UNIQUE,
+            signature BYTEA NOT NULL
+        )
+        """
+    )
+
+# Ordered (version, description, step). Append new steps at the end; never edit or
+# reorder steps that have been released.
+MIGRATIONS = [
+    (1, "create reps and demo_analysis", _create_base_tables),
+    (2, "create analysis_cache", _create_analysis_cache),
+    (3, "demo_analysis JSONB with score columns", _upgrade_demo_analysis),
+    (4, "weekly score rollup", _create_score_rollup),
+    (5, "backfill demo_analysis scores", _backfill_demo_scores),
+    (6, "create metric_span", _create_metric_spans),
+    (7, "create analysis_job", _create_analysis_jobs),
+    (8, "demo_analysis transcript and full-text search", _create_transcript_search),
+    (9, "backfill search vectors", _backfill_search_vectors),
+    (10, "demo_analysis idempotency key", _add_idempotency_key),
+    (11, "analysis_cache compact blob", _add_compact_cache_column),
+    (12, "create demo_minhash", _create_minhash),
+]
+
+
+# -------------------------------------------
+# Runner
+# -------------------------------------------
+def _applied_versions(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cur.fetchall()}
+
+def run_migrations():
+    """
+    Applies pending MIGRATIONS in order while holding a session-level advisory lock, recording
+    each one in schema_version in the same transaction as its step. Returns the versions applied.
+    """
+    applied_now = []
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            try:
+                applied = _applied_versions(cur)
+                conn.commit()
+                for version, description, step in MIGRATIONS:
+                    if version in applied:
+                        continue
+                    try:
+                        step(cur)
+                        cur.execute(
+                            "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                            (version, description),
+                        )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    applied_now.append(version)
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+    return applied_now
+
+@st.cache_resource
+def ensure_schema():
+    """
+    Runs pending migrations once per process; later calls return immediately.
+    Returns the latest schema version.
+    """
+    run_migrations()
+    return MIGRATIONS[-1][0]
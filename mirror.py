@@ -0,0 +1,475 @@
+# mirror.py
+"""
+Local, read-optimized copy of demo_analysis for the Explore page and reports.
+
+Rows are pulled from PostgreSQL by id watermark into an SQLite file with the scores as
+columns and the pain points and next steps flattened into their own tables, so browsing,
+counting and aggregating never touch the production database or decode JSON per request.
+Each batch is written in one SQLite transaction together with the new watermark, so an
+interrupted sync resumes where it stopped.
+
+demo_analysis rows are insert-only. Ids are taken before commit, so a row can become
+visible after a higher id has been synced; every sync re-checks the last `overlap` ids for
+such late rows (and for deleted ones).
+
+    python mirror.py            # sync now
+    python mirror.py --rebuild  # start over from id 0
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+import psycopg2
+import streamlit as st
+
+import database
+from database import (
+    MIRROR_COLUMNS,
+    RESULT_COLUMNS,
+    RESULT_SORTS,
+    SCORE_KEYS,
+    fetch_result_ids,
+    fetch_results_after,
+    fetch_results_by_ids,
+)
+from metrics import span, timed
+
+# Bump when the tables below change, or when demo_analysis rows already mirrored change in
+# PostgreSQL (sync only pulls new ids); the mirror is then rebuilt from scratch.
+# 2: scores outside 1-5 are NULL.
+SCHEMA_VERSION = "2"
+DEFAULT_PATH = "analytics_mirror.sqlite3"
+DEFAULT_SYNC_SECONDS = 30
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_OVERLAP = 1000
+PAIN_POINT_CATEGORIES = ("operational", "technical", "financial")
+
+SCORE_COLUMNS = tuple(f"score_{key}" for key in SCORE_KEYS)
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS demo_result (
+    id INTEGER PRIMARY KEY,
+    rep_name TEXT NOT NULL,
+    rep_team TEXT NOT NULL,
+    customer_name TEXT,
+    demo_date TEXT,
+    created_at TEXT,
+    score_overall REAL,
+    {", ".join(f"{column} INTEGER" for column in SCORE_COLUMNS)},
+    analysis_json TEXT
+);
+CREATE INDEX IF NOT EXISTS demo_result_rep_idx ON demo_result (rep_name, demo_date);
+CREATE INDEX IF NOT EXISTS demo_result_team_idx ON demo_result (rep_team, demo_date);
+CREATE INDEX IF NOT EXISTS demo_result_date_idx ON demo_result (demo_date);
+CREATE INDEX IF NOT EXISTS demo_result_score_idx ON demo_result (score_overall, id);
+CREATE TABLE IF NOT EXISTS pain_point (
+    result_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    point TEXT NOT NULL,
+    priority TEXT
+);
+CREATE INDEX IF NOT EXISTS pain_point_result_idx ON pain_point (result_id);
+CREATE TABLE IF NOT EXISTS next_step (
+    result_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    action TEXT,
+    owner TEXT,
+    deadline TEXT,
+    priority TEXT
+);
+CREATE INDEX IF NOT EXISTS next_step_result_idx ON next_step (result_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _pain_point_rows(result_id, analysis):
+    pain_points = analysis.get("pain_points") if isinstance(analysis.get("pain_points"), dict) else {}
+    priorities = pain_points.get("priority_level") if isinstance(pain_points.get("priority_level"), dict) else {}
+    for category in PAIN_POINT_CATEGORIES:
+        points = pain_points.get(category)
+        seen = set()
+        # One row per point per result, so the summary can count rows instead of DISTINCT ids.
+        for point in points if isinstance(points, list) else []:
+            if str(point).lower() not in seen:
+                seen.add(str(point).lower())
+                yield result_id, category, str(point), priorities.get(str(point))
+
+def _next_step_rows(result_id, analysis):
+    steps = analysis.get("next_steps")
+    for position, step in enumerate(steps if isinstance(steps, list) else []):
+        if isinstance(step, dict):
+            yield (result_id, position, *(
+                None if step.get(k) is None else str(step.get(k)) for k in ("action", "owner", "deadline", "priority")
+            ))
+
+def _to_mirror_row(row):
+    values = dict(zip(MIRROR_COLUMNS, row))
+    values["demo_date"] = values["demo_date"].isoformat() if values["demo_date"] else None
+    values["created_at"] = values["created_at"].isoformat(sep=" ") if values["created_at"] else None
+    if values["score_overall"] is not None:
+        values["score_overall"] = float(values["score_overall"])
+    return tuple(values[column] for column in MIRROR_COLUMNS)
+
+def _from_mirror_row(row):
+    """
+    SQLite row of RESULT_COLUMNS (plus anything after) with dates turned back into date/datetime.
+    """
+    row = list(row)
+    row[4] = date.fromisoformat(row[4]) if row[4] else None
+    row[5] = datetime.fromisoformat(row[5]) if row[5] else None
+    return tuple(row)
+
+
+class AnalyticsMirror:
+    """
+    The SQLite mirror at `path`. sync() pulls new rows; a daemon thread calls it every
+    `sync_seconds`. The read methods take the same filters as their database.py namesakes
+    and return rows of the same shape.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, sync_seconds=DEFAULT_SYNC_SECONDS, batch_size=DEFAULT_BATCH_SIZE,
+                 overlap=DEFAULT_OVERLAP, background=True):
+        self.path = path
+        self.sync_seconds = sync_seconds
+        self.batch_size = batch_size
+        self.overlap = overlap
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self.synced_at = None
+        self.last_error = None
+        self._create_schema()
+        if background:
+            threading.Thread(target=self._run, name="mirror-sync", daemon=True).start()
+
+    # ---------- storage ----------
+    def _conn(self):
+        # sqlite3 connections are per thread; WAL lets readers run while a sync writes.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if self._state(conn, "schema_version") != SCHEMA_VERSION:
+            self.rebuild()
+
+    @staticmethod
+    def _state(conn, name, default=None):
+        row = conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_state(conn, name, value):
+        conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def watermark(self):
+        return int(self._state(self._conn(), "last_id", 0))
+
+    def rebuild(self):
+        """
+        Empties the mirror (dropping tables of older schema versions); the next sync starts from id 0.
+        """
+        with self._sync_lock:
+            conn = self._conn()
+            with conn:
+                for table in ("demo_result", "pain_point", "next_step", "sync_state"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.executescript(SCHEMA)
+            with conn:
+                self._set_state(conn, "schema_version", SCHEMA_VERSION)
+                self._set_state(conn, "last_id", 0)
+
+    def _store(self, conn, rows, replace=False):
+        """
+        Writes PostgreSQL rows of MIRROR_COLUMNS. replace=True first removes the flattened
+        rows of ids that may already be mirrored; rows past the watermark are always new.
+        """
+        if replace:
+            self._delete(conn, [row[0] for row in rows])
+        conn.executemany(
+            f"INSERT INTO demo_result ({', '.join(MIRROR_COLUMNS)}) VALUES ({', '.join('?' * len(MIRROR_COLUMNS))})",
+            (_to_mirror_row(row) for row in rows),
+        )
+        analyses = [(row[0], json.loads(row[-1])) for row in rows if row[-1]]
+        analyses = [(result_id, analysis) for result_id, analysis in analyses if isinstance(analysis, dict)]
+        conn.executemany(
+            "INSERT INTO pain_point VALUES (?, ?, ?, ?)",
+            (r for result_id, analysis in analyses for r in _pain_point_rows(result_id, analysis)),
+        )
+        conn.executemany(
+            "INSERT INTO next_step VALUES (?, ?, ?, ?, ?, ?)",
+            (r for result_id, analysis in analyses for r in _next_step_rows(result_id, analysis)),
+        )
+
+    def _delete(self, conn, ids):
+        ids = [(i,) for i in ids]
+        for table, column in (("demo_result", "id"), ("pain_point", "result_id"), ("next_step", "result_id")):
+            conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", ids)
+
+    # ---------- sync ----------
+    def sync(self):
+        """
+        Pulls rows added since the watermark, batch by batch, after re-checking the overlap
+        window below it. Returns the number of rows written.
+        """
+        with self._sync_lock, span("mirror", "sync") as attrs:
+            conn = self._conn()
+            last_id = int(self._state(conn, "last_id", 0))
+            written = 0
+
+            if last_id:
+                low = max(0, last_id - self.overlap)
+                remote = set(fetch_result_ids(low, last_id))
+                local = {r[0] for r in conn.execute("SELECT id FROM demo_result WHERE id > ? AND id <= ?", (low, last_id))}
+                late, gone = remote - local, local - remote
+                with conn:
+                    if late:
+                        rows = fetch_results_by_ids(late)
+                        self._store(conn, rows, replace=True)
+                        written += len(rows)
+                    if gone:
+                        self._delete(conn, gone)
+                attrs["late"], attrs["deleted"] = len(late), len(gone)
+
+            while True:
+                rows = fetch_results_after(last_id, self.batch_size)
+                if not rows:
+                    break
+                with conn:
+                    self._store(conn, rows)
+                    last_id = rows[-1][0]
+                    self._set_state(conn, "last_id", last_id)
+                written += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+
+            if written:
+                # Keeps the query planner's statistics current (cheap when little changed).
+                conn.execute("PRAGMA optimize")
+            attrs["rows"] = written
+            self.synced_at = datetime.now()
+            self.last_error = None
+            return written
+
+    def _run(self):
+        while True:
+            time.sleep(self.sync_seconds)
+            try:
+                self.sync()
+            except Exception as e:
+                # Keep serving the last synced state; retry on the next tick.
+                self.last_error = str(e)
+
+    # ---------- reads ----------
+    @staticmethod
+    def _filter_clause(rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None, alias=""):
+        conditions, params = [], []
+        if rep_name:
+            conditions.append(f"{alias}rep_name = ?")
+            params.append(rep_name)
+        if rep_team:
+            conditions.append(f"{alias}rep_team = ?")
+            params.append(rep_team)
+        if date_from:
+            conditions.append(f"{alias}demo_date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            conditions.append(f"{alias}demo_date <= ?")
+            params.append(date_to.isoformat())
+        if min_score is not None:
+            conditions.append(f"{alias}score_overall >= ?")
+            params.append(min_score)
+        return conditions, params
+
+    @timed("mirror")
+    def fetch_results(self, rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None,
+                      sort="newest", page_size=25, cursor=None):
+        """
+        See database.fetch_results; database.results_cursor works on these rows too.
+        """
+        order_by, after_cursor, _ = RESULT_SORTS[sort]
+        conditions, params = self._filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+        if sort != "newest":
+            conditions.append("score_overall IS NOT NULL")
+        if cursor is not None:
+            conditions.append(after_cursor.replace("%s", "?"))
+            params.extend(float(v) if not isinstance(v, int) else v for v in cursor)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # Left alone, SQLite prefers the date index for a date range and then sorts every match;
+        # walking the score index stops after one page. A rep filter is selective enough already.
+        hint = "INDEXED BY demo_result_score_idx" if sort != "newest" and not rep_name else ""
+        rows = self._conn().execute(
+            f"SELECT {', '.join(RESULT_COLUMNS)} FROM demo_result {hint} {where} ORDER BY {order_by} LIMIT ?",
+            (*params, page_size),
+        ).fetchall()
+        return [_from_mirror_row(row) for row in rows]
+
+    @timed("mirror")
+    def count_results(self, rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None):
+        conditions, params = self._filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._conn().execute(f"SELECT COUNT(*) FROM demo_result {where}", params).fetchone()[0]
+
+    @timed("mirror")
+    def fetch_results_by_ids(self, ids):
+        """
+        RESULT_COLUMNS rows for the given ids, in the order given. Ids not mirrored yet are read
+        from PostgreSQL; ids that exist in neither (or while it is unreachable) are skipped.
+        """
+        if not ids:
+            return []
+        placeholders = ", ".join("?" * len(ids))
+        rows = self._conn().execute(
+            f"SELECT {', '.join(RESULT_COLUMNS)} FROM demo_result WHERE id IN ({placeholders})", list(ids)
+        ).fetchall()
+        by_id = {row[0]: _from_mirror_row(row) for row in rows}
+        missing = [i for i in ids if i not in by_id]
+        if missing:
+            try:
+                by_id.update((row[0], tuple(row[:len(RESULT_COLUMNS)])) for row in fetch_results_by_ids(missing))
+            except psycopg2.Error:
+                pass
+        return [by_id[i] for i in ids if i in by_id]
+
+    @timed("mirror")
+    def fetch_result_analysis(self, result_id):
+        """
+        The analysis dict of one result, or None. Results not mirrored yet (search reads
+        PostgreSQL directly) are read from PostgreSQL.
+        """
+        row = self._conn().execute("SELECT analysis_json FROM demo_result WHERE id = ?", (result_id,)).fetchone()
+        if row is None:
+            return database.fetch_result_analysis(result_id)
+        return json.loads(row[0]) if row[0] else None
+
+    @timed("mirror")
+    def fetch_result_filter_options(self):
+        conn = self._conn()
+        rep_names = [r[0] for r in conn.execute("SELECT DISTINCT rep_name FROM demo_result ORDER BY rep_name")]
+        teams = [r[0] for r in conn.execute("SELECT DISTINCT rep_team FROM demo_result ORDER BY rep_team")]
+        min_date, max_date = conn.execute("SELECT MIN(demo_date), MAX(demo_date) FROM demo_result").fetchone()
+        return (
+            rep_names,
+            teams,
+            date.fromisoformat(min_date) if min_date else None,
+            date.fromisoformat(max_date) if max_date else None,
+        )
+
+    def iter_results(self, rep_name=None, rep_team=None, date_from=None, date_to=None, min_score=None,
+                     itersize=2000):
+        """
+        See database.iter_results: rows of EXPORT_COLUMNS, oldest first, read lazily.
+        """
+        conditions, params = self._filter_clause(rep_name, rep_team, date_from, date_to, min_score)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # A connection of its own, so a long export does not hold this thread's read transaction.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cur = conn.execute(
+                f"SELECT {', '.join(RESULT_COLUMNS)}, analysis_json FROM demo_result {where} ORDER BY id", params
+            )
+            cur.arraysize = itersize
+            for row in cur:
+                yield (*_from_mirror_row(row[:-1]), json.loads(row[-1]) if row[-1] else None)
+        finally:
+            conn.close()
+
+    @timed("mirror")
+    def fetch_pain_point_summary(self, rep_name=None, rep_team=None, date_from=None, date_to=None,
+                                 min_score=None, limit=15):
+        """
+        Returns the most frequent pain points among matching results:
+        rows (category, point, demos, high_priority_demos).
+        """
+        conditions, params = self._filter_clause(rep_name, rep_team, date_from, date_to, min_score, alias="r.")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._conn().execute(
+            f"""
+            SELECT p.category, p.point, COUNT(*), COALESCE(SUM(p.priority = 'High'), 0)
+            FROM pain_point p JOIN demo_result r ON r.id = p.result_id
+            {where}
+            GROUP BY p.category, lower(p.point)
+            ORDER BY 3 DESC, 4 DESC
+            LIMIT ?
+            """,
+            (*params, limit),
+        ).fetchall()
+
+    @timed("mirror")
+    def fetch_next_step_summary(self, rep_name=None, rep_team=None, date_from=None, date_to=None,
+                                min_score=None):
+        """
+        Returns next steps of matching results per priority: rows (priority, steps, demos).
+        """
+        conditions, params = self._filter_clause(rep_name, rep_team, date_from, date_to, min_score, alias="r.")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._conn().execute(
+            f"""
+            SELECT COALESCE(s.priority, 'Unspecified'), COUNT(*), COUNT(DISTINCT s.result_id)
+            FROM next_step s JOIN demo_result r ON r.id = s.result_id
+            {where}
+            GROUP BY 1
+            ORDER BY CASE COALESCE(s.priority, '') WHEN 'High' THEN 0 WHEN 'Medium' THEN 1 WHEN 'Low' THEN 2 ELSE 3 END
+            """,
+            params,
+        ).fetchall()
+
+    def stats(self):
+        return {
+            "rows": self._conn().execute("SELECT COUNT(*) FROM demo_result").fetchone()[0],
+            "last_id": self.watermark(),
+            "synced_at": self.synced_at,
+            "last_error": self.last_error,
+        }
+
+
+@st.cache_resource
+def get_mirror():
+    """
+    Returns the process-wide AnalyticsMirror, synced once before first use. Configured with
+    MIRROR_PATH, MIRROR_SYNC_SECONDS and MIRROR_BATCH_SIZE in st.secrets["general"].
+    """
+    general = st.secrets["general"]
+    mirror = AnalyticsMirror(
+        path=general.get("MIRROR_PATH", DEFAULT_PATH),
+        sync_seconds=float(general.get("MIRROR_SYNC_SECONDS", DEFAULT_SYNC_SECONDS)),
+        batch_size=int(general.get("MIRROR_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+    )
+    try:
+        mirror.sync()
+    except psycopg2.Error as e:
+        # Serve whatever was mirrored before; the background thread keeps retrying.
+        mirror.last_error = str(e)
+    return mirror
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the local analytics mirror from PostgreSQL.")
+    parser.add_argument("--rebuild", action="store_true", help="empty the mirror and sync from the start")
+    args = parser.parse_args(argv)
+
+    general = st.secrets["general"]
+    mirror = AnalyticsMirror(
+        path=general.get("MIRROR_PATH", DEFAULT_PATH),
+        batch_size=int(general.get("MIRROR_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        background=False,
+    )
+    if args.rebuild:
+        mirror.rebuild()
+    started = time.perf_counter()
+    written = mirror.sync()
+    print(f"Synced {written} row(s) in {time.perf_counter() - started:.1f}s; mirror holds up to id {mirror.watermark()}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 # pages/1_Explore_Results.py
 import streamlit as st
-import json
+import tempfile
 from datetime import date
-from database import fetch_all_results
+import pandas as pd
+import psycopg2
+from database import fetch_result_transcript, results_cursor, search_results
+from migrations import ensure_schema
+from export import FORMATS, write_export
+from metrics import span
+from mirror import get_mirror
+from report import render_report
 
 # Must be top line:
 st.set_page_config(
@@ -34,24 +41,165 @@ def display_header():
     with col2:
         st.markdown("<h1>Explore Results</h1>", unsafe_allow_html=True)
 
-def show_scores(scores: dict):
-    st.markdown("**Scores**:")
-    for cat, val in scores.items():
-        st.write(f"- **{cat.title()}**: {val}/5")
+class AnalysisNotFound(LookupError):
+    pass
 
-def show_list_section(title: str, section_data: dict):
-    # A helper to show bullet points
-    st.markdown(f"**{title}**:")
-    for area, bullet_points in section_data.items():
-        st.write(f"**{area.title()}**")
-        for bullet in bullet_points:
-            st.markdown(f"- {bullet}")
+@st.cache_data(max_entries=500, show_spinner=False)
+def load_analysis(result_id: int) -> dict:
+    # Saved analyses don't change, so each one is fetched and parsed once per record id.
+    # A miss raises so it is not cached: the record may just not be synced yet.
+    analysis = get_mirror().fetch_result_analysis(result_id)
+    if analysis is None:
+        raise AnalysisNotFound(result_id)
+    return analysis
+
+def show_record(row):
+    id_val, rep_name, rep_team, customer_name, demo_date, created_at, score_overall = row
+    st.subheader(f"Record #{id_val}: {rep_name} - {rep_team}")
+    st.write(f"**Customer**: {customer_name}")
+    st.write(f"**Demo Date**: {demo_date}")
+    st.write(f"**Created At**: {created_at}")
+
+    try:
+        analysis = load_analysis(id_val)
+    except (AnalysisNotFound, psycopg2.Error):
+        analysis = None
+    if analysis:
+        render_report(analysis, title=None)
+
+    with st.expander("Transcript"):
+        transcript = fetch_result_transcript(id_val)
+        st.text(transcript or "No transcript stored for this record.")
+
+    with st.expander("Similar demos"):
+        show_similar(id_val)
+
+SIMILAR_LIMIT = 10
+
+def show_similar(result_id):
+    # Imported here: similarity.py brings in numpy, which only this panel needs.
+    from similarity import get_similarity_index
+
+    # Candidates come from the in-memory LSH buckets (similarity.py), not a scan of every transcript.
+    matches = get_similarity_index().similar_to(result_id, k=SIMILAR_LIMIT)
+    similarity = dict(matches)
+    rows = get_mirror().fetch_results_by_ids([i for i, _ in matches])
+    if not rows:
+        st.write("No stored demos with similar transcripts.")
+        return
+    st.caption("Demos whose transcripts share the most wording with this one.")
+    summary_table(rows, extra=lambda row: {"Similarity": f"{similarity[row[0]]:.0%}"})
+
+PAGE_SIZE = 25
+SEARCH_LIMIT = 50
+SORT_OPTIONS = {
+    "Newest": "newest",
+    "Highest score": "score_desc",
+    "Lowest score": "score_asc",
+}
+
+def build_export(fmt, filters):
+    # Runs only when the download is clicked. Rows stream from PostgreSQL (a server-side cursor,
+    # so exports always carry the current scores) into a temporary file. st.download_button
+    # then reads the whole file into memory to serve it, so the export's size, not the row
+    # count, bounds memory here; exports too large for that belong in the CLI.
+    out = tempfile.TemporaryFile(mode="w+", newline="", encoding="utf-8")
+    write_export(out, fmt, **filters)
+    out.seek(0)
+    return out.detach()
+
+def show_export(filters, total):
+    with st.expander("⬇️ Export filtered results"):
+        fmt = st.radio("Format", list(FORMATS), horizontal=True, format_func=str.upper)
+        st.download_button(
+            f"Download {total} record(s) as {fmt.upper()}",
+            data=lambda: build_export(fmt, filters),
+            file_name=f"demo_results.{fmt}",
+            mime=FORMATS[fmt],
+            on_click="ignore",
+        )
+        st.caption(
+            "The file is built in memory before the download starts; for very large exports use "
+            "the command line, which writes straight to disk: python export.py --help"
+        )
+
+def summary_table(rows, extra=None):
+    # One compact row per record; no analysis JSON is fetched or parsed for the table.
+    records = []
+    for row in rows:
+        id_val, rep_name, rep_team, customer_name, demo_date, created_at, score_overall = row[:7]
+        record = {
+            "ID": id_val,
+            "Rep": rep_name,
+            "Team": rep_team,
+            "Customer": customer_name,
+            "Demo Date": demo_date,
+            "Overall Score": float(score_overall) if score_overall is not None else None,
+            "Created At": created_at,
+        }
+        if extra:
+            record.update(extra(row))
+        records.append(record)
+    st.dataframe(records, hide_index=True)
+
+def open_record(rows):
+    # Only the record the user opens is loaded and rendered in detail.
+    records = {row[0]: row[:7] for row in rows}
+    selected_id = st.selectbox(
+        "Open record",
+        [None] + list(records),
+        format_func=lambda i: "—" if i is None else f"#{i}: {records[i][1]} - {records[i][3]} ({records[i][4]})",
+    )
+    if selected_id is not None:
+        show_record(records[selected_id])
+
+def show_mirror_status(mirror):
+    # Browsing reads the local mirror (mirror.py); say how fresh it is.
+    stats = mirror.stats()
+    cols = st.columns([4, 1])
+    with cols[0]:
+        synced = stats["synced_at"].strftime("%H:%M:%S") if stats["synced_at"] else "never"
+        st.caption(f"{stats['rows']} record(s) in the local mirror, last synced {synced}.")
+        if stats["last_error"]:
+            st.warning(f"Could not sync the mirror: {stats['last_error']}")
+    with cols[1]:
+        if st.button("Sync now"):
+            try:
+                mirror.sync()
+            except psycopg2.Error as e:
+                mirror.last_error = str(e)
+            st.rerun()
+
+def show_insights(mirror, filters):
+    with st.expander("Pain points and next steps"):
+        pain_points = mirror.fetch_pain_point_summary(**filters)
+        if pain_points:
+            st.caption("Most frequent pain points")
+            st.dataframe(
+                pd.DataFrame(pain_points, columns=["Category", "Pain Point", "Demos", "High Priority"]),
+                hide_index=True,
+            )
+        next_steps = mirror.fetch_next_step_summary(**filters)
+        if next_steps:
+            st.caption("Next steps by priority")
+            st.dataframe(pd.DataFrame(next_steps, columns=["Priority", "Steps", "Demos"]), hide_index=True)
+        if not pain_points and not next_steps:
+            st.write("No pain points or next steps in the matching records.")
+
+def show_search(query, filters):
+    rows = search_results(query, **filters, limit=SEARCH_LIMIT)
+    limited = f" (top {SEARCH_LIMIT})" if len(rows) == SEARCH_LIMIT else ""
+    st.write(f"{len(rows)} best match(es) for “{query}”{limited}:")
+    summary_table(rows, extra=lambda row: {"Rank": round(row[7], 3), "Match": row[8]})
+    open_record(rows)
 
 def show_data():
     st.title("Explore Demo Results")
 
-    rows = fetch_all_results()  # (id, rep_name, rep_team, customer_name, demo_date, analysis_json, created_at)
-    if not rows:
+    mirror = get_mirror()
+    show_mirror_status(mirror)
+    rep_names, teams, min_date, max_date = mirror.fetch_result_filter_options()
+    if not rep_names:
         st.info("No demo results found yet.")
         return
 
@@ -60,38 +208,13 @@ def show_data():
         st.session_state["auth"] = False
         st.stop()
 
-    # Build a list of dicts for easier filtering
-    data = []
-    for (id_val, rep_name, rep_team, customer_name, demo_date, analysis_str, created_at) in rows:
-        try:
-            analysis_json = json.loads(analysis_str)
-        except json.JSONDecodeError:
-            analysis_json = {}
-        data.append({
-            "ID": id_val,
-            "Rep": rep_name,
-            "Team": rep_team,
-            "Customer": customer_name,
-            "Demo Date": demo_date,       # e.g. "2025-02-11"
-            "Created At": created_at,     # timestamp
-            "Analysis": analysis_json
-        })
-
     # =========== Filters ===========
-    reps = sorted({d["Rep"] for d in data})
-    selected_rep = st.selectbox("Filter by Rep", ["All"] + list(reps))
+    selected_rep = st.selectbox("Filter by Rep", ["All"] + rep_names)
+    selected_team = st.selectbox("Filter by Team", ["All"] + teams)
 
-    teams = sorted({d["Team"] for d in data})
-    selected_team = st.selectbox("Filter by Team", ["All"] + list(teams))
-
-    # Date range filter: we find min/max from data
-    all_dates = [d["Demo Date"] for d in data if d["Demo Date"]]
-    if all_dates:
-        min_date = min(all_dates)
-        max_date = max(all_dates)
-    else:
-        min_date = date(2020, 1, 1)
-        max_date = date.today()
+    # Date range filter: defaults come from the min/max demo dates in the DB
+    min_date = min_date or date(2020, 1, 1)
+    max_date = max_date or date.today()
 
     st.write("**Date Range Filter**")
     from_date = st.date_input("From Date", value=min_date)
@@ -100,42 +223,58 @@ def show_data():
         st.error("From date cannot be greater than To date.")
         return
 
-    # =========== Apply Filters ===========
-    filtered_data = data
-    if selected_rep != "All":
-        filtered_data = [d for d in filtered_data if d["Rep"] == selected_rep]
-    if selected_team != "All":
-        filtered_data = [d for d in filtered_data if d["Team"] == selected_team]
-
-    filtered_data = [d for d in filtered_data if d["Demo Date"] is not None and from_date <= d["Demo Date"] <= to_date]
-
-    st.write(f"Showing {len(filtered_data)} record(s):")
-    for row in filtered_data:
-        with st.expander(f"Record #{row['ID']}: {row['Rep']} - {row['Team']}"):
-            st.write(f"**Customer**: {row['Customer']}")
-            st.write(f"**Demo Date**: {row['Demo Date']}")
-            st.write(f"**Created At**: {row['Created At']}")
-
-            analysis = row["Analysis"]
-            # Show Scores
-            scores = analysis.get("scores", {})
-            if scores:
-                show_scores(scores)
-
-            # Show Strengths
-            strengths = analysis.get("strengths", {})
-            if strengths:
-                show_list_section("Strengths", strengths)
-
-            # Show Improvements
-            improvements = analysis.get("improvements", {})
-            if improvements:
-                show_list_section("Improvements", improvements)
-
-            # ... Similarly, you can parse out other sections or
-            # show them in a style you prefer.
+    min_score = st.slider("Minimum Overall Score", min_value=0.0, max_value=5.0, value=0.0, step=0.5)
+    sort_label = st.selectbox("Sort by", list(SORT_OPTIONS))
+    sort = SORT_OPTIONS[sort_label]
+
+    filters = {
+        "rep_name": None if selected_rep == "All" else selected_rep,
+        "rep_team": None if selected_team == "All" else selected_team,
+        "date_from": from_date,
+        "date_to": to_date,
+        "min_score": min_score or None,
+    }
+
+    query = st.text_input("Search transcripts and analyses", placeholder='e.g. "Epic integration" pricing')
+    if query.strip():
+        show_search(query.strip(), filters)
+        return
+
+    # =========== Pagination (keyset) ===========
+    # "page_cursors" holds the cursor used for each page we've visited;
+    # it's reset whenever the filters or the sort change.
+    filter_key = (*filters.values(), sort)
+    if st.session_state.get("page_filter_key") != filter_key:
+        st.session_state["page_filter_key"] = filter_key
+        st.session_state["page_cursors"] = [None]
+    cursors = st.session_state["page_cursors"]
+
+    total = mirror.count_results(**filters)
+    # Fetch one extra row to know whether there is a next page
+    rows = mirror.fetch_results(**filters, sort=sort, page_size=PAGE_SIZE + 1, cursor=cursors[-1])
+    has_next = len(rows) > PAGE_SIZE
+    rows = rows[:PAGE_SIZE]
+
+    show_export(filters, total)
+    show_insights(mirror, filters)
+
+    st.write(f"Showing {len(rows)} of {total} record(s) (page {len(cursors)}):")
+    summary_table(rows)
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if len(cursors) > 1 and st.button("Previous page"):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if has_next and st.button("Next page"):
+            cursors.append(results_cursor(rows[-1], sort))
+            st.rerun()
+
+    open_record(rows)
 
 def app():
+    ensure_schema()
     if "auth" not in st.session_state:
         st.session_state["auth"] = False
 
@@ -150,4 +289,5 @@ def main():
     app()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with span("rerun", "Explore Results"):
+        main()
\ No newline at end of file
@@ -1,6 +1,17 @@
 # pages/2_Rep_Management.py
+import csv
+import io
+
+import pandas as pd
+import psycopg2
 import streamlit as st
-from database import init_db, fetch_all_reps, insert_rep, delete_rep
+from database import apply_rep_changes, fetch_all_reps, insert_rep, upsert_reps
+from migrations import ensure_schema
+from metrics import span
+
+TEAMS = ["DME", "Ortho"]
+PAGE_SIZE = 50
+CSV_COLUMNS = ("rep_name", "team")
 
 def display_header():
     logo_url = st.secrets["general"]["LOGO_URL"]
@@ -10,16 +21,136 @@ def display_header():
     with col2:
         st.markdown("<h1>Explore Results</h1>", unsafe_allow_html=True)
 
+def parse_rep_csv(data: bytes) -> list:
+    """
+    Reads a CSV with columns rep_name, team. Returns [(rep_name, team)]; raises ValueError
+    naming the first bad line.
+    """
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    missing = [c for c in CSV_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(missing)}")
+    rows = []
+    for line_no, row in enumerate(reader, start=2):
+        rep_name, team = (row["rep_name"] or "").strip(), (row["team"] or "").strip()
+        if not rep_name and not team:
+            continue
+        if not rep_name or not team:
+            raise ValueError(f"line {line_no}: rep_name and team are both required")
+        rows.append((rep_name, team))
+    return rows
+
+def bulk_import():
+    st.subheader("Bulk Import")
+    uploaded = st.file_uploader(
+        "CSV with columns rep_name, team. Existing reps are moved to the team in the file.",
+        type=["csv"],
+    )
+    if uploaded is not None and st.button("Import Reps"):
+        try:
+            rows = parse_rep_csv(uploaded.getvalue())
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Could not read {uploaded.name}: {e}")
+            return
+        inserted, updated = upsert_reps(rows)
+        st.success(
+            f"Imported {len(rows)} row(s): {inserted} new rep(s), {updated} team change(s), "
+            f"{len(rows) - inserted - updated} unchanged or repeated."
+        )
+
+def grid_changes(page_rows: pd.DataFrame, state: dict):
+    """
+    Turns the data editor's state (edited_rows, added_rows, deleted_rows, keyed by row
+    position) into (added, updated, deleted) for apply_rep_changes, plus a list of problems.
+    """
+    deleted = [int(page_rows.iloc[pos]["id"]) for pos in state.get("deleted_rows", [])]
+    updated = []
+    for pos, edits in state.get("edited_rows", {}).items():
+        row = page_rows.iloc[int(pos)]
+        if int(row["id"]) in deleted:
+            continue
+        rep_name = str(edits.get("Rep Name", row["Rep Name"]) or "").strip()
+        team = str(edits.get("Team", row["Team"]) or "").strip()
+        updated.append((int(row["id"]), rep_name, team))
+    added = [
+        (str(row.get("Rep Name") or "").strip(), str(row.get("Team") or "").strip())
+        for row in state.get("added_rows", [])
+    ]
+
+    problems = []
+    if any(not name or not team for name, team in added) or any(not name or not team for _, name, team in updated):
+        problems.append("Every rep needs a name and a team.")
+    # Names must stay unique across the whole table, not just this page.
+    renamed = {rep_id for rep_id, _, _ in updated} | set(deleted)
+    names = [name for rep_id, name, _, _ in fetch_all_reps() if rep_id not in renamed]
+    names += [name for _, name, _ in updated] + [name for name, _ in added]
+    duplicates = sorted({name for name in names if name and names.count(name) > 1})
+    if duplicates:
+        problems.append(f"Duplicate rep name(s): {', '.join(duplicates)}")
+    return added, updated, deleted, problems
+
+def rep_grid():
+    st.subheader("Current Reps")
+    rep_rows = fetch_all_reps()
+    if "rep_grid_version" not in st.session_state:
+        st.session_state["rep_grid_version"] = 0
+
+    query = st.text_input("Filter by name or team").strip().lower()
+    if query:
+        rep_rows = [r for r in rep_rows if query in r[1].lower() or query in r[2].lower()]
+    pages = max(1, -(-len(rep_rows) // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    start = (page - 1) * PAGE_SIZE
+    page_rows = pd.DataFrame(
+        rep_rows[start:start + PAGE_SIZE], columns=["id", "Rep Name", "Team", "Created"]
+    )
+    st.caption(
+        f"{len(rep_rows)} rep(s). Edit cells, add rows at the bottom or select rows and delete them, "
+        "then save; unsaved edits are lost when changing page or filter. "
+        "Renaming a rep does not rename their saved results."
+    )
+
+    key = f"rep_grid_{st.session_state['rep_grid_version']}_{page}_{query}"
+    st.data_editor(
+        page_rows,
+        key=key,
+        num_rows="dynamic",
+        hide_index=True,
+        column_order=["Rep Name", "Team", "Created"],
+        column_config={
+            "Rep Name": st.column_config.TextColumn(required=True),
+            "Team": st.column_config.SelectboxColumn(
+                options=sorted(set(TEAMS) | set(page_rows["Team"])), required=True
+            ),
+            "Created": st.column_config.DatetimeColumn(disabled=True),
+        },
+    )
+    added, updated, deleted, problems = grid_changes(page_rows, st.session_state.get(key, {}))
+    if not (added or updated or deleted):
+        return
+    st.write(f"Pending: {len(added)} new, {len(updated)} edited, {len(deleted)} deleted.")
+    for problem in problems:
+        st.error(problem)
+    if st.button("Save Changes", disabled=bool(problems)):
+        try:
+            apply_rep_changes(added, updated, deleted)
+        except psycopg2.IntegrityError as e:
+            st.error(f"Nothing was saved: {e.pgerror or e}")
+            return
+        # A new editor key drops the applied edits from the grid.
+        st.session_state["rep_grid_version"] += 1
+        st.rerun()
+
 def app():
     st.title("Rep Management")
     st.write("Add or remove Reps, and define their team (DME or Ortho).")
-    init_db()
+    ensure_schema()
     display_header()
     st.write("Exploring results...")
     # Form to add a new Rep
     with st.form("add_rep_form"):
         rep_name_input = st.text_input("Rep Name")
-        team_input = st.selectbox("Team", ["DME", "Ortho"])
+        team_input = st.selectbox("Team", TEAMS)
         submitted = st.form_submit_button("Add/Update Rep")
         if submitted:
             if rep_name_input.strip():
@@ -28,25 +159,12 @@ def app():
             else:
                 st.error("Rep name cannot be empty.")
 
-    st.subheader("Current Reps")
-    rep_rows = fetch_all_reps()
-    if not rep_rows:
-        st.info("No reps in the system.")
-    else:
-        for (rep_id, rep_name, team, created_at) in rep_rows:
-            col1, col2, col3 = st.columns([3,2,2])
-            with col1:
-                st.write(f"**{rep_name}** - {team}")
-            with col2:
-                st.write(f"{created_at}")
-            with col3:
-                if st.button(f"Delete {rep_name}", key=f"del_{rep_id}"):
-                    delete_rep(rep_id)
-                    st.warning(f"Deleted rep '{rep_name}'.")
-                    st.experimental_rerun()
+    bulk_import()
+    rep_grid()
 
 def main():
     app()
 
 if __name__ == "__main__":
-    main()
+    with span("rerun", "Rep Management"):
+        main()
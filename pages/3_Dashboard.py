@@ -0,0 +1,110 @@
+# pages/3_Dashboard.py
+import streamlit as st
+import pandas as pd
+from datetime import date, timedelta
+from database import SCORE_KEYS, fetch_rollup_teams, fetch_score_summary, fetch_score_trend
+from migrations import ensure_schema
+from metrics import span
+
+# Must be top line:
+st.set_page_config(
+    page_title="Dashboard",
+    page_icon=":bar_chart:",
+    layout="wide"
+)
+
+MIN_DEMOS_FOR_LEADERBOARD = 3
+
+def login_flow():
+    st.subheader("Enter Password to View Dashboard")
+    with st.form("password_form"):
+        password_input = st.text_input("Password", type="password")
+        submitted = st.form_submit_button("Submit")
+
+        if submitted:
+            correct_password = st.secrets["general"]["EXPLORE_PASSWORD"]
+            if password_input == correct_password:
+                st.session_state["auth"] = True
+                st.rerun()
+            else:
+                st.error("Invalid password. Try again.")
+                st.stop()
+
+def display_header():
+    logo_url = st.secrets["general"]["LOGO_URL"]
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        st.image(logo_url, width=80)
+    with col2:
+        st.markdown("<h1>Demo Score Dashboard</h1>", unsafe_allow_html=True)
+
+def summary_frame(rows, group_columns):
+    columns = [*group_columns, "Demos", *(k.replace("_", " ").title() for k in SCORE_KEYS), "Overall"]
+    frame = pd.DataFrame(rows, columns=columns)
+    score_columns = columns[len(group_columns) + 1:]
+    frame[score_columns] = frame[score_columns].astype(float)
+    return frame
+
+def show_dashboard():
+    # Every query below reads demo_score_rollup (one row per rep, team and week),
+    # so the page cost does not grow with the number of demos.
+    cols = st.columns(3)
+    with cols[0]:
+        from_date = st.date_input("From Date", value=date.today() - timedelta(weeks=12))
+    with cols[1]:
+        to_date = st.date_input("To Date", value=date.today())
+    with cols[2]:
+        # Teams come from the data: rep imports accept any team name.
+        team = st.selectbox("Team", ["All"] + fetch_rollup_teams())
+    if from_date > to_date:
+        st.error("From date cannot be greater than To date.")
+        return
+    rep_team = None if team == "All" else team
+
+    team_rows = fetch_score_summary("team", from_date, to_date, rep_team)
+    if not team_rows:
+        st.info("No demos in this period.")
+        return
+
+    teams = summary_frame(team_rows, ["Team"])
+    total_demos = int(teams["Demos"].sum())
+    scored = teams.dropna(subset=["Overall"])
+    metric_cols = st.columns(2)
+    metric_cols[0].metric("Demos", total_demos)
+    if not scored.empty:
+        weighted = (scored["Overall"] * scored["Demos"]).sum() / scored["Demos"].sum()
+        metric_cols[1].metric("Average Overall Score", f"{weighted:.2f}/5.0")
+
+    st.subheader("Team Averages")
+    st.dataframe(teams, hide_index=True)
+
+    st.subheader("Weekly Trend (Overall Score)")
+    trend_by = "rep" if rep_team else "team"
+    trend_rows = fetch_score_trend(trend_by, from_date, to_date, rep_team)
+    trend = pd.DataFrame(trend_rows, columns=["Week", "Group", "Demos", "Overall"])
+    trend["Overall"] = trend["Overall"].astype(float)
+    st.line_chart(trend.pivot(index="Week", columns="Group", values="Overall"))
+
+    st.subheader("Rep Leaderboard")
+    reps = summary_frame(fetch_score_summary("rep", from_date, to_date, rep_team), ["Rep", "Team"])
+    ranked = reps[reps["Demos"] >= MIN_DEMOS_FOR_LEADERBOARD]
+    st.caption(f"Reps with at least {MIN_DEMOS_FOR_LEADERBOARD} demos in the period, best overall score first.")
+    st.dataframe(ranked, hide_index=True)
+
+def app():
+    ensure_schema()
+    if "auth" not in st.session_state:
+        st.session_state["auth"] = False
+
+    display_header()
+    if not st.session_state["auth"]:
+        login_flow()
+    else:
+        show_dashboard()
+
+def main():
+    app()
+
+if __name__ == "__main__":
+    with span("rerun", "Dashboard"):
+        main()
@@ -0,0 +1,156 @@
+# pages/4_Ops.py
+import streamlit as st
+import pandas as pd
+from datetime import datetime, timedelta
+from database import (
+    fetch_parse_fallbacks,
+    fetch_preprocess_savings,
+    fetch_slowest_spans,
+    fetch_span_latency,
+    fetch_token_usage,
+    purge_metric_spans,
+)
+from llm_router import get_llm_router
+from migrations import ensure_schema
+from metrics import get_metrics, span
+
+# Must be top line:
+st.set_page_config(
+    page_title="Ops",
+    page_icon=":stopwatch:",
+    layout="wide"
+)
+
+WINDOWS = {
+    "Last hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(days=1),
+    "Last 7 days": timedelta(days=7),
+    "Last 30 days": timedelta(days=30),
+}
+LATENCY_COLUMNS = ["Kind", "Name", "Calls", "Errors", "p50 ms", "p90 ms", "p99 ms", "Max ms", "Total ms"]
+RETENTION_DAYS = 30
+
+def login_flow():
+    st.subheader("Enter Password to View Operations Metrics")
+    with st.form("password_form"):
+        password_input = st.text_input("Password", type="password")
+        submitted = st.form_submit_button("Submit")
+
+        if submitted:
+            correct_password = st.secrets["general"]["EXPLORE_PASSWORD"]
+            if password_input == correct_password:
+                st.session_state["auth"] = True
+                st.rerun()
+            else:
+                st.error("Invalid password. Try again.")
+                st.stop()
+
+def latency_frame(rows):
+    frame = pd.DataFrame(rows, columns=LATENCY_COLUMNS)
+    frame[LATENCY_COLUMNS[4:]] = frame[LATENCY_COLUMNS[4:]].astype(float).round(1)
+    return frame
+
+def show_llm(since):
+    st.subheader("LLM")
+    rows = fetch_span_latency(since, kinds=["analysis", "llm"])
+    if not rows:
+        st.info("No analyses in this period.")
+    else:
+        st.dataframe(latency_frame(rows), hide_index=True)
+
+    parsed, fallbacks = fetch_parse_fallbacks(since)
+    usage = pd.DataFrame(
+        fetch_token_usage(since),
+        columns=["Day", "Model", "Requests", "Prompt Tokens", "Completion Tokens"],
+    )
+    prepared, original_tokens, sent_tokens = fetch_preprocess_savings(since)
+    saved = original_tokens - sent_tokens
+    cols = st.columns(4)
+    cols[0].metric("Prompt Tokens", f"{int(usage['Prompt Tokens'].sum()):,}")
+    cols[1].metric("Completion Tokens", f"{int(usage['Completion Tokens'].sum()):,}")
+    cols[2].metric(
+        "Saved by Preprocessing",
+        f"{saved:,}",
+        help=f"Transcript tokens removed before sending, over {prepared} transcript(s)",
+    )
+    cols[3].metric("Parse Fallbacks", f"{fallbacks} of {parsed}")
+    if not usage.empty:
+        st.caption("Token spend per day")
+        st.bar_chart(usage, x="Day", y=["Prompt Tokens", "Completion Tokens"])
+    show_routes()
+
+def show_routes():
+    st.caption("LLM routes in fallback order (this process)")
+    frame = pd.DataFrame(get_llm_router().status(), columns=["Route", "Model", "Breaker", "p50 s", "p95 s"])
+    frame[["p50 s", "p95 s"]] = frame[["p50 s", "p95 s"]].astype(float).round(2)
+    st.dataframe(frame, hide_index=True)
+
+def show_database(since):
+    st.subheader("Database Queries")
+    # "mirror" spans are reads and syncs of the local analytics mirror (mirror.py);
+    # "similarity" spans are near-duplicate lookups and signature syncs (similarity.py).
+    rows = fetch_span_latency(since, kinds=["db", "mirror", "similarity"])
+    if not rows:
+        st.info("No queries recorded in this period.")
+        return
+    st.dataframe(latency_frame(rows), hide_index=True)
+    st.caption("Slowest individual queries")
+    slowest = fetch_slowest_spans("db", since)
+    st.dataframe(
+        pd.DataFrame(
+            [(at, name, round(ms, 1), attrs.get("error", "")) for at, name, ms, attrs in slowest],
+            columns=["Recorded At", "Query", "ms", "Error"],
+        ),
+        hide_index=True,
+    )
+
+def show_reruns(since):
+    st.subheader("Page Reruns")
+    rows = fetch_span_latency(since, kinds=["rerun"])
+    if not rows:
+        st.info("No reruns recorded in this period.")
+        return
+    st.dataframe(latency_frame(rows), hide_index=True)
+    st.caption("Reruns ended by st.rerun()/st.stop() are timed like any other and not counted as errors.")
+
+def show_ops():
+    metrics = get_metrics()
+    cols = st.columns([2, 1, 1])
+    with cols[0]:
+        window = st.selectbox("Period", list(WINDOWS), index=1)
+    with cols[1]:
+        if st.button("Flush Buffered Spans"):
+            metrics.flush()
+    with cols[2]:
+        if st.button(f"Purge > {RETENTION_DAYS} Days"):
+            st.success(f"Removed {purge_metric_spans(RETENTION_DAYS)} spans.")
+    stats = metrics.stats()
+    st.caption(
+        f"This process: {stats['recorded']} spans recorded, {stats['flushed']} flushed, "
+        f"{stats['buffered']} buffered, {stats['dropped']} dropped."
+    )
+    if stats["last_error"]:
+        st.warning(f"Last span flush failed: {stats['last_error']}")
+
+    since = datetime.now() - WINDOWS[window]
+    show_llm(since)
+    show_database(since)
+    show_reruns(since)
+
+def app():
+    ensure_schema()
+    if "auth" not in st.session_state:
+        st.session_state["auth"] = False
+
+    st.markdown("<h1>Operations</h1>", unsafe_allow_html=True)
+    if not st.session_state["auth"]:
+        login_flow()
+    else:
+        show_ops()
+
+def main():
+    app()
+
+if __name__ == "__main__":
+    with span("rerun", "Ops"):
+        main()
@@ -0,0 +1,227 @@
+# preprocess.py
+"""
+Transcript preprocessing and token budgeting before anything is sent to the model.
+
+Pasted transcripts carry a lot of tokens the analysis does not need: timestamps, filler words,
+stutters and a speaker label on every line. prepare_transcript() removes them, caps the result
+at an input budget and reports what was saved. Token counts use tiktoken when it is installed
+(and its encoding files are available); otherwise a ~4 characters/token estimate.
+
+    python preprocess.py transcript.txt --budget 12000
+
+prints the counts before and after each step, so savings can be checked offline.
+"""
+import argparse
+import functools
+import re
+import sys
+from dataclasses import dataclass, field
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# [00:12:03], (12:03), 00:12:03 -, 0:12 at the start of a line, and bracketed ones anywhere.
+TIMESTAMP_RE = re.compile(
+    r"(?:^[ \t]*[\[(]?\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?[\])]?[ \t]*(?:-+|–)?[ \t]*)"
+    r"|(?:[\[(]\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?[\])][ \t]*)",
+    re.M,
+)
+# Fillers that carry no meaning in a sales conversation. "like" and "so" are left alone:
+# too often they are real words.
+FILLER_RE = re.compile(
+    r"(?:,[ \t]*)?\b(?:uh-huh|mm+-?hmm+|u+m+|u+h+|e+r+m*|a+h+|h+m+)\b[,.]?[ \t]*"
+    r"|(?<=[,.!?] )(?:you know|i mean),[ \t]*",
+    re.I,
+)
+# Stutters: any word three or more times ("I I I"), a false start ("we- we"), or a doubled
+# word that is never grammatical twice ("the the"). Plain doubles like "had had", "that that"
+# or "bye bye" are real speech and stay.
+STUTTER_WORDS = "i|we|you|they|he|she|it|the|a|an|and|to|of|my|our"
+REPEAT_RE = re.compile(
+    r"\b([A-Za-z]+)(?:-?[ \t]+\1\b){2,}"
+    r"|\b([A-Za-z]+)-[ \t]+\2\b"
+    rf"|\b({STUTTER_WORDS})(?:[ \t]+\3\b)+",
+    re.I,
+)
+SPEAKER_RE = re.compile(r"^[ \t]*([A-Za-z][\w .'()\-]{0,40}):[ \t]*", re.M)
+TRUNCATION_MARK = "\n[... {turns} turn(s) omitted to fit the input budget ...]\n"
+
+
+# -------------------------------------------
+# Token counting
+# -------------------------------------------
+@functools.lru_cache(maxsize=None)
+def _encoding(name):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # Not installed, or the encoding file cannot be fetched (offline).
+        return None
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for English text (~4 characters per token).
+    """
+    return max(1, len(text) // 4)
+
+def count_tokens(text: str, encoding=DEFAULT_ENCODING) -> int:
+    enc = _encoding(encoding)
+    if enc is None:
+        return estimate_tokens(text)
+    return max(1, len(enc.encode(text, disallowed_special=())))
+
+def token_counter_name(encoding=DEFAULT_ENCODING) -> str:
+    return f"tiktoken/{encoding}" if _encoding(encoding) is not None else "estimate (4 chars/token)"
+
+
+# -------------------------------------------
+# Cleaning steps
+# -------------------------------------------
+def strip_timestamps(text: str) -> str:
+    return TIMESTAMP_RE.sub("", text)
+
+def remove_disfluencies(text: str) -> str:
+    text = FILLER_RE.sub(" ", text)
+    text = REPEAT_RE.sub(lambda m: m.group(1) or m.group(2) or m.group(3), text)
+    # Tidy what the removals leave behind: doubled spaces, space before punctuation, leading commas.
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    text = re.sub(r"[ \t]+([,.!?])", r"\1", text)
+    return re.sub(r"(^|: )[,.][ \t]*", r"\1", text, flags=re.M)
+
+def collapse_speaker_labels(text: str) -> str:
+    """
+    Joins consecutive lines of the same speaker into one turn with a single label,
+    and drops blank lines.
+    """
+    turns = []  # [speaker, [lines]]
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        m = SPEAKER_RE.match(line)
+        if m:
+            speaker, content = m.group(1).strip(), line[m.end():].strip()
+            same_turn = bool(turns) and turns[-1][0] == speaker
+        else:
+            # An unlabeled line continues the current speaker's turn; text without any
+            # speaker labels keeps its lines.
+            speaker, content = None, line.strip()
+            same_turn = bool(turns) and turns[-1][0] is not None
+        if same_turn:
+            turns[-1][1].append(content)
+        else:
+            turns.append([speaker, [content]])
+    return "\n".join(
+        f"{speaker}: {' '.join(lines)}" if speaker else " ".join(lines)
+        for speaker, lines in turns
+    )
+
+def trim_to_budget(text: str, budget: int, encoding=DEFAULT_ENCODING):
+    """
+    Drops whole turns from the middle of the transcript until it fits `budget` tokens, keeping
+    the opening (discovery) and the close (next steps). Returns (text, turns_omitted).
+    """
+    if budget <= 0 or count_tokens(text, encoding) <= budget:
+        return text, 0
+    turns = text.split("\n")
+    costs = [count_tokens(t, encoding) + 1 for t in turns]
+    marker_cost = count_tokens(TRUNCATION_MARK.format(turns=len(turns)), encoding)
+    head, tail, used = [], [], marker_cost
+    i, j = 0, len(turns) - 1
+    # Alternate between the start and the end, so both are kept in equal measure.
+    while i <= j:
+        take_head = len(head) <= len(tail)
+        k = i if take_head else j
+        if used + costs[k] > budget:
+            break
+        used += costs[k]
+        if take_head:
+            head.append(turns[k])
+            i += 1
+        else:
+            tail.insert(0, turns[k])
+            j -= 1
+    omitted = len(turns) - len(head) - len(tail)
+    if not head and not tail:
+        # One turn longer than the whole budget: keep its start and end by characters.
+        keep = max(1, (budget - marker_cost) * 4 // 2)
+        return text[:keep] + TRUNCATION_MARK.format(turns=0) + text[-keep:], 0
+    return "\n".join(head) + TRUNCATION_MARK.format(turns=omitted) + "\n".join(tail), omitted
+
+
+# -------------------------------------------
+# Pipeline
+# -------------------------------------------
+STEPS = (
+    ("timestamps", strip_timestamps),
+    ("disfluencies", remove_disfluencies),
+    ("speaker_labels", collapse_speaker_labels),
+)
+
+
+@dataclass
+class PreparedTranscript:
+    text: str
+    original_tokens: int
+    tokens: int
+    turns_omitted: int = 0
+    step_tokens: dict = field(default_factory=dict)  # step name -> tokens after it
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+def prepare_transcript(transcript: str, budget: int = 0, encoding=DEFAULT_ENCODING) -> PreparedTranscript:
+    """
+    Runs the cleaning STEPS, then trim_to_budget (budget <= 0 means unlimited).
+    """
+    original_tokens = count_tokens(transcript, encoding)
+    text, step_tokens = transcript, {}
+    for name, step in STEPS:
+        text = step(text)
+        step_tokens[name] = count_tokens(text, encoding)
+    text, omitted = trim_to_budget(text.strip(), budget, encoding)
+    tokens = count_tokens(text, encoding)
+    step_tokens["budget"] = tokens
+    return PreparedTranscript(text, original_tokens, tokens, omitted, step_tokens)
+
+
+def completion_budget(prompt_tokens: int, floor: int, ceiling: int, context_window: int) -> int:
+    """
+    max_tokens for a request: the JSON analysis grows with the material it summarizes, so
+    allow `floor` plus one token per eight prompt tokens, never more than `ceiling` nor more
+    than what is left of the context window.
+    """
+    wanted = min(ceiling, floor + prompt_tokens // 8)
+    return max(1, min(wanted, context_window - prompt_tokens))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the token savings of transcript preprocessing.")
+    parser.add_argument("transcript", help="transcript file ('-' for stdin)")
+    parser.add_argument("--budget", type=int, default=0, help="input token budget (0 = unlimited)")
+    parser.add_argument("--encoding", default=DEFAULT_ENCODING)
+    parser.add_argument("--show", action="store_true", help="print the prepared transcript")
+    args = parser.parse_args(argv)
+
+    with (sys.stdin if args.transcript == "-" else open(args.transcript, encoding="utf-8")) as fh:
+        transcript = fh.read()
+    prepared = prepare_transcript(transcript, args.budget, args.encoding)
+
+    print(f"Token counter: {token_counter_name(args.encoding)}")
+    print(f"{'original':<16}{prepared.original_tokens:>8}")
+    previous = prepared.original_tokens
+    for name, tokens in prepared.step_tokens.items():
+        print(f"{name:<16}{tokens:>8}  (-{previous - tokens})")
+        previous = tokens
+    share = prepared.tokens_saved / prepared.original_tokens if prepared.original_tokens else 0
+    print(f"{'saved':<16}{prepared.tokens_saved:>8}  ({share:.0%})")
+    if prepared.turns_omitted:
+        print(f"{prepared.turns_omitted} turn(s) omitted to fit the budget")
+    if args.show:
+        print()
+        print(prepared.text)
+
+
+if __name__ == "__main__":
+    main()
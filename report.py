@@ -0,0 +1,152 @@
+# report.py
+"""
+Rendering of an analysis dict as the Demo Performance Analysis report, shared by Home and
+Explore Results. build_report() turns the analysis into one markdown block per section in a
+single pass; render_report() lays those blocks out with a handful of elements instead of one
+st.markdown per bullet. Built reports are memoized by a hash of the analysis, so showing a
+saved or cached analysis again only costs the hash and the layout.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import streamlit as st
+
+MAX_CACHED_REPORTS = 500
+# Markdown hard line break: keeps one bullet per line inside a single block.
+LINE = "  \n"
+PARAGRAPH = "\n\n"
+
+
+@dataclass(frozen=True)
+class Report:
+    summary_points: str
+    summary_risks: str
+    overall_score: str
+    pain_points: str
+    buying_signals: str
+    strengths: str
+    improvements: str
+    examples: str
+    next_steps: str
+
+
+def _priority_emoji(priority):
+    return "🔴" if priority == "High" else "🟡" if priority == "Medium" else "🟢"
+
+def _lines(*groups):
+    return LINE.join(line for group in groups for line in group)
+
+def _scored_areas(areas, scores):
+    return PARAGRAPH.join(
+        _lines([f"**{area}** ({scores.get(area, 0)}/5)"], (f"• {point}" for point in details))
+        for area, details in areas.items()
+    )
+
+def build_report(analysis: dict) -> Report:
+    """
+    The report's markdown blocks for an analysis; sections missing from it are empty strings.
+    """
+    summary = analysis.get("management_summary", {})
+    scores = analysis.get("scores", {})
+    numeric_scores = [v for v in scores.values() if isinstance(v, (int, float))]
+    pain_points = analysis.get("pain_points", {})
+    priorities = pain_points.get("priority_level", {})
+    buying_signals = analysis.get("buying_signals", {})
+
+    return Report(
+        summary_points=_lines(
+            ["### Key Points & Decisions"],
+            (f"• {point}" for point in summary.get("key_points", [])),
+            (f"✓ {decision}" for decision in summary.get("decisions", [])),
+        ) if summary else "",
+        summary_risks=_lines(
+            ["### Risks & Recommendations"],
+            (f"⚠️ {risk}" for risk in summary.get("risks", [])),
+            (f"💡 {rec}" for rec in summary.get("recommendations", [])),
+        ) if summary else "",
+        overall_score=f"{sum(numeric_scores) / len(numeric_scores):.1f}/5.0" if numeric_scores else "",
+        pain_points=PARAGRAPH.join(
+            _lines([f"**{category.title()}**"],
+                   (f"{_priority_emoji(priorities.get(point, 'Medium'))} {point}" for point in points))
+            for category, points in pain_points.items() if category != "priority_level"
+        ),
+        buying_signals=PARAGRAPH.join([
+            _lines(["**Positive Signals**"], (f"✅ {signal}" for signal in buying_signals.get("positive", []))),
+            _lines(["**Concerns/Objections**"], (f"❓ {concern}" for concern in buying_signals.get("concerns", []))),
+        ]),
+        strengths=_scored_areas(analysis.get("strengths", {}), scores),
+        improvements=_scored_areas(analysis.get("improvements", {}), scores),
+        examples=PARAGRAPH.join(
+            _lines([f"**{area}**"], (f"• {ex}" for ex in ex_list))
+            for area, ex_list in analysis.get("examples", {}).items()
+        ),
+        next_steps=PARAGRAPH.join(
+            _lines([
+                f"{_priority_emoji(item.get('priority', ''))} **{item.get('action', '')}**",
+                f"Owner: {item.get('owner', '')} | Due: {item.get('deadline', '')}",
+            ])
+            for item in analysis.get("next_steps", [])
+        ),
+    )
+
+def analysis_digest(analysis: dict) -> str:
+    return hashlib.sha256(json.dumps(analysis, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+# digest -> Report, least recently used first. Reports are immutable, so hits share one object
+# (st.cache_data would pickle a copy per hit, which costs more than building the report).
+_reports = OrderedDict()
+_reports_lock = threading.Lock()
+
+def get_report(analysis: dict) -> Report:
+    digest = analysis_digest(analysis)
+    with _reports_lock:
+        report = _reports.get(digest)
+        if report is not None:
+            _reports.move_to_end(digest)
+            return report
+    report = build_report(analysis)
+    with _reports_lock:
+        _reports[digest] = report
+        while len(_reports) > MAX_CACHED_REPORTS:
+            _reports.popitem(last=False)
+    return report
+
+def _block(markdown):
+    if markdown:
+        st.markdown(markdown)
+
+def render_report(analysis: dict, title="Demo Performance Analysis"):
+    """
+    Shows the full report for an analysis (a partial one from a running job is fine).
+    """
+    report = get_report(analysis)
+    if title:
+        st.header(title)
+    with st.expander("📊 Management Summary", expanded=True):
+        if report.summary_points or report.summary_risks:
+            cols = st.columns(2)
+            with cols[0]:
+                _block(report.summary_points)
+            with cols[1]:
+                _block(report.summary_risks)
+    if report.overall_score:
+        st.metric("Overall Demo Score", report.overall_score)
+
+    cols = st.columns(2)
+    with cols[0].expander("🎯 Pain Points", expanded=True):
+        _block(report.pain_points)
+    with cols[1].expander("💭 Buying Signals", expanded=True):
+        _block(report.buying_signals)
+
+    cols = st.columns(3)
+    with cols[0].expander("💪 Strengths", expanded=True):
+        _block(report.strengths)
+    with cols[1].expander("🎯 Areas for Improvement", expanded=True):
+        _block(report.improvements)
+    with cols[2].expander("📝 Specific Examples", expanded=True):
+        _block(report.examples)
+    with st.expander("📋 Next Steps", expanded=True):
+        _block(report.next_steps)
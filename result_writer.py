@@ -0,0 +1,115 @@
+# result_writer.py
+"""
+Write-behind buffer for saving analyses in bulk. Callers hand results to submit() and move
+on; a background thread writes whatever has accumulated with database.save_demo_results,
+one transaction per flush. Every row carries an idempotency key, so a flush that is retried
+after an error, or a result submitted twice, never duplicates a row.
+"""
+import atexit
+import json
+import threading
+
+import psycopg2
+import streamlit as st
+
+from database import demo_result_key, save_demo_results
+
+DEFAULT_FLUSH_SIZE = 100
+DEFAULT_FLUSH_SECONDS = 2
+
+
+class ResultWriter:
+    """
+    Thread-safe buffer of analyses waiting to be saved. A daemon thread flushes it every
+    `flush_seconds`, or as soon as `flush_size` rows are waiting, and once more at
+    interpreter exit. On a database error the rows stay buffered for the next flush.
+    """
+
+    def __init__(self, flush_size=DEFAULT_FLUSH_SIZE, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.submitted = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.last_error = None
+        threading.Thread(target=self._run, name="result-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def submit(self, rep_name, customer_name, demo_date, analysis, transcript=None, idempotency_key=None):
+        """
+        Queues one analysis (a dict) for saving. Returns its idempotency key.
+        """
+        analysis_json = json.dumps(analysis)
+        key = idempotency_key or demo_result_key(rep_name, customer_name, demo_date, transcript, analysis_json)
+        with self._lock:
+            self._rows.append((key, rep_name, customer_name, demo_date, analysis_json, transcript))
+            self.submitted += 1
+            pending = len(self._rows)
+        if pending >= self.flush_size:
+            self._wake.set()
+        return key
+
+    def flush(self):
+        """
+        Saves everything buffered in one transaction. Returns the number of new rows
+        (already-saved keys are skipped); on a database error returns 0 and keeps the rows.
+        Any other error also keeps the rows, and is re-raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                inserted = save_demo_results(rows)
+            except Exception as e:
+                # Whatever failed, the rows go back in the buffer; only database errors are expected.
+                with self._lock:
+                    self._rows[:0] = rows
+                    self.last_error = str(e)
+                if isinstance(e, psycopg2.Error):
+                    return 0
+                raise
+            with self._lock:
+                self.inserted += inserted
+                self.duplicates += len(rows) - inserted
+                self.last_error = None
+            return inserted
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Never let a failure take the flush thread down; it shows in stats().
+                with self._lock:
+                    self.last_error = str(e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "buffered": len(self._rows),
+                "submitted": self.submitted,
+                "inserted": self.inserted,
+                "duplicates": self.duplicates,
+                "last_error": self.last_error,
+            }
+
+
+@st.cache_resource
+def get_result_writer():
+    """
+    Returns the process-wide ResultWriter. Tunable with RESULT_FLUSH_SIZE and
+    RESULT_FLUSH_SECONDS in st.secrets["general"].
+    """
+    general = st.secrets["general"]
+    return ResultWriter(
+        flush_size=int(general.get("RESULT_FLUSH_SIZE", DEFAULT_FLUSH_SIZE)),
+        flush_seconds=float(general.get("RESULT_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS)),
+    )
@@ -0,0 +1,270 @@
+# similarity.py
+"""
+Near-duplicate and similar-transcript lookup with MinHash and locality-sensitive hashing.
+
+Each stored transcript gets a MinHash signature over its word 3-shingles (timestamps,
+filler words and stutters removed, as in preprocess.py). Two signatures agree in a fraction of positions that
+estimates the Jaccard similarity of the two shingle sets. LSH splits signatures into bands;
+transcripts that share any whole band land in the same bucket, so a lookup only compares
+against the few transcripts in its buckets instead of every stored one.
+
+Signatures are persisted in the demo_minhash table. Each process keeps the band buckets in
+memory and loads signatures added since its last look (by demo_minhash.seq). A daemon
+thread computes signatures for stored transcripts that have none yet. "Similar" here means
+shared wording (re-pasted or edited transcripts, follow-up demos with the same customer),
+not similar topics in different words.
+"""
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import psycopg2
+import streamlit as st
+
+from database import fetch_minhashes_after, fetch_transcripts_without_minhash, store_minhashes
+from metrics import span, timed
+from preprocess import strip_timestamps
+
+NUM_PERM = 128
+# 32 bands of 4 rows: pairs above ~0.5 similarity almost always share a bucket, pairs below
+# ~0.2 rarely do. Changing these (or the shingling) needs demo_minhash emptied.
+BANDS = 32
+SHINGLE_WORDS = 3
+DEFAULT_DUPLICATE_THRESHOLD = 0.9
+DEFAULT_SYNC_SECONDS = 60
+DEFAULT_BATCH_SIZE = 500
+# Ids (and seqs) re-checked below the watermarks on each sync, for inserts that committed late.
+DEFAULT_OVERLAP = 1000
+
+# Multiply-shift hash family: h(x) = ((a * x + b) mod 2**64) >> 32, one (a, b) per permutation.
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+# Stored for transcripts without words, so they are not fetched again; never indexed.
+EMPTY_SIGNATURE = b"\xff" * (NUM_PERM * 4)
+_WORD_RE = re.compile(r"\w+")
+# The fillers preprocess.FILLER_RE removes, as single words ("uh-huh" is two here).
+_FILLER_RE = re.compile(r"uh|huh|u+m+|u+h+|e+r+m*|a+h+|h+m+|m+(?:h+m+)?")
+# Combine three word hashes into one shingle hash, and the rows of a band into one bucket key
+# (odd 64-bit constants; products wrap).
+_SHINGLE_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F], dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 2**63, NUM_PERM // BANDS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def word_hashes(transcript: str):
+    """
+    crc32 of each lowercase word of a transcript, without timestamps, filler words or
+    immediate repeats, so re-pasted or lightly cleaned-up copies hash the same.
+    """
+    words = _WORD_RE.findall(strip_timestamps(transcript).lower())
+    # Each distinct word is checked and hashed once.
+    vocabulary = {word: zlib.crc32(word.encode("utf-8")) for word in set(words) if not _FILLER_RE.fullmatch(word)}
+    hashes = np.array([vocabulary[word] for word in words if word in vocabulary], dtype=np.uint64)
+    if len(hashes) > 1:
+        hashes = hashes[np.concatenate(([True], hashes[1:] != hashes[:-1]))]
+    return hashes
+
+def _band_keys(signatures):
+    """
+    (n, NUM_PERM) signatures -> (n, BANDS) uint64 keys, one hash per band of rows.
+    """
+    bands = signatures.reshape(len(signatures), BANDS, NUM_PERM // BANDS).astype(np.uint64)
+    return (bands * _BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64)
+
+def _signature_bytes(signature):
+    return EMPTY_SIGNATURE if signature is None else signature.tobytes()
+
+def minhash(transcript: str):
+    """
+    The NUM_PERM-value uint32 signature of a transcript's word 3-shingles, or None if it has
+    no words.
+    """
+    hashes = word_hashes(transcript)
+    if not len(hashes):
+        return None
+    if len(hashes) >= SHINGLE_WORDS:
+        a, b = _SHINGLE_MULTIPLIERS
+        hashes = hashes[:-2] * a + hashes[1:-1] * b + hashes[2:]
+    shingles = np.unique(hashes)
+    return ((np.outer(shingles, _A) + _B) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+class SimilarityIndex:
+    """
+    In-memory LSH index over the signatures in demo_minhash. sync() computes missing
+    signatures and loads new ones; a daemon thread calls it every `sync_seconds`.
+    """
+
+    def __init__(self, sync_seconds=DEFAULT_SYNC_SECONDS, batch_size=DEFAULT_BATCH_SIZE,
+                 overlap=DEFAULT_OVERLAP, background=True):
+        self.sync_seconds = sync_seconds
+        self.batch_size = batch_size
+        self.overlap = overlap
+        self._ids = []                     # position -> result_id
+        self._positions = {}               # result_id -> position
+        self._signatures = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self._buckets = [{} for _ in range(BANDS)]  # band -> {band key: [positions]}
+        self._seq = 0
+        self._scanned_id = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.synced_at = None
+        self.last_error = None
+        if background:
+            threading.Thread(target=self._run, name="similarity-sync", daemon=True).start()
+
+    # ---------- index ----------
+    def add(self, result_ids, signatures):
+        """
+        Indexes (n, NUM_PERM) signatures under result_ids, skipping ids already indexed.
+        """
+        with self._lock:
+            keep = [i for i, result_id in enumerate(result_ids) if result_id not in self._positions]
+            if not keep:
+                return 0
+            result_ids = [result_ids[i] for i in keep]
+            signatures = signatures[keep]
+            start, end = len(self._ids), len(self._ids) + len(result_ids)
+            if end > len(self._signatures):
+                grown = np.empty((max(end, 2 * len(self._signatures)), NUM_PERM), dtype=np.uint32)
+                grown[:start] = self._signatures[:start]
+                self._signatures = grown
+            self._signatures[start:end] = signatures
+            self._positions.update(zip(result_ids, range(start, end)))
+            self._ids.extend(result_ids)
+            keys = _band_keys(signatures)
+            for band, bucket in enumerate(self._buckets):
+                for position, key in zip(range(start, end), keys[:, band].tolist()):
+                    bucket.setdefault(key, []).append(position)
+            return len(result_ids)
+
+    def query(self, signature, k=10, min_similarity=0.0, exclude=None):
+        """
+        Returns up to k (result_id, estimated similarity) for indexed transcripts sharing a
+        bucket with `signature`, most similar first.
+        """
+        keys = _band_keys(signature[None, :])[0].tolist()
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, keys):
+                candidates.update(bucket.get(key, ()))
+            if not candidates:
+                return []
+            positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            scores = (self._signatures[positions] == signature).mean(axis=1)
+            ids = [self._ids[p] for p in positions]
+        ranked = sorted(zip(ids, scores.tolist()), key=lambda pair: -pair[1])
+        return [(i, s) for i, s in ranked if s >= min_similarity and i != exclude][:k]
+
+    @timed("similarity")
+    def find_duplicate(self, transcript, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+        """
+        Returns (result_id, similarity) of the stored transcript most like `transcript` if
+        it is at least `threshold` similar, else None.
+        """
+        signature = minhash(transcript)
+        if signature is None:
+            return None
+        matches = self.query(signature, k=1, min_similarity=threshold)
+        return matches[0] if matches else None
+
+    @timed("similarity")
+    def similar_to(self, result_id, k=10, min_similarity=0.2):
+        """
+        Returns up to k (result_id, similarity) for stored transcripts like that of result_id
+        (excluding itself); [] if it has no indexed transcript.
+        """
+        with self._lock:
+            position = self._positions.get(result_id)
+            signature = None if position is None else self._signatures[position].copy()
+        if signature is None:
+            return []
+        return self.query(signature, k=k, min_similarity=min_similarity, exclude=result_id)
+
+    # ---------- sync ----------
+    def load(self):
+        """
+        Adds signatures stored since the last load (any process may have written them),
+        re-reading `overlap` seqs below the watermark. Returns the number added.
+        """
+        added = 0
+        after = max(0, self._seq - self.overlap)
+        while True:
+            rows = fetch_minhashes_after(after, self.batch_size * 10)
+            if not rows:
+                break
+            indexed = [(result_id, signature) for _, result_id, signature in rows if signature != EMPTY_SIGNATURE]
+            if indexed:
+                added += self.add(
+                    [result_id for result_id, _ in indexed],
+                    np.frombuffer(b"".join(signature for _, signature in indexed), dtype=np.uint32).reshape(-1, NUM_PERM),
+                )
+            # Demos with signatures were scanned already, whichever process did it.
+            self._scanned_id = max(self._scanned_id, max(result_id for _, result_id, _ in rows))
+            self._seq = max(self._seq, rows[-1][0])
+            after = rows[-1][0]
+        return added
+
+    def sync(self):
+        """
+        Computes and stores signatures for transcripts that have none, then loads everything
+        new. Returns the number of signatures computed here.
+        """
+        with self._sync_lock, span("similarity", "sync") as attrs:
+            computed = 0
+            after = max(0, self._scanned_id - self.overlap)
+            while True:
+                rows = fetch_transcripts_without_minhash(after, self.batch_size)
+                computed += store_minhashes([
+                    (result_id, _signature_bytes(minhash(transcript))) for result_id, transcript in rows
+                ])
+                if rows:
+                    after = rows[-1][0]
+                    self._scanned_id = max(self._scanned_id, after)
+                if len(rows) < self.batch_size:
+                    break
+            attrs["computed"] = computed
+            attrs["loaded"] = self.load()
+            self.synced_at = datetime.now()
+            self.last_error = None
+            return computed
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(self.sync_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "signatures": len(self._ids),
+                "buckets": sum(len(b) for b in self._buckets),
+                "seq": self._seq,
+                "synced_at": self.synced_at,
+                "last_error": self.last_error,
+            }
+
+
+@st.cache_resource
+def get_similarity_index():
+    """
+    Returns the process-wide SimilarityIndex with the stored signatures loaded; missing ones
+    are computed in the background. Configured with SIMILARITY_SYNC_SECONDS and
+    SIMILARITY_BATCH_SIZE in st.secrets["general"].
+    """
+    general = st.secrets["general"]
+    index = SimilarityIndex(
+        sync_seconds=float(general.get("SIMILARITY_SYNC_SECONDS", DEFAULT_SYNC_SECONDS)),
+        batch_size=int(general.get("SIMILARITY_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+    )
+    try:
+        index.load()
+    except psycopg2.Error as e:
+        index.last_error = str(e)
+    return index
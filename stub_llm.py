@@ -0,0 +1,188 @@
+# stub_llm.py
+"""
+Local stand-in for the OpenAI chat completions endpoint, for exercising the analyzer
+without network access or token cost.
+
+    python stub_llm.py --port 8765 --latency 0.5
+
+then set OPENAI_BASE_URL = "http://127.0.0.1:8765/v1/" in st.secrets["general"].
+Every request waits `latency` seconds (plus optional jitter) and answers with a canned
+analysis in the app's JSON schema. Streaming requests (stream=true) are answered as
+server-sent events. `--fail-rate` makes a fraction of requests return HTTP 500, and
+`--slow-rate` a fraction take `--slow-latency` seconds instead (a latency tail, for hedging).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_ANALYSIS = {
+    "scores": {
+        "discovery": 4,
+        "value_proposition": 3,
+        "technical_clarity": 4,
+        "objection_handling": 3,
+        "demo_flow": 4,
+        "next_steps": 3,
+    },
+    "strengths": {"discovery": ["Asked about current EHR and intake workflow"]},
+    "improvements": {"objection_handling": ["Address pricing concerns with ROI data"]},
+    "examples": {"discovery": ["\"Which EHR are you on today?\""]},
+    "pain_points": {
+        "operational": ["Manual patient intake"],
+        "technical": ["Epic integration effort"],
+        "financial": ["Limited budget this quarter"],
+        "priority_level": {"Manual patient intake": "High"},
+    },
+    "buying_signals": {
+        "positive": ["Asked about pilot pricing"],
+        "concerns": ["Implementation timeline"],
+    },
+    "next_steps": [
+        {"action": "Send pilot proposal", "owner": "Rep", "deadline": "Friday", "priority": "High"}
+    ],
+    "management_summary": {
+        "key_points": ["Strong interest in remote monitoring"],
+        "decisions": ["Evaluate a 3-month pilot"],
+        "risks": ["Budget approval"],
+        "recommendations": ["Follow up with ROI model"],
+    },
+}
+
+
+class StubState:
+    def __init__(self, latency=0.5, jitter=0.0, fail_rate=0.0, stream_chunk_chars=16,
+                 slow_rate=0.0, slow_latency=5.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.stream_chunk_chars = stream_chunk_chars
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real endpoint; `connections` shows whether clients reuse them.
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; without this, delayed ACKs add ~40 ms.
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            try:
+                self._complete()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on this request (timeout, or a hedge that lost).
+                pass
+
+        def _complete(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with state.lock:
+                state.requests += 1
+
+            if random.random() < state.slow_rate:
+                time.sleep(state.slow_latency)
+            else:
+                time.sleep(max(0.0, state.latency + random.uniform(-state.jitter, state.jitter)))
+            if random.random() < state.fail_rate:
+                self._send_json(500, {"error": {"message": "stub failure", "type": "server_error"}})
+                return
+
+            content = json.dumps(SAMPLE_ANALYSIS)
+            model = request.get("model", "stub")
+            prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+            usage = {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (prompt_chars + len(content)) // 4,
+            }
+
+            if request.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                # No Content-Length for a stream: it ends when the connection does.
+                self.send_header("Connection", "close")
+                self.close_connection = True
+                self.end_headers()
+                step = state.stream_chunk_chars
+                for i in range(0, len(content), step):
+                    chunk = {
+                        "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    final = {
+                        "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [], "usage": usage,
+                    }
+                    self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                return
+
+            self._send_json(200, {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+    return StubHandler
+
+
+def serve(port=8765, host="127.0.0.1", **state_kwargs):
+    """
+    Starts the stub server on a background thread and returns (server, state).
+    Call server.shutdown() to stop it.
+    """
+    state = StubState(**state_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the chat completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that take --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="seconds for a slow request")
+    args = parser.parse_args()
+
+    state = StubState(
+        latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Stub completions endpoint on http://{args.host}:{args.port}/v1/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def no_metrics(monkeypatch):
+    # Spans are recorded into a disabled buffer instead of one that reads st.secrets and flushes to PostgreSQL.
+    buffer = metrics.MetricsBuffer(enabled=False)
+    monkeypatch.setattr(metrics, "get_metrics", lambda: buffer)
@@ -0,0 +1,117 @@
+# tests/test_analysis_cache.py
+import copy
+
+import psycopg2
+import pytest
+
+import analysis_cache
+from analysis_cache import AnalysisCache, make_cache_key
+from stub_llm import SAMPLE_ANALYSIS
+
+
+class FakeTable:
+    """
+    Stands in for the analysis_cache table: key -> (analysis_json, analysis_blob, stored_at).
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.rows = {}
+        self.down = False
+
+    def fetch(self, key, ttl_seconds):
+        if self.down:
+            raise psycopg2.OperationalError("down")
+        row = self.rows.get(key)
+        if row is None or self.clock.now - row[2] >= ttl_seconds:
+            return None
+        return row[0], row[1], self.clock.now - row[2]
+
+    def store(self, key, model, prompt_version, analysis_json=None, analysis_blob=None):
+        if self.down:
+            raise psycopg2.OperationalError("down")
+        self.rows[key] = (analysis_json, analysis_blob, self.clock.now)
+
+
+class Clock:
+    now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(analysis_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def table(monkeypatch, clock):
+    table = FakeTable(clock)
+    monkeypatch.setattr(analysis_cache, "fetch_cached_analysis", table.fetch)
+    monkeypatch.setattr(analysis_cache, "store_cached_analysis", table.store)
+    return table
+
+
+def test_cache_key_ignores_whitespace_only_differences():
+    params = {"temperature": 0}
+    assert make_cache_key("Rep: hi\r\n  there", "m", "1", params) == make_cache_key("Rep: hi\nthere", "m", "1", params)
+    assert make_cache_key("Rep: hi", "m", "1", params) != make_cache_key("Rep: hi", "m", "2", params)
+
+
+def test_memory_then_database_tier(table):
+    cache = AnalysisCache(ttl_seconds=100)
+    cache.put("k", copy.deepcopy(SAMPLE_ANALYSIS), "m", "1")
+    assert cache.get("k")["scores"] == SAMPLE_ANALYSIS["scores"]
+    assert cache.stats()["memory_hits"] == 1
+
+    # Another process: empty memory tier, same table.
+    other = AnalysisCache(ttl_seconds=100)
+    assert other.get("k")["scores"] == SAMPLE_ANALYSIS["scores"]
+    assert other.get("k") is not None
+    assert (other.stats()["db_hits"], other.stats()["memory_hits"]) == (1, 1)
+
+
+def test_returned_analyses_are_copies(table):
+    cache = AnalysisCache(ttl_seconds=100)
+    cache.put("k", copy.deepcopy(SAMPLE_ANALYSIS), "m", "1")
+    cache.get("k")["scores"]["discovery"] = 1
+    assert cache.get("k")["scores"] == SAMPLE_ANALYSIS["scores"]
+
+
+def test_entries_expire(table, clock):
+    cache = AnalysisCache(ttl_seconds=100)
+    cache.put("k", copy.deepcopy(SAMPLE_ANALYSIS), "m", "1")
+    clock.now += 100
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_database_hit_keeps_the_rows_remaining_ttl(table, clock):
+    AnalysisCache(ttl_seconds=100).put("k", copy.deepcopy(SAMPLE_ANALYSIS), "m", "1")
+    clock.now += 90
+    cache = AnalysisCache(ttl_seconds=100)
+    assert cache.get("k") is not None  # loaded from the table with 10s left
+    clock.now += 20
+    table.rows.clear()
+    assert cache.get("k") is None
+
+
+def test_database_errors_are_misses(table):
+    table.down = True
+    cache = AnalysisCache(ttl_seconds=100)
+    assert cache.get("k") is None
+    cache.put("k", copy.deepcopy(SAMPLE_ANALYSIS), "m", "1")
+    assert cache.get("k") is not None
+
+
+def test_lru_eviction(table):
+    table.down = True  # memory tier only
+    cache = AnalysisCache(max_entries=2, ttl_seconds=100)
+    for key in ("a", "b", "c"):
+        cache.put(key, copy.deepcopy(SAMPLE_ANALYSIS), "m", "1")
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
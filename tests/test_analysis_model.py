@@ -0,0 +1,66 @@
+# tests/test_analysis_model.py
+import copy
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from analysis_model import COMPACT_VERSION, Analysis, SchemaError, validate_sections
+from stub_llm import SAMPLE_ANALYSIS
+
+
+def test_compact_round_trip():
+    analysis = Analysis.from_dict(copy.deepcopy(SAMPLE_ANALYSIS))
+    blob = analysis.to_compact()
+    assert blob[0] == COMPACT_VERSION
+    assert Analysis.from_compact(blob) == analysis
+    assert Analysis.from_compact(blob).to_dict() == SAMPLE_ANALYSIS
+
+
+def test_compact_round_trip_keeps_unicode_and_empty_sections():
+    data = copy.deepcopy(SAMPLE_ANALYSIS)
+    data["strengths"] = {"Überblick": ["Klare Demo – sehr gut 👍"]}
+    data["next_steps"] = []
+    data["pain_points"]["priority_level"] = {}
+    analysis = Analysis.from_dict(data)
+    assert Analysis.from_compact(analysis.to_compact()).to_dict() == analysis.to_dict()
+
+
+def test_compact_is_smaller_than_json():
+    analysis = Analysis.from_dict(copy.deepcopy(SAMPLE_ANALYSIS))
+    assert len(analysis.to_compact()) < len(json.dumps(SAMPLE_ANALYSIS))
+
+
+def test_unknown_compact_version_is_rejected():
+    blob = Analysis.from_dict(copy.deepcopy(SAMPLE_ANALYSIS)).to_compact()
+    with pytest.raises(ValueError):
+        Analysis.from_compact(bytes([COMPACT_VERSION + 1]) + blob[1:])
+
+
+def test_validation_normalizes_and_reports_per_section():
+    data = copy.deepcopy(SAMPLE_ANALYSIS)
+    data["scores"]["discovery"] = "4"
+    data["next_steps"][0]["priority"] = "high"
+    data["buying_signals"] = "none"
+    del data["examples"]
+    sections, errors = validate_sections(data)
+    assert sections["scores"].discovery == 4
+    assert sections["next_steps"][0].priority == "High"
+    assert set(errors) == {"buying_signals", "examples"}
+    with pytest.raises(SchemaError):
+        Analysis.from_dict(data)
+
+
+def test_scores_outside_1_to_5_are_invalid():
+    data = copy.deepcopy(SAMPLE_ANALYSIS)
+    data["scores"]["discovery"] = 8
+    assert "scores" in validate_sections(data)[1]
+
+
+def test_importing_the_model_does_not_load_the_database_layer():
+    code = "import sys, analysis_model; print(sorted({'database', 'psycopg2', 'streamlit'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.stdout.strip() == "[]"
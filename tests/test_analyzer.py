@@ -0,0 +1,86 @@
+# tests/test_analyzer.py
+import copy
+
+import pytest
+
+from analyzer import DemoAnalyzer
+from stub_llm import SAMPLE_ANALYSIS
+
+
+class FakeCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get(self, key):
+        return self.stored.get(key)
+
+    def put(self, key, analysis, model, prompt_version):
+        self.stored[key] = analysis
+
+
+def make_analyzer(complete):
+    """
+    A DemoAnalyzer without st.secrets or a router; every chunk and reduce call goes to `complete`.
+    """
+    analyzer = DemoAnalyzer.__new__(DemoAnalyzer)
+    analyzer.max_concurrency = 2
+    analyzer.input_token_budget = 100_000
+    analyzer.json_mode = False
+    analyzer.reuse_duplicates = False
+    analyzer.cache = FakeCache()
+    analyzer.last_cache_hit = False
+    analyzer.last_duplicate_of = None
+    analyzer.last_chunk_count = 0
+    analyzer.last_chunk_failures = []
+    analyzer.last_preprocess = None
+    analyzer._complete_analysis = complete
+    return analyzer
+
+
+def test_reduce_failure_falls_back_to_validated_merge():
+    def complete(prompt):
+        if "COMBINED PARTIAL ANALYSES" in prompt:
+            raise TimeoutError("reduce timed out")
+        return copy.deepcopy(SAMPLE_ANALYSIS), []
+
+    analysis, missing, failures = make_analyzer(complete)._map_reduce(["part one", "part two"])
+    assert missing == [] and failures == []
+    assert analysis["scores"] == SAMPLE_ANALYSIS["scores"]
+
+
+def test_invalid_merge_is_reported_not_hidden():
+    partial = copy.deepcopy(SAMPLE_ANALYSIS)
+    del partial["scores"]
+
+    def complete(prompt):
+        if "COMBINED PARTIAL ANALYSES" in prompt:
+            raise TimeoutError("reduce timed out")
+        return copy.deepcopy(partial), []
+
+    analysis, missing, failures = make_analyzer(complete)._map_reduce(["part one", "part two"])
+    assert missing == ["scores"]
+
+
+def test_failed_chunks_are_returned_and_not_cached(monkeypatch):
+    calls = []
+
+    def complete(prompt):
+        calls.append(prompt)
+        if "PART 2/2" in prompt:
+            raise ConnectionError("down")
+        return copy.deepcopy(SAMPLE_ANALYSIS), []
+
+    analyzer = make_analyzer(complete)
+    monkeypatch.setattr("analyzer.chunk_transcript", lambda transcript, tokens: ["part one", "part two"])
+    analysis = analyzer.analyze("Rep: hello\nCustomer: hi")
+    assert analysis["scores"]
+    assert [str(e) for e in analyzer.last_chunk_failures] == ["down"]
+    assert analyzer.cache.stored == {}
+
+
+def test_every_chunk_failing_raises():
+    def complete(prompt):
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        make_analyzer(complete)._map_reduce(["part one", "part two"])
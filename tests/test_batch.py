@@ -0,0 +1,79 @@
+# tests/test_batch.py
+import io
+import zipfile
+from datetime import date
+
+import pytest
+
+from batch import BatchItem, load_batch_file, load_csv, run_batch
+
+CSV = b"rep_name,customer_name,demo_date,transcript\n"
+
+
+def test_load_csv():
+    items = load_csv(CSV + b"Ann, Acme ,2024-03-01,Rep: hi\nBob,,,\n", source="a.csv")
+    assert [(i.rep_name, i.customer_name, i.demo_date, i.source) for i in items] == [
+        ("Ann", "Acme", date(2024, 3, 1), "a.csv:2"),
+    ]
+
+
+def test_short_row_is_rejected():
+    # A short row: DictReader gives None for the missing fields.
+    with pytest.raises(ValueError, match="a.csv:2: missing rep_name"):
+        load_csv(b"transcript,rep_name,customer_name,demo_date\nRep: hi\n", source="a.csv")
+
+
+def test_missing_column_is_rejected():
+    with pytest.raises(ValueError, match="missing column"):
+        load_csv(b"rep_name,transcript\nAnn,hi\n", source="a.csv")
+
+
+def test_load_zip_reads_manifest_and_file_names():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("manifest.csv", "file,rep_name,customer_name,demo_date\none.txt,Ann,Acme,2024-03-01\n")
+        zf.writestr("one.txt", "Rep: one")
+        zf.writestr("Bob__Globex__2024-03-02.txt", "Rep: two")
+    items = load_batch_file("demos.zip", buffer.getvalue())
+    assert sorted((i.rep_name, i.customer_name, i.demo_date) for i in items) == [
+        ("Ann", "Acme", date(2024, 3, 1)),
+        ("Bob", "Globex", date(2024, 3, 2)),
+    ]
+
+
+class FlakyAnalyzer:
+    """
+    Fails the first `failures` calls per transcript, then answers.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = {}
+
+    def analyze(self, transcript):
+        self.calls[transcript] = self.calls.get(transcript, 0) + 1
+        if self.calls[transcript] <= self.failures.get(transcript, 0):
+            raise ConnectionError("rate limited")
+        return {"scores": {"discovery": 3}}
+
+
+def make_items(*transcripts):
+    return [BatchItem("Ann", "Acme", None, t, source=t) for t in transcripts]
+
+
+def test_run_batch_retries_and_keeps_input_order():
+    analyzer = FlakyAnalyzer({"b": 2})
+    progress = []
+    results = run_batch(make_items("a", "b", "c"), analyzer, concurrency=3, max_retries=3, base_delay=0,
+                        on_progress=lambda done, total, result: progress.append((done, total)))
+    assert [r.item.transcript for r in results] == ["a", "b", "c"]
+    assert all(r.ok for r in results)
+    assert [r.attempts for r in results] == [1, 3, 1]
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_run_batch_gives_up_after_max_retries():
+    results = run_batch(make_items("a"), FlakyAnalyzer({"a": 5}), max_retries=2, base_delay=0)
+    assert not results[0].ok
+    assert results[0].attempts == 3
+    assert results[0].error == "rate limited"
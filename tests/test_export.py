@@ -0,0 +1,66 @@
+# tests/test_export.py
+import copy
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from export import EXPORT_FIELDS, LIST_SEPARATOR, flatten_analysis, write_export
+from stub_llm import SAMPLE_ANALYSIS
+
+ROW = (7, "Ann", "DME", "Acme", date(2024, 3, 1), datetime(2024, 3, 1, 9, 30), Decimal("3.50"), SAMPLE_ANALYSIS)
+
+
+def rows(**filters):
+    rows.filters = filters
+    return iter([ROW, (8, "Bob", "DME", None, None, None, None, None)])
+
+
+def test_flatten_joins_lists_for_csv():
+    flat = flatten_analysis(copy.deepcopy(SAMPLE_ANALYSIS))
+    assert flat["score_discovery"] == 4
+    assert flat["strengths"] == "discovery: Asked about current EHR and intake workflow"
+    assert flat["pain_points_operational"] == "Manual patient intake"
+    assert flat["next_steps"] == "Send pilot proposal / Rep / Friday / High"
+
+
+def test_flatten_keeps_lists_for_ndjson():
+    analysis = copy.deepcopy(SAMPLE_ANALYSIS)
+    analysis["management_summary"]["risks"].append("Timeline")
+    flat = flatten_analysis(analysis, join=False)
+    assert flat["risks"] == ["Budget approval", "Timeline"]
+    assert LIST_SEPARATOR.join(flat["risks"]) == flatten_analysis(analysis)["risks"]
+
+
+def test_flatten_tolerates_missing_and_malformed_sections():
+    flat = flatten_analysis({"scores": {"discovery": 2}, "pain_points": "n/a", "next_steps": ["not a step"]})
+    assert flat["score_discovery"] == 2 and flat["score_demo_flow"] is None
+    assert flat["pain_points_technical"] == "" and flat["next_steps"] == ""
+
+
+def test_csv_export():
+    out = io.StringIO()
+    assert write_export(out, "csv", source=rows, rep_team="DME") == 2
+    assert rows.filters == {"rep_team": "DME", "itersize": 2000}
+    records = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert list(records[0]) == list(EXPORT_FIELDS)
+    assert records[0]["demo_date"] == "2024-03-01"
+    assert records[0]["score_overall"] == "3.5"
+    assert records[1]["customer_name"] == "" and records[1]["strengths"] == ""
+
+
+def test_ndjson_export():
+    out = io.StringIO()
+    write_export(out, "ndjson", source=rows)
+    first, second = (json.loads(line) for line in out.getvalue().splitlines())
+    assert first["created_at"] == "2024-03-01T09:30:00"
+    assert first["buying_signals_positive"] == ["Asked about pilot pricing"]
+    assert second["score_overall"] is None
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        write_export(io.StringIO(), "xlsx", source=rows)
@@ -0,0 +1,79 @@
+# tests/test_jobs.py
+import time
+
+import psycopg2
+
+import jobs
+
+
+class FakeAnalyzer:
+    def analyze_stream(self, transcript):
+        yield "scores", {"discovery": 3}
+
+
+def test_worker_survives_database_errors(monkeypatch):
+    queued = [(1, "t", 1), (2, "t", 1)]
+    finished = []
+
+    def claim(stale_seconds):
+        return queued.pop(0) if queued else None
+
+    def finish(job_id, **kwargs):
+        if job_id == 1:
+            raise psycopg2.OperationalError("server closed the connection")
+        finished.append(job_id)
+
+    monkeypatch.setattr(jobs, "DemoAnalyzer", FakeAnalyzer)
+    monkeypatch.setattr(jobs, "claim_analysis_job", claim)
+    monkeypatch.setattr(jobs, "finish_analysis_job", finish)
+    monkeypatch.setattr(jobs, "update_analysis_job_sections", lambda job_id, sections: None)
+
+    pool = jobs.JobWorkerPool(workers=1, poll_seconds=0.01)
+    deadline = time.monotonic() + 2
+    while not finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert finished == [2]
+    assert pool._threads[0].is_alive()
+    assert "Job #1" in pool.stats()["last_error"]
+
+
+class FakeJobTable:
+    def __init__(self, monkeypatch):
+        self.sections = []
+        self.finished = []
+        monkeypatch.setattr(jobs, "update_analysis_job_sections", lambda job_id, sections: self.sections.append(sections))
+        monkeypatch.setattr(jobs, "finish_analysis_job", lambda job_id, **kwargs: self.finished.append(kwargs))
+
+
+class BrokenAnalyzer:
+    def analyze_stream(self, transcript):
+        yield "scores", {"discovery": 3}
+        raise TimeoutError("model timed out")
+
+
+def test_sections_are_saved_as_they_stream(monkeypatch):
+    table = FakeJobTable(monkeypatch)
+    pool = jobs.JobWorkerPool(workers=0)
+    pool._execute(FakeAnalyzer(), 1, "t", 1)
+    assert table.sections == [{"scores": {"discovery": 3}}]
+    assert table.finished == [{"analysis": {"scores": {"discovery": 3}}}]
+    assert pool.stats()["completed"] == 1
+
+
+def test_failed_analysis_is_requeued_until_max_attempts(monkeypatch):
+    table = FakeJobTable(monkeypatch)
+    pool = jobs.JobWorkerPool(workers=0, max_attempts=2)
+    pool._execute(BrokenAnalyzer(), 1, "t", 1)
+    pool._execute(BrokenAnalyzer(), 1, "t", 2)
+    assert table.finished == [
+        {"error": "model timed out", "requeue": True},
+        {"error": "model timed out", "requeue": False},
+    ]
+    assert pool.stats()["failed"] == 1
+
+
+def test_job_over_max_attempts_is_given_up(monkeypatch):
+    table = FakeJobTable(monkeypatch)
+    pool = jobs.JobWorkerPool(workers=0, max_attempts=2)
+    pool._execute(FakeAnalyzer(), 1, "t", 3)
+    assert table.finished == [{"error": "Gave up after 2 attempts"}]
@@ -0,0 +1,71 @@
+# tests/test_llm_router.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_router import CircuitBreaker, LLMRouter, Route, RouterError
+
+REQUEST = {"messages": [{"role": "user", "content": "hi"}]}
+
+
+class FakeClient:
+    """
+    Stands in for an openai client: create() sleeps `delay` and then answers or raises.
+    """
+
+    def __init__(self, text="ok", delay=0.0):
+        self.text = text
+        self.delay = delay
+        self.fail = False
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, stream, **request):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("down")
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=self.text))])
+
+
+def make_route(name, client, reset_seconds=0.05):
+    return Route(name=name, model="m", client=client, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=reset_seconds))
+
+
+def test_falls_back_to_next_route():
+    primary, backup = FakeClient(), FakeClient("backup")
+    primary.fail = True
+    router = LLMRouter([make_route("primary", primary), make_route("backup", backup)], hedge_percentile=0)
+    text, route = router.complete(REQUEST)
+    assert (text, route.name) == ("backup", "backup")
+
+
+def test_half_open_route_not_launched_is_tried_next_time():
+    primary, backup = FakeClient("primary"), FakeClient("backup")
+    primary_route, backup_route = make_route("primary", primary), make_route("backup", backup)
+    router = LLMRouter([primary_route, backup_route], hedge_percentile=0.5, hedge_after_seconds=5)
+
+    backup_route.breaker.record_failure()
+    time.sleep(0.1)
+    assert backup_route.breaker.state == "half-open"
+
+    # The primary answers well before the hedge delay, so the backup is never launched.
+    assert router.complete(REQUEST)[0] == "primary"
+    assert backup.calls == 0
+
+    primary.fail = True
+    text, route = router.complete(REQUEST)
+    assert (text, route.name) == ("backup", "backup")
+    assert backup.calls == 1
+    assert backup_route.breaker.state == "closed"
+
+
+def test_all_routes_open_raises():
+    route = make_route("only", FakeClient(), reset_seconds=60)
+    route.breaker.record_failure()
+    with pytest.raises(RouterError, match="unavailable"):
+        LLMRouter([route]).complete(REQUEST)
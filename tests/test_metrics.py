@@ -0,0 +1,45 @@
+# tests/test_metrics.py
+import pytest
+from streamlit.runtime.scriptrunner import RerunException, StopException
+
+import metrics
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    spans = []
+    buffer = metrics.MetricsBuffer(enabled=False)
+    monkeypatch.setattr(buffer, "record", lambda kind, name, ms, attrs=None: spans.append(attrs))
+    monkeypatch.setattr(metrics, "get_metrics", lambda: buffer)
+    return spans
+
+
+@pytest.mark.parametrize("exc", [RerunException(None), StopException()])
+def test_rerun_and_stop_are_not_errors(recorded, exc):
+    with pytest.raises(type(exc)):
+        with metrics.span("rerun", "Page"):
+            raise exc
+    assert recorded == [{}]
+
+
+def test_exceptions_are_recorded(recorded):
+    with pytest.raises(KeyError):
+        with metrics.span("rerun", "Page"):
+            raise KeyError("x")
+    assert recorded == [{"error": "KeyError"}]
+
+
+def test_spans_are_kept_when_a_flush_fails(monkeypatch):
+    import database
+
+    def insert(spans):
+        raise ValueError("bad span")
+
+    monkeypatch.setattr(database, "insert_metric_spans", insert)
+    buffer = metrics.MetricsBuffer(enabled=False)
+    buffer.enabled = True  # records, without the flush thread
+    buffer.record("db", "query", 1.0)
+    with pytest.raises(ValueError):
+        buffer.flush()
+    assert buffer.stats()["buffered"] == 1
+    assert buffer.stats()["last_error"] == "bad span"
@@ -0,0 +1,88 @@
+# tests/test_migrations.py
+from contextlib import contextmanager
+
+import pytest
+
+import migrations
+
+
+def test_versions_are_contiguous_and_unique():
+    versions = [version for version, _, _ in migrations.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert len({description for _, description, _ in migrations.MIGRATIONS}) == len(versions)
+
+
+class FakeConnection:
+    """
+    Records the statements run_migrations issues; schema_version lives in `applied`.
+    """
+
+    def __init__(self, applied=()):
+        self.applied = set(applied)
+        self.log = []
+        self._rows = []
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        if sql.startswith("SELECT version FROM schema_version"):
+            self._rows = [(v,) for v in sorted(self.applied)]
+        elif sql.startswith("INSERT INTO schema_version"):
+            self.applied.add(params[0])
+            self.log.append(("recorded", params[0]))
+        elif "advisory" in sql:
+            self.log.append(sql.split("(")[0].split()[-1])
+
+    def fetchall(self):
+        return self._rows
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    ran = []
+    fake = [(v, f"step {v}", lambda cur, v=v: ran.append(v)) for v in (1, 2, 3)]
+    monkeypatch.setattr(migrations, "MIGRATIONS", fake)
+    return ran
+
+
+def use(monkeypatch, conn):
+    class Pool:
+        @contextmanager
+        def connection(self):
+            yield conn
+    monkeypatch.setattr(migrations, "get_pool", Pool)
+
+
+def test_pending_steps_run_in_order_under_the_lock(monkeypatch, steps):
+    conn = FakeConnection(applied={1})
+    use(monkeypatch, conn)
+    assert migrations.run_migrations() == [2, 3]
+    assert steps == [2, 3]
+    assert conn.log[0] == "pg_advisory_lock" and conn.log[-2] == "pg_advisory_unlock"
+    # Each step is recorded and committed before the next one runs.
+    assert conn.log[2:6] == [("recorded", 2), "commit", ("recorded", 3), "commit"]
+    assert migrations.run_migrations() == []
+
+
+def test_failed_step_rolls_back_and_stops(monkeypatch, steps):
+    def broken(cur):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [migrations.MIGRATIONS[0], (2, "broken", broken),
+                                                   migrations.MIGRATIONS[2]])
+    conn = FakeConnection()
+    use(monkeypatch, conn)
+    with pytest.raises(RuntimeError):
+        migrations.run_migrations()
+    assert steps == [1]
+    assert conn.applied == {1}
+    assert "rollback" in conn.log and conn.log[-2] == "pg_advisory_unlock"
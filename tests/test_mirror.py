@@ -0,0 +1,130 @@
+# tests/test_mirror.py
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import psycopg2
+import pytest
+
+import mirror
+from stub_llm import SAMPLE_ANALYSIS
+
+
+class FakeRemote:
+    """
+    Stands in for demo_analysis in PostgreSQL: id -> row of MIRROR_COLUMNS. Ids in `hidden`
+    cannot be read yet, as if their inserts had not committed.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.hidden = set()
+        self.down = False
+
+    def add(self, result_id, rep_name="Ann", hidden=False):
+        self.rows[result_id] = (
+            result_id, rep_name, "DME", "Acme", date(2024, 3, 1), datetime(2024, 3, 1, 9), Decimal("3.50"),
+            *SAMPLE_ANALYSIS["scores"].values(), json.dumps(SAMPLE_ANALYSIS),
+        )
+        if hidden:
+            self.hidden.add(result_id)
+
+    def _visible(self):
+        if self.down:
+            raise psycopg2.OperationalError("down")
+        return {i: row for i, row in self.rows.items() if i not in self.hidden}
+
+    def fetch_result_ids(self, after_id, up_to_id):
+        return sorted(i for i in self._visible() if after_id < i <= up_to_id)
+
+    def fetch_results_after(self, after_id, limit):
+        rows = self._visible()
+        return [rows[i] for i in sorted(rows) if i > after_id][:limit]
+
+    def fetch_results_by_ids(self, ids):
+        rows = self._visible()
+        return [rows[i] for i in sorted(ids) if i in rows]
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    remote = FakeRemote()
+    for name in ("fetch_result_ids", "fetch_results_after", "fetch_results_by_ids"):
+        monkeypatch.setattr(mirror, name, getattr(remote, name))
+    return remote
+
+
+@pytest.fixture
+def local(tmp_path, remote):
+    return mirror.AnalyticsMirror(path=str(tmp_path / "mirror.sqlite3"), batch_size=2, overlap=10, background=False)
+
+
+def mirrored_ids(local):
+    return [row[0] for row in local._conn().execute("SELECT id FROM demo_result ORDER BY id")]
+
+
+def test_sync_copies_rows_in_batches(remote, local):
+    for i in range(1, 6):
+        remote.add(i)
+    assert local.sync() == 5
+    assert mirrored_ids(local) == [1, 2, 3, 4, 5]
+    assert local.watermark() == 5
+    assert local.sync() == 0
+
+    rows = local.fetch_results_by_ids([3, 1])
+    assert [r[0] for r in rows] == [3, 1]
+    assert rows[0][4] == date(2024, 3, 1) and rows[0][6] == 3.5
+    assert local.fetch_result_analysis(2) == SAMPLE_ANALYSIS
+
+
+def test_flattened_tables_are_filled(remote, local):
+    remote.add(1)
+    local.sync()
+    summary = local.fetch_pain_point_summary()
+    assert ("operational", "Manual patient intake", 1, 1) in summary
+    assert local.fetch_next_step_summary() == [("High", 1, 1)]
+
+
+def test_overlap_picks_up_late_commits_and_deletes(remote, local):
+    remote.add(1)
+    remote.add(2, hidden=True)  # id taken, not committed yet
+    remote.add(3)
+    local.sync()
+    assert mirrored_ids(local) == [1, 3]
+
+    remote.hidden.clear()
+    del remote.rows[3]
+    local.sync()
+    assert mirrored_ids(local) == [1, 2]
+    assert local._conn().execute("SELECT COUNT(*) FROM pain_point WHERE result_id = 3").fetchone()[0] == 0
+
+
+def test_late_rows_below_the_overlap_window_are_missed(remote, tmp_path):
+    local = mirror.AnalyticsMirror(path=str(tmp_path / "m.sqlite3"), overlap=1, background=False)
+    remote.add(1, hidden=True)
+    remote.add(2)
+    remote.add(3)
+    local.sync()
+    remote.hidden.clear()
+    local.sync()
+    assert mirrored_ids(local) == [2, 3]
+
+
+def test_unmirrored_ids_are_read_from_postgres(remote, local):
+    remote.add(1)
+    local.sync()
+    remote.add(2)
+    assert [r[0] for r in local.fetch_results_by_ids([1, 2])] == [1, 2]
+    remote.down = True
+    assert [r[0] for r in local.fetch_results_by_ids([1, 2])] == [1]
+
+
+def test_sync_resumes_and_schema_change_rebuilds(remote, tmp_path, monkeypatch):
+    path = str(tmp_path / "mirror.sqlite3")
+    remote.add(1)
+    mirror.AnalyticsMirror(path=path, background=False).sync()
+    assert mirror.AnalyticsMirror(path=path, background=False).watermark() == 1
+
+    monkeypatch.setattr(mirror, "SCHEMA_VERSION", mirror.SCHEMA_VERSION + "-next")
+    rebuilt = mirror.AnalyticsMirror(path=path, background=False)
+    assert rebuilt.watermark() == 0 and mirrored_ids(rebuilt) == []
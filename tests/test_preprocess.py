@@ -0,0 +1,24 @@
+# tests/test_preprocess.py
+import pytest
+
+from preprocess import remove_disfluencies
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Rep: the the pricing is fixed.", "Rep: the pricing is fixed."),
+    ("Rep: I I I think so.", "Rep: I think so."),
+    ("Rep: we- we can ship it.", "Rep: we can ship it."),
+    ("Customer: it is is is fine.", "Customer: it is fine."),
+])
+def test_stutters_are_collapsed(text, expected):
+    assert remove_disfluencies(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Customer: We had had that vendor for years.",
+    "Customer: I know that that works for you.",
+    "Customer: Great, bye bye.",
+    "Rep: It is what it is is not what we say.",
+])
+def test_grammatical_doubles_are_kept(text):
+    assert remove_disfluencies(text) == text
@@ -0,0 +1,44 @@
+# tests/test_result_writer.py
+import psycopg2
+import pytest
+
+import result_writer
+
+
+def make_writer():
+    return result_writer.ResultWriter(flush_size=1000, flush_seconds=3600)
+
+
+def test_rows_are_kept_on_database_error(monkeypatch):
+    def save(rows):
+        raise psycopg2.OperationalError("server closed the connection")
+
+    monkeypatch.setattr(result_writer, "save_demo_results", save)
+    writer = make_writer()
+    writer.submit("Ann", "Acme", None, {"scores": {}})
+    assert writer.flush() == 0
+    assert writer.stats()["buffered"] == 1
+    assert "server closed" in writer.stats()["last_error"]
+
+
+def test_rows_are_kept_on_any_error(monkeypatch):
+    saved = []
+
+    def save(rows):
+        if not saved:
+            saved.append(None)
+            raise ValueError("bad row")
+        saved.extend(rows)
+        return len(rows)
+
+    monkeypatch.setattr(result_writer, "save_demo_results", save)
+    writer = make_writer()
+    writer.submit("Ann", "Acme", None, {"scores": {}})
+    with pytest.raises(ValueError):
+        writer.flush()
+    assert writer.stats()["buffered"] == 1
+    assert writer.stats()["last_error"] == "bad row"
+
+    assert writer.flush() == 1
+    assert writer.stats()["buffered"] == 0
+    assert writer.stats()["last_error"] is None
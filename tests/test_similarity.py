@@ -0,0 +1,119 @@
+# tests/test_similarity.py
+import random
+
+import numpy as np
+import pytest
+
+import similarity
+from similarity import EMPTY_SIGNATURE, NUM_PERM, SimilarityIndex, minhash
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def random_transcript(rng, words=300):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def edit(rng, transcript, fraction):
+    words = transcript.split()
+    for i in rng.sample(range(len(words)), int(len(words) * fraction)):
+        words[i] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def jaccard(a, b):
+    shingles = lambda t: {tuple(t.split()[i:i + 3]) for i in range(len(t.split()) - 2)}
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def test_signature_ignores_timestamps_fillers_and_stutters():
+    clean = "Rep: so the pricing is per seat. Customer: that works for us."
+    noisy = "[00:01:02] Rep: um so the the pricing is, uh, per seat.\n[00:01:09] Customer: that works for us."
+    assert np.array_equal(minhash(clean), minhash(noisy))
+    assert minhash("  ") is None
+    assert minhash("hi").shape == (NUM_PERM,)
+
+
+def test_estimate_tracks_jaccard():
+    rng = random.Random(1)
+    base = random_transcript(rng)
+    for fraction in (0.02, 0.1, 0.3):
+        other = edit(rng, base, fraction)
+        estimate = (minhash(base) == minhash(other)).mean()
+        assert abs(estimate - jaccard(base, other)) < 0.15
+
+
+def test_lsh_recall_and_precision():
+    rng = random.Random(2)
+    transcripts = [random_transcript(rng) for _ in range(300)]
+    index = SimilarityIndex(background=False)
+    index.add(list(range(300)), np.stack([minhash(t) for t in transcripts]))
+
+    # Lightly edited copies find their original; unrelated transcripts find nothing close.
+    for i in range(0, 300, 10):
+        match = index.find_duplicate(edit(rng, transcripts[i], 0.03), threshold=0.7)
+        assert match is not None and match[0] == i
+    for _ in range(20):
+        assert index.find_duplicate(random_transcript(rng), threshold=0.5) is None
+
+    index.add([300], minhash(edit(rng, transcripts[5], 0.1))[None, :])
+    assert [i for i, _ in index.similar_to(5)] == [300]
+    assert index.similar_to(999) == []
+
+
+def test_add_skips_indexed_ids():
+    index = SimilarityIndex(background=False)
+    signature = minhash("a b c d e")[None, :]
+    assert index.add([1], signature) == 1
+    assert index.add([1], signature) == 0
+    assert index.stats()["signatures"] == 1
+
+
+class FakeStore:
+    """
+    Stands in for demo_analysis transcripts and the demo_minhash table.
+    """
+
+    def __init__(self):
+        self.transcripts = {}
+        self.signatures = []  # (seq, result_id, signature)
+
+    def without_minhash(self, after_id=0, limit=500):
+        done = {result_id for _, result_id, _ in self.signatures}
+        return sorted((i, t) for i, t in self.transcripts.items() if i > after_id and i not in done)[:limit]
+
+    def store(self, rows):
+        done = {result_id for _, result_id, _ in self.signatures}
+        rows = [row for row in rows if row[0] not in done]
+        for result_id, signature in rows:
+            self.signatures.append((len(self.signatures) + 1, result_id, signature))
+        return len(rows)
+
+    def after(self, after_seq, limit):
+        return [row for row in self.signatures if row[0] > after_seq][:limit]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(similarity, "fetch_transcripts_without_minhash", store.without_minhash)
+    monkeypatch.setattr(similarity, "store_minhashes", store.store)
+    monkeypatch.setattr(similarity, "fetch_minhashes_after", store.after)
+    return store
+
+
+def test_sync_computes_missing_signatures_and_loads_others(store):
+    rng = random.Random(3)
+    store.transcripts = {i: random_transcript(rng) for i in range(1, 8)}
+    store.transcripts[8] = "um uh"
+    index = SimilarityIndex(batch_size=3, background=False)
+    assert index.sync() == 8
+    assert index.stats()["signatures"] == 7  # the empty transcript is stored, not indexed
+    assert any(signature == EMPTY_SIGNATURE for _, _, signature in store.signatures)
+
+    # Another process computed one; this one only loads it.
+    store.transcripts[9] = store.transcripts[1]
+    store.store([(9, minhash(store.transcripts[9]).tobytes())])
+    assert index.sync() == 0
+    assert index.similar_to(9, k=1)[0] == (1, 1.0)